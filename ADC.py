@@ -7,16 +7,16 @@ Code de contrôle de l'ADC ADS1115-Q1 via I2C
 
 import smbus2
 from typing import List
-from LTC681x import bin2int, int2bin
+from bitcodec import s16_from_bytes
 
 
 # I2C channel 0 is connected to the GPIO pins
 I2C_CHANNEL = 1  # i2cdetect -y 1 to detect
 
-ADR = [1, 0, 0, 1, 0, 0, 0]  # Adresse de l'ADC, avec le pin address mis au gnd
-CONFIG_REG = [0, 0, 0, 0, 0, 0, 0, 1]
-DATA_REG = [0, 0, 0, 0, 0, 0, 0, 0]
-CHANNEL = {0: [1, 0, 0], 1: [1, 0, 1], 2: [1, 1, 0], 3: [1, 1, 1]}
+ADR = 0b1001000  # Adresse de l'ADC, avec le pin address mis au gnd
+CONFIG_REG = 0b00000001
+DATA_REG = 0b00000000
+CHANNEL = {0: 0b100, 1: 0b101, 2: 0b110, 3: 0b111}
 FSR = 6.144  # V Full Scale rate (valeur maximale de tension)
 RESISTOR = 47  # Ohm (Valeur de résistance en entrée de channel)
 ENTRY = 3
@@ -32,26 +32,26 @@ def set_channel(entry: int):
     Parameters:
         entry (int): Numéro du canal d'entrée à sélectionner (0 à 3).
     """
-    address = bin2int(ADR)  # R/W bit low to Write --> vraie addresse = 144
-    reg = bin2int(CONFIG_REG)  # Registre de configuration --> reg = 1
+    address = ADR  # R/W bit low to Write --> vraie addresse = 144
+    reg = CONFIG_REG  # Registre de configuration --> reg = 1
     if not (0 <= entry <= 3):   
         print("N° d'entrée invalide")
         return
-    bit1 = [1] + CHANNEL[entry] + [0, 0, 0] + [0]
+    bit1 = (0b1 << 7) | (CHANNEL[entry] << 4) | (0b000 << 1) | 0b0
     # Voir datasheet p27 Table 8-6
     #
     # Premier bit : statut opérationnel (OS=0b1)                --> 1 pour allumé (0 pour éteint)
     # 2-3-4 bit : sélection du channel d'entrée (MUX)           --> controle l'assignment des entrées analogiques AIN0-AIN3 et GND au canaux AIN_N et AIN_P
     # 5-6-7 bit : Gain d'amplification programmable (PGA=0b000) --> FSR = ±6.144 V (valeur maximale de tension) 
     # 8 bit : mode de conversion (MODE=0b0)                     --> mode continu (1 pour mode single shot)
-    bit2 = [1,0,0,  0,  0,  0,  1,1]
+    bit2 = (0b100 << 5) | (0b0 << 4) | (0b0 << 3) | (0b0 << 2) | 0b11
     # 1-2-3 bit : Sélection du data rate (DR=0b100)             --> 128 SPS (Samples Per Second ~= Hz)
     # 4 bit : Mode de comparateur (COMP_MODE=0b0)               --> comparateur normal (1 pour mode de fenêtre glissante)
     # 5 bit : Polarité de comparateur (COMP_POL=0b0)            --> normalement ouvert (1 pour normalement fermé)
     # 6 bit : Mode de trigger du comparateur (COMP_LAT=0b0)     --> triger sur la clock (1 pour trigger sur lecture)
     # 7-8 bit : Activer le alert/ready (COMP_QUE=0b11)          --> ALERT/RDY désactivé (haute impédance)
     
-    msg = smbus2.i2c_msg.write(address, [reg, bin2int(bit1), bin2int(bit2)])
+    msg = smbus2.i2c_msg.write(address, [reg, bit1, bit2])
     bus.i2c_rdwr(msg)   # Envoi du message sur le bus I2C par le pin 0b10010000 = 144
 
 
@@ -59,8 +59,8 @@ def enable_read():
     """
     Séléctionne le registre de données de l'ADC pour lire la valeur convertie.
     """
-    address = bin2int(ADR)   # R/W bit low to write --> vraie addresse = 144
-    reg = bin2int(DATA_REG)  # Registre de données --> reg = 0
+    address = ADR   # R/W bit low to write --> vraie addresse = 144
+    reg = DATA_REG  # Registre de données --> reg = 0
     msg = smbus2.i2c_msg.write(address, [reg])  # Sélection du registre de données
     bus.i2c_rdwr(msg)        # Envoi du message sur le bus I2C par le pin 0b10010000 = 144
 
@@ -71,20 +71,10 @@ def read_value():
     """
     global VALUE
     enable_read()
-    addr = bin2int(ADR)     # R/W bit high to read --> vraie addresse = 145
+    addr = ADR     # R/W bit high to read --> vraie addresse = 145
     msg = smbus2.i2c_msg.read(addr, 2)     # Lecture des 2 octets de données (16 bits)
     bus.i2c_rdwr(msg)   # Envoi du message sur le bus I2C par le pin 0b10010001 = 145
-    resmsg = []
-    for value in msg:
-        resmsg += int2bin(value)    # Concaténation des valeurs lues dans un tableau binaire
-    if resmsg[0] == 0:    # Si le premier bit est à 0, c'est un nombre positif (complément à 2)
-        VALUE = bin2int(resmsg)
-    else:  # Sinon, c'est un nombre négatif
-        comp2 = [0] * 16
-        for k in range(1, 16):
-            if resmsg[k] == 0:  # on inverse les bits
-                comp2[k] = 1
-        VALUE = 1-bin2int(comp2) # on assigne la valeur négative (+1 car -n = /n + 1 dans le complément à 2)
+    VALUE = s16_from_bytes(bytes(msg))  # Valeur signée 16 bits (complément à 2)
 
 
 def convert_current(value: int):
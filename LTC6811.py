@@ -4,7 +4,10 @@ Librairie de communication avec le processeur LTC6811 du BMS.
 ### Fichier principal permettant la communication avec le processeur LTC6811
 
 
+import time
+
 from LTC681x import *
+from bitcodec import nibbles
 import config
 
 
@@ -14,17 +17,13 @@ def bin2hex(bin):
 
 
 def hex2bin(hex):
-    binst = bin(int(hex, 16))
-    nb0 = 8 - len(binst) + 2
-    res = [0] * nb0
-    for x in binst[2:]:
-        res.append(int(x))
-    return res
+    return int2bin(int(hex, 16))
 
 
 ##Paramètres
-TOTAL_IC = 1  # nombre de BMS en daisy chain
+TOTAL_IC = 1  # nombre de BMS en daisy chain (peut aussi être fixé par init(total_ic))
 NB_CELLS = 13  # nombre de cellules par BMS
+CELL_CHANNELS = 12  # nombre de voies de mesure de cellules d'un LTC6811
 
 ENABLED = 1
 DISABLED = 0
@@ -64,6 +63,15 @@ PRINT_PEC = DISABLED  # This is to ENABLE or DISABLE printing the PEC Error Coun
 # END SETUP
 #####################################
 
+# Codes ICOM/FCOM du registre COMM pour l'I2C (voir datasheet LTC6811)
+I2C_START = 0b0110
+I2C_STOP = 0b0001
+I2C_BLANK = 0b0000
+I2C_ACK = 0b0000
+I2C_NACK = 0b1000
+I2C_NACKSTOP = 0b1001
+ADG728 = 0b10011  # 5 bits de poids fort de l'adresse du mux ADG728 (see datasheet)
+
 ##Additional specific functions
 
 
@@ -104,7 +112,11 @@ def LTC6811_set_discharge(Cell: int, total_ic: int) -> None:
             break
 
 
-def init():
+def init(total_ic: int = None):
+    """Initialise the driver for a chain of total_ic LTC6811 (TOTAL_IC by default)"""
+    global TOTAL_IC
+    if total_ic is not None:
+        TOTAL_IC = total_ic
     ########################################################
     # Global Battery Variables received from 681x commands.
     # These variables store the results from the LTC6811
@@ -146,12 +158,8 @@ def init():
     # Device is the chip select pin. Set to 0 or 1, depending on the connections
     device = 0
 
-    # Open a connection to a specific bus and device (chip select pin)
-    spi.open(bus, device)
-
-    # Set SPI speed and mode
-    spi.max_speed_hz = MAX_SPEED_HZ
-    spi.mode = 3
+    # Open a connection to a specific bus and device (chip select pin), with SPI speed and mode
+    spi_open(bus, device, MAX_SPEED_HZ, 3)
 
     ##Initialisation
 
@@ -219,6 +227,15 @@ def start_GPIO_mes(enable_read=True):
         print_conv_time(conv_time)
 
 
+def start_cell_GPIO_mes(enable_read=True):
+    """Start Cell and GPIO 1&2 ADC Measurement in a single conversion"""
+    wakeup_sleep(TOTAL_IC)
+    LTC681x_adcvax(ADC_CONVERSION_MODE, ADC_DCP)
+    conv_time = LTC681x_pollAdc()
+    if enable_read:
+        print_conv_time(conv_time)
+
+
 def read_GPIO_v(enable_read=True):
     """Read Auxiliary Voltage registers"""
     wakeup_sleep(TOTAL_IC)
@@ -228,6 +245,74 @@ def read_GPIO_v(enable_read=True):
         print_aux(DATALOG_DISABLED)
 
 
+def poll_conversion(snapshot: config.Snapshot) -> None:
+    """Waits for the conversion in progress and adds its duration to the snapshot,
+    or counts it in snapshot.poll_timeout if it did not end before the deadline"""
+    conv_time = LTC681x_pollAdc()
+    if conv_time == POLL_TIMEOUT:
+        snapshot.poll_timeout += 1
+    else:
+        snapshot.conv_time += conv_time
+
+
+def scan(aux=True, stat=False, combined=False, enable_read=True) -> config.Snapshot:
+    """Full chain scan: wakes the chain once, runs the conversions and reads back
+    every needed register group in a single sequence of transfers.
+
+    Args
+    aux : Also convert and read the GPIO / Vref2 registers
+    stat : Also convert and read the status registers
+    combined : Convert the cells and GPIO 1&2 with a single ADCVAX conversion,
+               only the auxiliary group A is then read back (aux is ignored)
+
+    Returns the snapshot of the chain, with the achieved scan time (µs)
+    """
+    snapshot = config.Snapshot(TOTAL_IC)
+    snapshot.timestamp = time.time()
+    start = time.perf_counter()
+
+    wakeup_sleep(TOTAL_IC)
+    if combined:
+        LTC681x_adcvax(ADC_CONVERSION_MODE, ADC_DCP)
+        poll_conversion(snapshot)
+    else:
+        LTC681x_adcv(ADC_CONVERSION_MODE, ADC_DCP, CELL_CH_TO_CONVERT)
+        poll_conversion(snapshot)
+        if aux:
+            LTC681x_adax(ADC_CONVERSION_MODE, AUX_CH_TO_CONVERT)
+            poll_conversion(snapshot)
+    if stat:
+        LTC681x_adstat(ADC_CONVERSION_MODE, STAT_CH_TO_CONVERT)
+        poll_conversion(snapshot)
+
+    snapshot.pec_error += LTC681x_rdcv(SEL_ALL_REG, TOTAL_IC)
+    if combined:
+        snapshot.pec_error += LTC681x_rdaux(SEL_REG_A, TOTAL_IC)  # GPIO 1, 2 (and 3)
+    elif aux:
+        snapshot.pec_error += LTC681x_rdaux(SEL_ALL_REG, TOTAL_IC)
+    if stat:
+        snapshot.pec_error -= LTC681x_rdstat(SEL_ALL_REG, TOTAL_IC)  # -1 on PEC error
+
+    snapshot.scan_time = (time.perf_counter() - start) * 1e6
+
+    ic_reg = config.BMS_IC[0].ic_reg
+    snapshot.c_codes = config.PACK.cell_codes[:, : ic_reg.cell_channels].copy()
+    if combined:
+        snapshot.a_codes = config.PACK.aux_codes[:, :2].copy()
+    elif aux:
+        snapshot.a_codes = config.PACK.aux_codes[:, : ic_reg.aux_channels].copy()
+    if stat:
+        snapshot.stat_codes = config.PACK.stat_codes[:, : ic_reg.stat_channels].copy()
+
+    if enable_read:
+        print_conv_time(snapshot.conv_time)
+        print_scan_time(snapshot.scan_time)
+        print_cells(DATALOG_DISABLED)
+        if aux or combined:
+            print_aux(DATALOG_DISABLED)
+    return snapshot
+
+
 def enable_DSC(pin: int, enable_read=True):
     """Enable a discharge transistor
     cell : the cell to discharge"""
@@ -296,30 +381,27 @@ def write_byte_i2c_communication(data: List[int], enable_read=True):
         print_rxcomm()  # Print received data into the comm register
 
 
+def mux_comm_data(adr: int, pins: int) -> List[int]:
+    """Build the 6 bytes of the COMM register writing the switch byte pins into the ADG728 mux of address adr
+    ***HOMEMADE***
+    """
+    address = (ADG728 << 3) | (adr << 1) | 0  # Read Write bit is low for writing
+    return [
+        nibbles(I2C_START, address >> 4),
+        nibbles(address, I2C_ACK),
+        nibbles(I2C_BLANK, pins >> 4),
+        nibbles(pins, I2C_ACK),
+        nibbles(I2C_STOP, I2C_BLANK),
+        nibbles(I2C_BLANK, I2C_ACK),
+    ]
+
+
 def reset_mux(enable_read=True):
     """Set Mux to no output/input
     ***HOMEMADE***
     """
-    START = [0, 1, 1, 0]
-    STOP = [0, 0, 0, 1]
-    BLANK = [0, 0, 0, 0]
-    ACK = [0, 0, 0, 0]
-    NACK = [1, 0, 0, 0]
-    NACKSTOP = [1, 0, 0, 1]
-    ADG728 = [1, 0, 0, 1, 1]  # Adress of Mux ADG728 (see datasheet)
-    PINBIN = [0] * 8
-    RW = [0]
-
-    ADR = [[0, 0], [0, 1]]
-    for adrbits in ADR:
-        data = []
-        data.append(bin2int(START + ADG728[:4]))
-        data.append(bin2int(ADG728[4:] + adrbits + RW + ACK))
-        data.append(bin2int(BLANK + PINBIN[:4]))
-        data.append(bin2int(PINBIN[4:] + ACK))
-        data.append(bin2int(STOP + BLANK))
-        data.append(bin2int(BLANK + ACK))
-        write_byte_i2c_communication(data, enable_read)
+    for adr in (0b00, 0b01):
+        write_byte_i2c_communication(mux_comm_data(adr, 0x00), enable_read)
 
 
 def select_mux_pin(pin: int, enable_read=True):
@@ -329,33 +411,17 @@ def select_mux_pin(pin: int, enable_read=True):
     ***HOMEMADE***
     """
     reset_mux()
-    data = []
-    START = [0, 1, 1, 0]
-    STOP = [0, 0, 0, 1]
-    BLANK = [0, 0, 0, 0]
-    ACK = [0, 0, 0, 0]
-    NACK = [1, 0, 0, 0]
-    NACKSTOP = [1, 0, 0, 1]
-    ADG728 = [1, 0, 0, 1, 1]  # Adress of Mux ADG728 (see datasheet)
-    RW = [0]  # Read Write bit is low for writing
-    PINBIN = [0, 0, 0, 0, 0, 0, 0, 0]
     if 0 < pin <= 8:  # Select the first or the second mux
-        ADR = [0, 0]
-        PINBIN[7 - pin + 1] = 1
+        adr = 0b00
+        pins = 1 << (pin - 1)
     elif 8 < pin <= 16:
-        ADR = [0, 1]
-        PINBIN[7 - (pin - 8) + 1] = 1
+        adr = 0b01
+        pins = 1 << (pin - 9)
     else:
         print("N° de pin invalide")
         return
-    data.append(bin2int(START + ADG728[:4]))
-    data.append(bin2int(ADG728[4:] + ADR + RW + ACK))
-    data.append(bin2int(BLANK + PINBIN[:4]))
-    data.append(bin2int(PINBIN[4:] + ACK))
-    data.append(bin2int(STOP + BLANK))
-    data.append(bin2int(BLANK + ACK))
 
-    write_byte_i2c_communication(data, enable_read)
+    write_byte_i2c_communication(mux_comm_data(adr, pins), enable_read)
 
 
 def set_GPIO_PIN(enable_read=True):
@@ -380,9 +446,26 @@ def print_conv_time(conv_time: int) -> None:
     """
     m_factor = 1000  # to print in ms
 
+    if conv_time == POLL_TIMEOUT:
+        print("Conversion timed out\n")
+        return
     print("Conversion completed in:", "{:.1f}".format(conv_time / m_factor), "ms\n")
 
 
+def print_scan_time(scan_time: float) -> None:
+    """
+    Function to print the duration of a full chain scan.
+
+    Args:
+        scan_time (float): The scan time in µs.
+    """
+    print(
+        "Chain scan ({} IC) completed in:".format(TOTAL_IC),
+        "{:.1f}".format(scan_time / 1000),
+        "ms ({:.1f} Hz)\n".format(1e6 / scan_time),
+    )
+
+
 def check_error(error: int) -> None:
     """
     Function to check error flag and print PEC error message.
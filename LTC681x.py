@@ -1,10 +1,13 @@
 import time
-import spidev
+import numpy as np
 
 from typing import List
+from bitcodec import bin2int, int2bin
+from transport import SpiTransport, SpidevTransport
+from instrumentation import timed
 import config
 
-spi = spidev.SpiDev()
+spi: SpiTransport = SpidevTransport()  # Replaced by set_transport (e.g. emulator.DaisyChainEmulator)
 
 ###Variables
 
@@ -66,6 +69,11 @@ PULL_DOWN_CURRENT = 0
 
 # Number of received bytes
 NUM_RX_BYT = 8
+BYT_IN_REG = 6  # Data bytes per register group, followed by 2 bytes of PEC
+CELL_IN_REG = 3  # Voltage codes per register group
+
+# Raw layout of one IC in a voltage register group read
+REG_DTYPE = np.dtype([("codes", "<u2", (CELL_IN_REG,)), ("pec", ">u2")])
 
 # Register types
 CELL = 1
@@ -76,6 +84,60 @@ CFGRB = 4
 
 MAX_SPEED_HZ = int(1e6)
 
+# Typical conversion times in µs for all channels (datasheet LTC6811, conversion times tables),
+# indexed by the conversion command then by MD, as (ADCOPT = 0, ADCOPT = 1)
+CONV_TIME_US = {
+    "ADCV": {
+        MD_27KHZ_14KHZ: (1113, 1288),
+        MD_7KHZ_3KHZ: (2335, 3033),
+        MD_26HZ_2KHZ: (201317, 4407),
+        MD_422HZ_1KHZ: (12807, 7061),
+    },
+    "ADAX": {
+        MD_27KHZ_14KHZ: (1825, 2116),
+        MD_7KHZ_3KHZ: (3862, 5025),
+        MD_26HZ_2KHZ: (335498, 7353),
+        MD_422HZ_1KHZ: (21316, 11803),
+    },
+    "ADSTAT": {
+        MD_27KHZ_14KHZ: (742, 858),
+        MD_7KHZ_3KHZ: (1556, 2022),
+        MD_26HZ_2KHZ: (134211, 2941),
+        MD_422HZ_1KHZ: (8537, 4707),
+    },
+    "ADCVSC": {
+        MD_27KHZ_14KHZ: (1273, 1473),
+        MD_7KHZ_3KHZ: (2671, 3469),
+        MD_26HZ_2KHZ: (230080, 5040),
+        MD_422HZ_1KHZ: (14643, 8071),
+    },
+    "ADCVAX": {
+        MD_27KHZ_14KHZ: (1564, 1736),
+        MD_7KHZ_3KHZ: (3428, 4327),
+        MD_26HZ_2KHZ: (268543, 6040),
+        MD_422HZ_1KHZ: (17075, 9433),
+    },
+}
+
+POLL_BURST = 32  # Number of bytes clocked per PLADC poll (8 µs per byte at 1 MHz)
+POLL_TIMEOUT_FACTOR = 4  # The poll gives up after this many times the expected conversion time
+POLL_MIN_TIMEOUT = 20e-3  # s, minimum time given to a conversion that was not started by this module
+POLL_TIMEOUT = -1  # Returned by LTC681x_pollAdc when the conversion did not end before its deadline
+
+# isoSPI / core timeouts (datasheet LTC6811 minimum values, with margin)
+T_IDLE = 4.3e-3 - 0.5e-3  # s, isoSPI goes to IDLE after tIDLE without activity
+T_SLEEP = 1.8 - 0.3  # s, the core goes to SLEEP after tSLEEP without a valid command
+
+# Wake-state tracker, updated by xfer (time.perf_counter())
+last_activity = float("-inf")  # Last transfer of any kind on the bus
+last_command = float("-inf")  # Last command sent to the chain
+
+# State of the last started conversion, used by LTC681x_pollAdc
+ADCOPT_BIT = 0
+conv_start = 0.0  # time.perf_counter() when the last conversion command was sent
+conv_expected_us = 0  # Expected duration of the last conversion
+poll_timeouts = 0  # Number of LTC681x_pollAdc calls that gave up before the end of the conversion
+
 CMD = {
     "STCOMM": [1, 1, 1, 0, 0, 1, 0, 0, 0, 1, 1],
     "RDCOMM": [1, 1, 1, 0, 0, 1, 0, 0, 0, 1, 0],
@@ -111,85 +173,172 @@ CMD = {
     "DIAGN": [1, 1, 1, 0, 0, 0, 1, 0, 1, 0, 1],
 }
 
-###Utilitaires divers
+###PEC15 (Packet Error Code)
 
+PEC15_POLY = 0x4599  # Polynôme générateur du PEC15 (voir datasheet LTC6811)
+PEC15_SEED = 16  # Valeur initiale du registre PEC
 
-def bin2int(binval: List[bool]) -> int:
+
+def _build_pec15_table() -> List[int]:
     """
-    Convertit une liste de bits en entier.
+    Precomputes the 256-entry PEC15 table (one entry per possible input byte).
     """
-    st = ""
-    for x in binval:
-        st += str(x)
-    return int(st, 2)
+    table = []
+    for byte in range(256):
+        remainder = byte << 7
+        for _ in range(8):
+            if remainder & 0x4000:
+                remainder = (remainder << 1) ^ PEC15_POLY
+            else:
+                remainder <<= 1
+        table.append(remainder & 0xFFFF)
+    return table
 
 
-def int2bin(nb: int) -> List[bool]:
+PEC15_TABLE = _build_pec15_table()
+
+
+def pec15(data) -> int:
     """
-    Convertit un entier en liste de bits.
+    Computes the 16-bit PEC of a byte sequence (bytes, bytearray, memoryview or list of ints).
+
+    Returns:
+        int: The PEC word, MSB first on the bus.
     """
-    if nb < 0:
-        nb = -nb
-    binst = bin(nb)
-    nb0 = 8 * ((len(binst[2:]) - 1) // 8 + 1) - len(binst) + 2
-    res = [0] * nb0
-    for x in binst[2:]:
-        res.append(int(x))
-    return res
+    table = PEC15_TABLE
+    remainder = PEC15_SEED
+    for byte in data:
+        address = ((remainder >> 7) ^ byte) & 0xFF
+        remainder = ((remainder << 8) ^ table[address]) & 0xFFFF
+    return (remainder << 1) & 0xFFFF
 
 
-def create_bin_for_pec(data):
-    res = []
-    for x in data:
-        res += int2bin(x)
-    return res
+def pec15_calc(nb_byte: int, data: List[int]):
+    pec = pec15(data[:nb_byte])
+    return pec >> 8, pec & 0xFF
+
+
+def cmd_word(cmd: List[bool]) -> List[int]:
+    """
+    Builds the 4-byte command word (2 command bytes + 2 PEC bytes) for a CMD entry.
+    """
+    return conv_word(bin2int(cmd))
 
 
-def pec15_calc(nb_byte: int, data: List[bool]):
-    bindata = create_bin_for_pec(data[:nb_byte])
-    pecbin = calcul_PEC(bindata)
-    return bin2int(pecbin[:8]), bin2int(pecbin[8:])
+def conv_word(code: int) -> List[int]:
+    """
+    Builds the 4-byte command word for an 11-bit conversion command code.
+    """
+    word = [code >> 8, code & 0xFF]
+    pec = pec15(word)
+    return word + [pec >> 8, pec & 0xFF]
 
 
-def XOR(a, b):
-    """Simple fonction XOR"""
-    if a != b:
-        return 1
-    else:
-        return 0
-
-
-def calcul_PEC(Din: list):
-    """Calcul du PEC pour le mot binaire Din"""
-    PEC = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0][::-1]
-    for bit in Din:
-        IN0 = XOR(bit, PEC[14])
-        IN3 = XOR(IN0, PEC[2])
-        IN4 = XOR(IN0, PEC[3])
-        IN7 = XOR(IN0, PEC[6])
-        IN8 = XOR(IN0, PEC[7])
-        IN10 = XOR(IN0, PEC[9])
-        IN14 = XOR(IN0, PEC[13])
-
-        PEC[14] = IN14
-        PEC[13] = PEC[12]
-        PEC[12] = PEC[11]
-        PEC[11] = PEC[10]
-        PEC[10] = IN10
-        PEC[9] = PEC[8]
-        PEC[8] = IN8
-        PEC[7] = IN7
-        PEC[6] = PEC[5]
-        PEC[5] = PEC[4]
-        PEC[4] = IN4
-        PEC[3] = IN3
-        PEC[2] = PEC[1]
-        PEC[1] = PEC[0]
-        PEC[0] = IN0
-    res = [0] + PEC
-    return res[::-1]
+###Command frame cache
+# Every command word is computed once at import, sending a command is then a lookup.
+
+CMD_FRAME = {name: cmd_word(cmd) for name, cmd in CMD.items()}
+
+RDCV_FRAME = {
+    1: CMD_FRAME["RDCVA"],
+    2: CMD_FRAME["RDCVB"],
+    3: CMD_FRAME["RDCVC"],
+    4: CMD_FRAME["RDCVD"],
+    5: CMD_FRAME["RDCVE"],
+    6: CMD_FRAME["RDCVF"],
+}
+RDAUX_FRAME = {
+    1: CMD_FRAME["RDAUXA"],
+    2: CMD_FRAME["RDAUXB"],
+    3: CMD_FRAME["RDAUXC"],
+    4: CMD_FRAME["RDAUXD"],
+}
+RDSTAT_FRAME = {
+    1: CMD_FRAME["RDSTATA"],
+    2: CMD_FRAME["RDSTATB"],
+}
+
+MD_MODES = (MD_422HZ_1KHZ, MD_27KHZ_14KHZ, MD_7KHZ_3KHZ, MD_26HZ_2KHZ)
+DCP_MODES = (DCP_DISABLED, DCP_ENABLED)
+
+# Conversion commands (see datasheet Table 38): MD on bits 8-7, DCP on bit 4
+ADCV_FRAME = {
+    (MD, DCP, CH): conv_word(0x260 | (MD << 7) | (DCP << 4) | CH)
+    for MD in MD_MODES
+    for DCP in DCP_MODES
+    for CH in range(CELL_CH_ALL, CELL_CH_6and12 + 1)
+}
+ADAX_FRAME = {
+    (MD, CHG): conv_word(0x460 | (MD << 7) | CHG)
+    for MD in MD_MODES
+    for CHG in range(AUX_CH_ALL, AUX_CH_VREF2 + 1)
+}
+ADSTAT_FRAME = {
+    (MD, CHST): conv_word(0x468 | (MD << 7) | CHST)
+    for MD in MD_MODES
+    for CHST in range(STAT_CH_ALL, STAT_CH_VREGD + 1)
+}
+ADCVSC_FRAME = {
+    (MD, DCP): conv_word(0x467 | (MD << 7) | (DCP << 4))
+    for MD in MD_MODES
+    for DCP in DCP_MODES
+}
+ADCVAX_FRAME = {
+    (MD, DCP): conv_word(0x46F | (MD << 7) | (DCP << 4))
+    for MD in MD_MODES
+    for DCP in DCP_MODES
+}
 
 
+def set_transport(transport: SpiTransport) -> None:
+    """
+    Selects the SPI transport used by the driver (real bus or emulator).
+    The wake-state tracker is reset since nothing is known about the new chain.
+
+    Args:
+        transport (SpiTransport): The new transport, opened by spi_open.
+    """
+    global spi, last_activity, last_command
+    spi = transport
+    last_activity = float("-inf")
+    last_command = float("-inf")
+
+
+def spi_open(bus: int, device: int, max_speed_hz: int, mode: int) -> None:
+    """
+    Opens the current SPI transport.
+
+    Args:
+        bus (int): SPI bus number.
+        device (int): Chip select line.
+        max_speed_hz (int): SPI clock frequency.
+        mode (int): SPI mode (clock polarity and phase).
+    """
+    spi.max_speed_hz = max_speed_hz
+    spi.mode = mode
+    spi.open(bus, device)
+
+
+def xfer(data: List[int], command=True) -> List[int]:
+    """
+    Single entry point to the SPI bus, records the bus activity for the wake-state tracker.
+
+    Args:
+        data (List[int]): Bytes to transfer.
+        command (bool): The transfer starts with a command (resets the core watchdog).
+
+    Returns:
+        List[int]: Bytes read during the transfer.
+    """
+    global last_activity, last_command
+    res = spi.xfer3(data)
+    last_activity = time.perf_counter()
+    if command:
+        last_command = last_activity
+    return res
+
+
+@timed("spi_write_read")
 def spi_write_read(tx_data: List[int], rx_len: int) -> None:
     """
     Writes and reads a set number of bytes using the SPI port.
@@ -201,101 +350,88 @@ def spi_write_read(tx_data: List[int], rx_len: int) -> None:
     Returns:
         List[int]: Array of readed value
     """
-    data = spi.xfer3(tx_data + [255] * rx_len)
+    data = xfer(tx_data + [255] * rx_len)
     return data[len(tx_data) :]
 
 
 ###Fonctions de la LTC
-def wakeup_idle(total_ic: int):
-    """Wake isoSPI up from IDlE state and enters the READY state"""
+def wakeup_idle(total_ic: int, force=False):
+    """Wake isoSPI up from IDlE state and enters the READY state.
+    Skipped while the isoSPI is known to be READY, unless force is set"""
+    if not force and time.perf_counter() - last_activity < T_IDLE:
+        return
     for _ in range(total_ic):
-        spi.xfer3([0xFF])
-
-
-def wakeup_sleep(total_ic: int, f_hz=MAX_SPEED_HZ):
-    """Generic wakeup command to wake the LTC681x from sleep state"""
-    # LTC681x_rdcfg(total_ic)
+        xfer([0xFF], command=False)
+
+
+def wakeup_sleep(total_ic: int, f_hz=MAX_SPEED_HZ, force=False):
+    """Generic wakeup command to wake the LTC681x from sleep state.
+    Only sends what the chain needs according to the time elapsed since the
+    last bus activity (nothing, an idle wakeup or a sleep wakeup), unless force is set"""
+    global last_command
+    if not force and time.perf_counter() - last_command < T_SLEEP:
+        # The core is still awake, at most the isoSPI went IDLE
+        wakeup_idle(total_ic)
+        return
     for _ in range(total_ic):
 
-        spi.xfer3([255] * int(300 * 1e-6 * f_hz))
+        xfer([255] * int(300 * 1e-6 * f_hz), command=False)
         time.sleep(10 * 1e-6)
+    last_command = time.perf_counter()  # The watchdog restarts once the core is awake
 
 
-def cmd_68(cmd: List[bool]):
+@timed("cmd_68")
+def cmd_68(cmd: List[int]):
     """Generic function to write 68xx commands.\n
-    Function calculates PEC for cmd data."""
-    cmdbit = [0, 0, 0, 0, 0] + cmd[:3] + cmd[3:]
-    pec = calcul_PEC(cmdbit)
-    word = [
-        bin2int(cmdbit[:8]),
-        bin2int(cmdbit[8:]),
-        bin2int(pec[:8]),
-        bin2int(pec[8:]),
-    ]
-    spi.xfer3(word)
+    cmd is a precompiled command frame (see CMD_FRAME)."""
+    xfer(cmd)
 
 
+@timed("write_68")
 def write_68(
     total_ic: int,
-    cmd: List[bool],
+    cmd: List[int],
     data: List[int],
 ):
     """Generic function to write 68xx commands and write payload data. \n
-    Function calculates PEC for cmd data and the data to be transmitted."""
+    cmd is a precompiled command frame, the function calculates PEC for the data to be transmitted."""
     BYTES_IN_REG = 6
 
-    cmdbit = [0, 0, 0, 0, 0] + cmd[:3] + cmd[3:]
-    pec = calcul_PEC(cmdbit)
-    word = [0] * (4 + 8 * total_ic)
-    word[0] = bin2int(cmdbit[:8])
-    word[1] = bin2int(cmdbit[8:])
-    word[2] = bin2int(pec[:8])
-    word[3] = bin2int(pec[8:])
+    word = bytearray(4 + 8 * total_ic)
+    word[:4] = cmd
 
     cmd_index = 4
     for current_ic in range(1, total_ic + 1)[::-1]:
         # Executes for each LTC681x, this loops starts with the last IC on the stack.
-        for current_byte in range(BYTES_IN_REG):
-            # The first configuration written is received by the last IC in the daisy chain
-            word[cmd_index] = data[((current_ic - 1) * 6) + current_byte]
-            cmd_index += 1
-        data_pec = pec15_calc(BYTES_IN_REG, data[((current_ic - 1) * 6) :])
-        word[cmd_index] = data_pec[0]
-        word[cmd_index + 1] = data_pec[1]
+        # The first configuration written is received by the last IC in the daisy chain
+        reg = data[(current_ic - 1) * BYTES_IN_REG : current_ic * BYTES_IN_REG]
+        word[cmd_index : cmd_index + BYTES_IN_REG] = bytes(reg)
+        data_pec = pec15(reg)
+        word[cmd_index + BYTES_IN_REG] = data_pec >> 8
+        word[cmd_index + BYTES_IN_REG + 1] = data_pec & 0xFF
 
-        cmd_index += 2
+        cmd_index += BYTES_IN_REG + 2
 
-    spi.xfer3(word)
+    xfer(word)
 
 
-def read_68(total_ic: int, cmd: List[bool]):
+@timed("read_68")
+def read_68(total_ic: int, cmd: List[int]):
     """Generic function to write 68xx commands and read data. \n
-    Function calculated PEC for cmd data"""
+    cmd is a precompiled command frame (see CMD_FRAME)."""
 
     BYTES_IN_REG = 8
     pec_error = 0
 
-    cmdbit = [0, 0, 0, 0, 0] + cmd[:3] + cmd[3:]
-    pec = calcul_PEC(cmdbit)
-    word = [0] * 4
-    word[0] = bin2int(cmdbit[:8])
-    word[1] = bin2int(cmdbit[8:])
-    word[2] = bin2int(pec[:8])
-    word[3] = bin2int(pec[8:])
-
-    data = spi_write_read(word, (BYTES_IN_REG) * total_ic)
-    res = [0] * len(data)
+    data = spi_write_read(cmd, (BYTES_IN_REG) * total_ic)
+    res = data
 
-    for current_ic in range(total_ic):
-        for current_byte in range(BYTES_IN_REG):
-            res[(current_ic * 8) + current_byte] = data[
-                current_byte + (current_ic * BYTES_IN_REG)
-            ]
-
-    received_pec = (res[(current_ic * 8) + 6], res[(current_ic * 8) + 7])
-    data_pec = pec15_calc(6, data[((current_ic) * 6) :])
-    if received_pec != data_pec:
-        pec_error = -1
+    # The PEC of every IC on the stack is checked against the received one
+    frames = memoryview(bytes(res))
+    for offset in range(0, BYTES_IN_REG * total_ic, BYTES_IN_REG):
+        if pec15(frames[offset : offset + 6]) != (frames[offset + 6] << 8) | frames[offset + 7]:
+            pec_error = -1
+            break
 
     return res, pec_error
 
@@ -307,7 +443,7 @@ def LTC681x_wrcfg(total_ic: int):
     :param total_ic: The number of ICs being written to.
     :param ic: A list of CellASIC objects that contain the configuration data to be written.
     """
-    cmd = CMD["WRCGFA"]
+    cmd = CMD_FRAME["WRCGFA"]
     write_buffer = [0 for _ in range(6 * (total_ic))]
     write_count = 0
 
@@ -330,7 +466,7 @@ def LTC681x_wrcfgb(total_ic: int):
     :param total_ic: The number of ICs being written to.
     :param ic: A list of CellASIC objects that contain the configuration data to be written.
     """
-    cmd = CMD["WRCGFB"]
+    cmd = CMD_FRAME["WRCFGB"]
     write_buffer = [0] * 256
     write_count = 0
 
@@ -355,7 +491,7 @@ def LTC681x_rdcfg(total_ic: int) -> int:
     :param ic: A list of CellASIC objects where the function stores the read configuration data.
     :return: PEC error status.
     """
-    cmd = CMD["RDCFGA"]
+    cmd = CMD_FRAME["RDCFGA"]
     pec_error = 0
 
     read_buffer, pec_error = read_68(total_ic, cmd)
@@ -371,7 +507,7 @@ def LTC681x_rdcfg(total_ic: int) -> int:
                 byte + (8 * current_ic)
             ]
 
-        calc_pec = pec15_calc(6, read_buffer[8 * current_ic :])
+        calc_pec = pec15_calc(6, read_buffer[8 * current_ic : 8 * current_ic + 6])
         data_pec = (
             read_buffer[6 + (8 * current_ic)],
             read_buffer[7 + (8 * current_ic)],
@@ -394,7 +530,7 @@ def LTC681x_rdcfgb(total_ic: int) -> int:
     :param ic: A list of CellASIC objects where the function stores the read configuration data.
     :return: PEC error status.
     """
-    cmd = CMD["RDCFGB"]
+    cmd = CMD_FRAME["RDCFGB"]
     read_buffer = [0] * 256
     pec_error = 0
 
@@ -411,7 +547,7 @@ def LTC681x_rdcfgb(total_ic: int) -> int:
                 byte + (8 * current_ic)
             ]
 
-        calc_pec = pec15_calc(6, read_buffer[8 * current_ic :])
+        calc_pec = pec15_calc(6, read_buffer[8 * current_ic : 8 * current_ic + 6])
         data_pec = (
             read_buffer[6 + (8 * current_ic)],
             read_buffer[7 + (8 * current_ic)],
@@ -451,32 +587,23 @@ def LTC681x_check_pec(total_ic: int, reg: int):
                 current_ic
             ].configb.rx_pec_match
     elif reg == CELL:
-        for current_ic in range(total_ic):
-            for i in range(config.BMS_IC[0].ic_reg.num_cv_reg):
-                config.BMS_IC[current_ic].crc_count.pec_count += config.BMS_IC[
-                    current_ic
-                ].cells.pec_match[i]
-                config.BMS_IC[current_ic].crc_count.cell_pec[i] += config.BMS_IC[
-                    current_ic
-                ].cells.pec_match[i]
+        num_reg = config.BMS_IC[0].ic_reg.num_cv_reg
+        pack = config.PACK
+        errors = pack.cell_pec[:total_ic, :num_reg]
+        pack.pec_count[:total_ic] += errors.sum(axis=1, dtype=np.int64)
+        pack.cell_pec_count[:total_ic, :num_reg] += errors
     elif reg == AUX:
-        for current_ic in range(total_ic):
-            for i in range(config.BMS_IC[0].ic_reg.num_gpio_reg):
-                config.BMS_IC[current_ic].crc_count.pec_count += config.BMS_IC[
-                    current_ic
-                ].aux.pec_match[i]
-                config.BMS_IC[current_ic].crc_count.aux_pec[i] += config.BMS_IC[
-                    current_ic
-                ].aux.pec_match[i]
+        num_reg = config.BMS_IC[0].ic_reg.num_gpio_reg
+        pack = config.PACK
+        errors = pack.aux_pec[:total_ic, :num_reg]
+        pack.pec_count[:total_ic] += errors.sum(axis=1, dtype=np.int64)
+        pack.aux_pec_count[:total_ic, :num_reg] += errors
     elif reg == STAT:
-        for current_ic in range(total_ic):
-            for i in range(config.BMS_IC[0].ic_reg.num_stat_reg - 1):
-                config.BMS_IC[current_ic].crc_count.pec_count += config.BMS_IC[
-                    current_ic
-                ].stat.pec_match[i]
-                config.BMS_IC[current_ic].crc_count.stat_pec[i] += config.BMS_IC[
-                    current_ic
-                ].stat.pec_match[i]
+        num_reg = config.BMS_IC[0].ic_reg.num_stat_reg - 1
+        pack = config.PACK
+        errors = pack.stat_pec[:total_ic, :num_reg]
+        pack.pec_count[:total_ic] += errors.sum(axis=1, dtype=np.int64)
+        pack.stat_pec_count[:total_ic, :num_reg] += errors
 
 
 def LTC681x_adcv(MD: int, DCP: int, CH: int):
@@ -487,14 +614,7 @@ def LTC681x_adcv(MD: int, DCP: int, CH: int):
     :param DCP: Discharge Permit.
     :param CH: Cell Channels to be measured.
     """
-    cmd = [0, 0]
-    md_bits = (MD & 0x02) >> 1
-    cmd[0] = md_bits + 0x02
-    md_bits = (MD & 0x01) << 7
-    cmd[1] = md_bits + 0x60 + (DCP << 4) + CH
-    cmdbits = int2bin(cmd[0]) + int2bin(cmd[1])
-
-    cmd_68(cmdbits[5:])
+    start_conversion(ADCV_FRAME[MD, DCP, CH], "ADCV", MD)
 
 
 def LTC681x_adax(MD: int, CHG: int):
@@ -504,14 +624,7 @@ def LTC681x_adax(MD: int, CHG: int):
     :param MD: ADC Mode.
     :param CHG: GPIO Channels to be measured.
     """
-    cmd = [0, 0]
-    md_bits = (MD & 0x02) >> 1
-    cmd[0] = md_bits + 0x04
-    md_bits = (MD & 0x01) << 7
-    cmd[1] = md_bits + 0x60 + CHG
-    cmdbits = int2bin(cmd[0]) + int2bin(cmd[1])
-
-    cmd_68(cmdbits[5:])
+    start_conversion(ADAX_FRAME[MD, CHG], "ADAX", MD)
 
 
 def LTC681x_adstat(MD: int, CHST: int):
@@ -521,14 +634,7 @@ def LTC681x_adstat(MD: int, CHST: int):
     :param MD: ADC Mode.
     :param CHST: Stat Channels to be measured.
     """
-    cmd = [0, 0]
-    md_bits = (MD & 0x02) >> 1
-    cmd[0] = md_bits + 0x04
-    md_bits = (MD & 0x01) << 7
-    cmd[1] = md_bits + 0x68 + CHST
-    cmdbits = int2bin(cmd[0]) + int2bin(cmd[1])
-
-    cmd_68(cmdbits[5:])
+    start_conversion(ADSTAT_FRAME[MD, CHST], "ADSTAT", MD)
 
 
 def LTC681x_adcvsc(MD: int, DCP: int):
@@ -538,14 +644,7 @@ def LTC681x_adcvsc(MD: int, DCP: int):
     :param MD: ADC Mode.
     :param DCP: Discharge Permit.
     """
-    cmd = [0, 0]
-    md_bits = (MD & 0x02) >> 1
-    cmd[0] = md_bits | 0x04
-    md_bits = (MD & 0x01) << 7
-    cmd[1] = md_bits | 0x60 | (DCP << 4) | 0x07
-    cmdbits = int2bin(cmd[0]) + int2bin(cmd[1])
-
-    cmd_68(cmdbits[5:])
+    start_conversion(ADCVSC_FRAME[MD, DCP], "ADCVSC", MD)
 
 
 def LTC681x_adcvax(MD: int, DCP: int):
@@ -555,14 +654,7 @@ def LTC681x_adcvax(MD: int, DCP: int):
     :param MD: ADC Mode.
     :param DCP: Discharge Permit.
     """
-    cmd = [0, 0]
-    md_bits = (MD & 0x02) >> 1
-    cmd[0] = md_bits | 0x04
-    md_bits = (MD & 0x01) << 7
-    cmd[1] = md_bits | ((DCP & 0x01) << 4) + 0x6F
-    cmdbits = int2bin(cmd[0]) + int2bin(cmd[1])
-
-    cmd_68(cmdbits[5:])
+    start_conversion(ADCVAX_FRAME[MD, DCP & 0x01], "ADCVAX", MD)
 
 
 def LTC681x_rdcv(reg: int, total_ic: int) -> int:
@@ -574,47 +666,21 @@ def LTC681x_rdcv(reg: int, total_ic: int) -> int:
 
     :param reg: Controls which cell voltage register is read back.
     :param total_ic: The number of ICs in the system.
-    :param ic: Array of the parsed cell codes.
     :return: PEC error count.
     """
-    pec_error = 0
-    c_ic = 0
-
     if reg == 0:
-        for cell_reg in range(1, config.BMS_IC[0].ic_reg.num_cv_reg + 1):
-            cell_data = LTC681x_rdcv_reg(cell_reg, total_ic)
-            for current_ic in range(total_ic):
-                if not config.BMS_IC[current_ic].isospi_reverse:
-                    c_ic = current_ic
-                else:
-                    c_ic = total_ic - current_ic - 1
-
-                pec_error += parse_cells(
-                    current_ic,
-                    cell_reg,
-                    cell_data,
-                    config.BMS_IC[c_ic].cells.c_codes,
-                    config.BMS_IC[c_ic].cells.pec_match,
-                )
+        regs = range(1, config.BMS_IC[0].ic_reg.num_cv_reg + 1)
     else:
-        cell_data = LTC681x_rdcv_reg(reg, total_ic)
-        for current_ic in range(total_ic):
-            if not config.BMS_IC[current_ic].isospi_reverse:
-                c_ic = current_ic
-            else:
-                c_ic = total_ic - current_ic - 1
+        regs = range(reg, reg + 1)
+    codes, pec_error = read_reg_groups(LTC681x_rdcv_reg, regs, total_ic)
 
-            pec_error += parse_cells(
-                current_ic,
-                reg,
-                cell_data[8 * c_ic :],
-                config.BMS_IC[c_ic].cells.c_codes,
-                config.BMS_IC[c_ic].cells.pec_match,
-            )
+    first = (regs[0] - 1) * CELL_IN_REG
+    config.PACK.cell_codes[:total_ic, first : first + codes.shape[1]] = codes
+    config.PACK.cell_pec[:total_ic, regs[0] - 1 : regs[-1]] = pec_error
 
     LTC681x_check_pec(total_ic, CELL)
 
-    return pec_error
+    return int(pec_error.sum())
 
 
 def LTC681x_rdaux(reg: int, total_ic: int) -> int:
@@ -625,47 +691,63 @@ def LTC681x_rdaux(reg: int, total_ic: int) -> int:
 
     :param reg: Determines which GPIO voltage register is read back.
     :param total_ic: The number of ICs in the system.
-    :param ic: A two dimensional array of the gpio voltage codes.
     :return: PEC error count.
     """
-    pec_error = 0
-    c_ic = 0
-
     if reg == 0:
-        for gpio_reg in range(1, config.BMS_IC[0].ic_reg.num_gpio_reg + 1):
-            data = LTC681x_rdaux_reg(gpio_reg, total_ic)
-            for current_ic in range(total_ic):
-                if not config.BMS_IC[current_ic].isospi_reverse:
-                    c_ic = current_ic
-                else:
-                    c_ic = total_ic - current_ic - 1
-
-                pec_error += parse_cells(
-                    current_ic,
-                    gpio_reg,
-                    data,
-                    config.BMS_IC[c_ic].aux.a_codes,
-                    config.BMS_IC[c_ic].aux.pec_match,
-                )
+        regs = range(1, config.BMS_IC[0].ic_reg.num_gpio_reg + 1)
     else:
-        data = LTC681x_rdaux_reg(reg, total_ic)
-        for current_ic in range(total_ic):
-            if not config.BMS_IC[current_ic].isospi_reverse:
-                c_ic = current_ic
-            else:
-                c_ic = total_ic - current_ic - 1
+        regs = range(reg, reg + 1)
+    codes, pec_error = read_reg_groups(LTC681x_rdaux_reg, regs, total_ic)
 
-            pec_error += parse_cells(
-                current_ic,
-                reg,
-                data,
-                config.BMS_IC[c_ic].aux.a_codes,
-                config.BMS_IC[c_ic].aux.pec_match,
-            )
+    first = (regs[0] - 1) * CELL_IN_REG
+    config.PACK.aux_codes[:total_ic, first : first + codes.shape[1]] = codes
+    config.PACK.aux_pec[:total_ic, regs[0] - 1 : regs[-1]] = pec_error
 
     LTC681x_check_pec(total_ic, AUX)
 
-    return pec_error
+    return int(pec_error.sum())
+
+
+def parse_reg_block(data: List[int], total_ic: int):
+    """
+    Decodes in bulk a raw daisy-chain read of one voltage register group
+    (3 little-endian codes + 2 bytes of PEC per IC).
+
+    :param data: Unparsed data, 8 bytes per IC.
+    :param total_ic: The number of ICs in the system.
+    :return: (codes, pec_error): (total_ic x 3) uint16 codes and per IC PEC error flags.
+    """
+    raw = bytes(data)
+    block = np.frombuffer(raw, dtype=REG_DTYPE, count=total_ic)
+    frames = memoryview(raw)
+    calc_pec = np.fromiter(
+        (pec15(frames[i : i + BYT_IN_REG]) for i in range(0, NUM_RX_BYT * total_ic, NUM_RX_BYT)),
+        dtype=np.uint16,
+        count=total_ic,
+    )
+    return block["codes"], calc_pec != block["pec"]
+
+
+def read_reg_groups(read_reg, regs, total_ic: int):
+    """
+    Reads consecutive voltage register groups and decodes them into an (IC x channel) array.
+
+    :param read_reg: Raw register group reader (LTC681x_rdcv_reg or LTC681x_rdaux_reg).
+    :param regs: Register groups to read (1: A, 2: B...).
+    :param total_ic: The number of ICs in the system.
+    :return: (codes, pec_error): (total_ic x 3 * len(regs)) uint16 codes and
+             (total_ic x len(regs)) PEC error flags (1 on error).
+    """
+    codes = np.empty((total_ic, CELL_IN_REG * len(regs)), dtype=np.uint16)
+    pec_error = np.empty((total_ic, len(regs)), dtype=np.uint8)
+    for k, reg in enumerate(regs):
+        block, block_pec = parse_reg_block(read_reg(reg, total_ic), total_ic)
+        codes[:, k * CELL_IN_REG : (k + 1) * CELL_IN_REG] = block
+        pec_error[:, k] = block_pec
+    if config.BMS_IC[0].isospi_reverse:
+        # The first IC on the stack answers last
+        return codes[::-1], pec_error[::-1]
+    return codes, pec_error
 
 
 def LTC681x_rdaux_reg(reg: int, total_ic: int):
@@ -679,25 +761,7 @@ def LTC681x_rdaux_reg(reg: int, total_ic: int):
     """
     REG_LEN = 8  # Number of bytes in the register + 2 bytes for the PEC
 
-    if reg == 1:  # Read back auxiliary group A
-        cmd = CMD["RDAUXA"]
-    elif reg == 2:  # Read back auxiliary group B
-        cmd = CMD["RDAUXB"]
-    elif reg == 3:  # Read back auxiliary group C
-        cmd = CMD["RDAUXC"]
-    elif reg == 4:  # Read back auxiliary group D
-        cmd = CMD["RDAUXD"]
-    else:  # Read back auxiliary group A
-        cmd = CMD["RDAUXA"]
-
-    cmdbit = [0, 0, 0, 0, 0] + cmd[:3] + cmd[3:]
-    pec = calcul_PEC(cmdbit)
-    word = [
-        bin2int(cmdbit[:8]),
-        bin2int(cmdbit[8:]),
-        bin2int(pec[:8]),
-        bin2int(pec[8:]),
-    ]
+    word = RDAUX_FRAME.get(reg, RDAUX_FRAME[1])  # Defaults to auxiliary group A
     data = spi_write_read(word, REG_LEN * total_ic)
     return data
 
@@ -711,78 +775,11 @@ def LTC681x_rdcv_reg(reg: int, total_ic: int):
     """
     REG_LEN = 8  # Number of bytes in each ICs register + 2 bytes for the PEC
 
-    if reg == 1:  # 1: RDCVA
-        cmd = CMD["RDCVA"]
-    elif reg == 2:  # 2: RDCVB
-        cmd = CMD["RDCVB"]
-    elif reg == 3:  # 3: RDCVC
-        cmd = CMD["RDCVC"]
-    elif reg == 4:  # 4: RDCVD
-        cmd = CMD["RDCVD"]
-    elif reg == 5:  # 5: RDCVE
-        cmd = CMD["RDCVE"]
-    elif reg == 6:  # 6: RDCVF
-        cmd = CMD["RDCVF"]
-    else:
-        cmd = CMD["RDCVA"]
-
-    cmdbit = [0, 0, 0, 0, 0] + cmd[:3] + cmd[3:]
-    pec = calcul_PEC(cmdbit)
-    word = [
-        bin2int(cmdbit[:8]),
-        bin2int(cmdbit[8:]),
-        bin2int(pec[:8]),
-        bin2int(pec[8:]),
-    ]
+    word = RDCV_FRAME.get(reg, RDCV_FRAME[1])  # 1: RDCVA ... 6: RDCVF
     data = spi_write_read(word, REG_LEN * total_ic)
     return data
 
 
-def parse_cells(
-    current_ic: int,  # Current IC
-    cell_reg: int,  # Type of register
-    cell_data: List[int],  # Unparsed data
-    cell_codes: List[int],  # Parsed data
-    ic_pec: List[int],  # PEC error
-) -> int:
-    """
-    Helper function that parses voltage measurement registers.
-
-    :param current_ic: Current IC
-    :param cell_reg: Type of register
-    :param cell_data: Unparsed data
-    :param cell_codes: Parsed data
-    :param ic_pec: PEC error
-    :return: PEC error flag (0 if no error, 1 if error)
-    """
-    BYT_IN_REG = 6
-    CELL_IN_REG = 3
-    pec_error = 0
-    data_counter = current_ic * NUM_RX_BYT  # data counter
-
-    for current_cell in range(CELL_IN_REG):
-        # This loop parses the read back data into the register codes
-        # Each code is received as two bytes and is combined to create the parsed code
-        parsed_cell = cell_data[data_counter] + (cell_data[data_counter + 1] << 8)
-        cell_codes[current_cell + ((cell_reg - 1) * CELL_IN_REG)] = parsed_cell
-
-        data_counter += 2  # Increment by two for each parsed code
-
-    # The received PEC for the current_ic is transmitted as the 7th and 8th bytes
-    received_pec = (cell_data[data_counter], cell_data[data_counter + 1])
-    data_pec = pec15_calc(
-        BYT_IN_REG, cell_data[current_ic * NUM_RX_BYT : (current_ic + 1) * NUM_RX_BYT]
-    )
-
-    if received_pec != data_pec:
-        pec_error = 1  # Set pec_error to 1 if any PEC errors
-        ic_pec[cell_reg - 1] = 1
-    else:
-        ic_pec[cell_reg - 1] = 0
-
-    return pec_error
-
-
 def LTC681x_rdstat(
     reg: int,  # Determines which Stat register is read back.
     total_ic: int,  # The number of ICs in the system.
@@ -921,21 +918,7 @@ def LTC681x_rdstat_reg(
     """
     REG_LEN = 8  # number of bytes in the register + 2 bytes for the PEC
 
-    if reg == 1:  # Read back status group A
-        cmd = CMD["RDSTATA"]
-    elif reg == 2:  # Read back status group B
-        cmd = CMD["RDSTATB"]
-    else:  # Read back status group A
-        cmd = CMD["RDSTATA"]
-
-    cmdbit = [0, 0, 0, 0, 0] + cmd[:3] + cmd[3:]
-    pec = calcul_PEC(cmdbit)
-    word = [
-        bin2int(cmdbit[:8]),
-        bin2int(cmdbit[8:]),
-        bin2int(pec[:8]),
-        bin2int(pec[8:]),
-    ]
+    word = RDSTAT_FRAME.get(reg, RDSTAT_FRAME[1])  # Defaults to status group A
     data = spi_write_read(word, REG_LEN * total_ic)
     return data
 
@@ -1000,10 +983,12 @@ def LTC681x_set_cfgr_adcopt(nIC, adcopt):
     """
     Helper function to set the ADCOPT bit
     """
+    global ADCOPT_BIT
     if adcopt:
         config.BMS_IC[nIC].config.tx_data[0] |= 0x01
     else:
         config.BMS_IC[nIC].config.tx_data[0] &= 0xFE
+    ADCOPT_BIT = 1 if adcopt else 0  # Selects the conversion times used by LTC681x_pollAdc
 
 
 def LTC681x_set_cfgr_gpio(nIC, gpio):
@@ -1075,40 +1060,59 @@ def LTC681x_reset_crc_count(total_ic: int):
     Returns:
     None
     """
-    for current_ic in range(total_ic):
-        config.BMS_IC[current_ic].crc_count.pec_count = 0
-        config.BMS_IC[current_ic].crc_count.cfgr_pec = 0
-        for i in range(6):
-            config.BMS_IC[current_ic].crc_count.cell_pec[i] = 0
+    config.PACK.pec_count[:total_ic] = 0
+    config.PACK.cfgr_pec_count[:total_ic] = 0
+    config.PACK.cell_pec_count[:total_ic] = 0
+    config.PACK.aux_pec_count[:total_ic] = 0
+    config.PACK.stat_pec_count[:total_ic] = 0
 
-        for i in range(4):
-            config.BMS_IC[current_ic].crc_count.aux_pec[i] = 0
 
-        for i in range(2):
-            config.BMS_IC[current_ic].crc_count.stat_pec[i] = 0
+def start_conversion(frame: List[int], conv: str, MD: int):
+    """
+    Sends a conversion command and records when it should be over.
+
+    :param frame: Precompiled conversion command frame.
+    :param conv: Conversion command name (key of CONV_TIME_US).
+    :param MD: ADC Mode.
+    """
+    global conv_start, conv_expected_us
+    cmd_68(frame)
+    conv_start = time.perf_counter()
+    conv_expected_us = CONV_TIME_US[conv][MD][ADCOPT_BIT]
 
 
 def LTC681x_pollAdc() -> int:
     """
     This function will block operation until the ADC has finished its conversion.
+    It sleeps until the expected end of the last started conversion, then polls
+    with PLADC in short bursts until the LTC681x releases SDO.
 
     Returns:
-        int: The counter value.
-    """
-    counter = 0
-    cmd = CMD["PLADC"]
-    cmdbit = [0, 0, 0, 0, 0] + cmd[:3] + cmd[3:]
-    pec = calcul_PEC(cmdbit)
-    word = [
-        bin2int(cmdbit[:8]),
-        bin2int(cmdbit[8:]),
-        bin2int(pec[:8]),
-        bin2int(pec[8:]),
-    ]
-    data = spi_write_read(word, 20000)
-    while counter < 20000 and (not (data[counter] > 0)):
-        counter += 1
-    return counter * 10
+        int: The measured conversion time in µs, or POLL_TIMEOUT if the LTC681x
+        still held SDO low at the deadline (counted in poll_timeouts).
+    """
+    global poll_timeouts
+    word = CMD_FRAME["PLADC"]
+    byte_time = 8 / MAX_SPEED_HZ  # s, time to clock one byte
+
+    remaining = conv_start + conv_expected_us * 1e-6 - time.perf_counter()
+    if remaining > 0:
+        time.sleep(remaining)
+    timeout = max(
+        conv_start + POLL_TIMEOUT_FACTOR * conv_expected_us * 1e-6,
+        time.perf_counter() + POLL_MIN_TIMEOUT,
+    )
+
+    while True:
+        burst_start = time.perf_counter()
+        data = spi_write_read(word, POLL_BURST)
+        for counter in range(POLL_BURST):
+            if data[counter] > 0:
+                # SDO goes high once the conversion is done
+                return int((burst_start + counter * byte_time - conv_start) * 1e6)
+        if burst_start > timeout:
+            poll_timeouts += 1
+            return POLL_TIMEOUT
 
 
 def LTC681x_clear_discharge(total_ic: int) -> None:
@@ -1133,7 +1137,7 @@ def LTC681x_wrcomm(total_ic: int):
     Args:
         total_ic (int): The number of ICs being written to.
     """
-    cmd = CMD["WRCOMM"]
+    cmd = CMD_FRAME["WRCOMM"]
     write_buffer = []
     write_count = 0
 
@@ -1159,7 +1163,7 @@ def LTC681x_rdcomm(total_ic: int) -> int:
     Returns:
         int: PEC error status.
     """
-    cmd = CMD["RDCOMM"]
+    cmd = CMD_FRAME["RDCOMM"]
     read_buffer = [0] * 256
     pec_error = 0
 
@@ -1174,7 +1178,7 @@ def LTC681x_rdcomm(total_ic: int) -> int:
         for byte in range(8):
             config.BMS_IC[c_ic].com.rx_data[byte] = read_buffer[byte + (8 * current_ic)]
 
-        calc_pec = pec15_calc(6, read_buffer[8 * current_ic :])
+        calc_pec = pec15_calc(6, read_buffer[8 * current_ic : 8 * current_ic + 6])
         data_pec = (
             read_buffer[6 + (8 * current_ic)],
             read_buffer[7 + (8 * current_ic)],
@@ -1195,13 +1199,5 @@ def LTC681x_stcomm(tx_len: int):
     Args:
         tx_len (int): Length of data to be transmitted.
     """
-    cmd = CMD["STCOMM"]
-    cmdbit = [0, 0, 0, 0, 0] + cmd[:3] + cmd[3:]
-    pec = calcul_PEC(cmdbit)
-    word = [
-        bin2int(cmdbit[:8]),
-        bin2int(cmdbit[8:]),
-        bin2int(pec[:8]),
-        bin2int(pec[8:]),
-    ]
-    spi.xfer3(word + [0] * tx_len * 3)
+    word = CMD_FRAME["STCOMM"]
+    xfer(word + [0] * tx_len * 3)
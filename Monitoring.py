@@ -1,14 +1,24 @@
 import LTC6811 as BMS
 import ADC
-import can
-from read_temp import temp
+from bitcodec import split_u16, flag
+import canbus
+import telemetry
+import logwriter
+import archiver
+import logformat
+import livesnapshot
+from read_temp import temp_of_codes
+import protection
+import instrumentation
 
 import gpiozero
 import time
-import datetime
+import sys
+import threading
+import signal
+from ringbuffer import SnapshotRing
 
 import os.path
-import py7zr
 
 PATH = "/usr/share/AMS/"
 NO_PROBLEM_PIN = 5  # GPIO5
@@ -16,11 +26,14 @@ NO_PROBLEM_PIN = 5  # GPIO5
 NO_PROBLEM_OUTPUT = gpiozero.LED(NO_PROBLEM_PIN)    # Selection du PIN pour la sortie du SCS
 
 MAX_MUX_PIN = BMS.NB_CELLS  # Nombre de thermistors
+NB_MEASURED_CELLS = min(BMS.NB_CELLS, BMS.CELL_CHANNELS)  # Cellules réellement mesurées par chaque LTC6811
 
 READ_ENABLE = False  # Affichage dans la console
 
 MODE = "DISCHARGE"   # DISCHARGE, CHARGE or STANDBY
 
+ACQUISITION = "ADCVAX"  # ADCVAX : cellules et GPIO1/2 en une seule conversion (mux des températures sur GPIO1), SEPARATE : conversions ADCV puis ADAX
+
 # Déclaration des bornes de protection
 OVERVOLTAGE = 7  # V
 UNDERVOLTAGE = 2.55  # V
@@ -30,34 +43,84 @@ DISCHARGE_MAX_T = 57.5  # °C
 
 MAX_DISCHARGE_CURRENT = 95  # A
 
+# Limites vérifiées dans chaque MODE (aucune en STANDBY), scalaires ou tableaux (BMS x canal)
+PROTECTION_LIMITS = {
+    "DISCHARGE": protection.Limits(OVERVOLTAGE, UNDERVOLTAGE, DISCHARGE_MAX_T, MAX_DISCHARGE_CURRENT),
+    "CHARGE": protection.Limits(OVERVOLTAGE, None, CHARGE_MAX_T, MAX_DISCHARGE_CURRENT),   # La sous-tension n'est surveillée qu'en décharge
+}
+
 
 LOW_WRITE_TIME = 10  # Temps d'écriture entre chaque donnée (en s) pour le LOW WRITE
 
+# Ecriture du log (voir logwriter.py) : les enregistrements sont écrits par lots
+LOG_BATCH_RECORDS = 64  # Nombre d'enregistrements par écriture sur la carte SD
+LOG_BATCH_TIME = 1.0    # s, attente maximale d'un enregistrement avant écriture
+LOG_DURABLE = True      # fdatasync après chaque écriture (sinon les données peuvent rester dans le cache du noyau)
+LOG_SEGMENT_BYTES = 64 * 2**20  # Taille (octets) de data.bin déclenchant la rotation en segment
+LOG_SEGMENT_TIME = 15 * 60      # s, âge de data.bin déclenchant la rotation en segment
+LIVE_PATH = livesnapshot.LIVE_PATH  # Dernier enregistrement, partagé en mémoire avec les autres processus (en RAM)
+
+RING_CAPACITY = 64  # Nombre de photographies gardées pour les consommateurs (CAN, log) en retard
+ACQUISITION_NICE = -10  # Priorité du thread d'acquisition (nice, nécessite les droits root)
+ACQUISITION_JOIN_TIMEOUT = 2.0  # s, attente du thread d'acquisition à l'arrêt (un scan bloqué sur le bus SPI ne retient pas l'arrêt)
+SWITCH_INTERVAL = 1e-3  # s, temps max avant que le thread d'acquisition reprenne la main sur un consommateur (GIL)
+
 CANID = 0x17    # ID du message CAN (0x17 = 23)
+CAN_CHANNEL = "can0"
+CAN_INTERFACE = "socketcan"     # "virtual" pour tester sans matériel
+CAN_PERIOD = 0.1    # s, période d'envoi de la trame d'état, indépendante de la vitesse de la boucle
+
+CAN_BUS = canbus.CanTransport(CAN_CHANNEL, CAN_INTERFACE)  # Ouvert au premier envoi, gardé ouvert ensuite
+STATUS_FRAME = CAN_BUS.periodic(CANID, 5, CAN_PERIOD)  # Trame d'état : tension totale, température max, compteur
+TELEMETRY_ID = 0x18     # ID des trames de télémétrie complète (voir telemetry.py), envoyées en salve à chaque cycle
 
 n = 0   # Compteur pour le message CAN, pour éviter les doublons (modulo 200)
 
+# Etat de la boucle de monitoring (voir init_loop)
+TIME = 0.0      # Temps de l'itération courante
+TIMER = 0.0     # Temps de la dernière écriture en STANDBY
+MUX_PIN = 0     # Capteur de température courant
+NO_PROBLEM_BITS = 32 * BMS.TOTAL_IC     # 32 bits par BMS en chaine
+NO_PROBLEM_BYTES = 4 * BMS.TOTAL_IC + 1  # Taille de NO_PROBLEM dans le fichier de log (5 octets pour un seul BMS)
+NO_PROBLEM = 0  # Code d'erreur (bit 0 = bit de poids fort)
+ACTIVE = True   # Les threads s'arrêtent quand ACTIVE passe à False
+RING = None         # Photographies publiées par l'acquisition (SnapshotRing)
+LOG = None              # Log binaire data.bin (logwriter.LogWriter)
+LOG_FORMAT = None       # Disposition des enregistrements de data.bin (logformat.LogFormat)
+LIVE_FORMAT = None      # Même disposition, tampon propre au thread d'acquisition (pour LIVE)
+ARCHIVER = archiver.SegmentCompressor()     # Compression des segments fermés, en arrière-plan (démarrée dans main)
+LOGGED_NO_PROBLEM = 0   # NO_PROBLEM du dernier enregistrement écrit
+LIVE = None             # Dernier enregistrement pour les autres processus (livesnapshot.LiveWriter)
+STATS = None            # Statistiques du pack tenues à jour à chaque mesure stockée (config.PackStats)
+PROTECTION = None       # Moteur de protection de la chaîne (protection.ProtectionEngine)
+FIRST_FAULT = None      # Premier défaut détecté : (type, BMS, canal)
+FAULT_REPORTED = False  # FIRST_FAULT déjà affiché par report_fault
+TELEMETRY = None        # Schéma des trames de télémétrie (telemetry.TelemetrySchema)
+TELEMETRY_BURST = None  # Salve de trames de télémétrie (canbus.FrameBurst)
+CAN_READER = None   # Curseurs des consommateurs sur RING
+LOG_READER = None
+
 ### Functions
 
 
-def write_data():
+def encode_record(record) -> bytearray:
     """
-    Convertie les données en données binaires et les écrit dans les fichiers data.bin et actualdata.bin.
+    Convertie les données d'une photographie en un enregistrement binaire du log.
+    L'enregistrement est écrit dans un tampon réutilisé : il doit être copié avant la photographie suivante.
+    :param record: Photographie lue dans RING (ringbuffer.Record)
     """
-    data_raw = int(TIME * 1e8).to_bytes(8) + ADC.VALUE.to_bytes(2)  # Timestamp + ADC value (voltage batterie)
-    for k in range(BMS.TOTAL_IC):   # Pour chaque BMS en chaine
-        for i in range(BMS.NB_CELLS):   # Pour chaque cellule du BMS k
-            data_raw += BMS.config.BMS_IC[k].cells.c_codes[i].to_bytes(2)   # Lit les valeurs de tension des cellules de chaque BMS
-        for j in range(MAX_MUX_PIN):
-            data_raw += BMS.config.BMS_IC[k].temp[j].to_bytes(2)    # Lit les valeurs de température des capteurs de chaque BMS
-    data_raw += BMS.bin2int(NO_PROBLEM).to_bytes(5)     # Lit le code d'erreur NO_PROBLEM
-    # Structure de data_raw:
-    # [timestamp (8 bytes), ADC value (2 bytes), cell voltages (26 bytes), temperatures (26 bytes), NO_PROBLEM (5 bytes)]
-    with open(PATH + "data/data.bin", "ab") as fileab:
-        # data=bytearray(data_row)
-        fileab.write(data_raw)      # Ecrit les données dans le fichier data.bin (ajoute à la fin du fichier)
-    with open(PATH + "data/actualdata.bin", "wb") as filewb:
-        filewb.write(data_raw)      # Ecrit les données dans le fichier actualdata.bin (écrase le fichier précédent)
+    # Structure de l'enregistrement (voir logformat) :
+    # [timestamp (8 bytes), ADC value (2 bytes), puis pour chaque BMS : cell voltages (26 bytes), temperatures (26 bytes), puis NO_PROBLEM (4 * TOTAL_IC + 1 bytes)]
+    return LOG_FORMAT.pack(record.time, record.adc_value, record.cell_codes, record.temp, record.no_problem)
+
+
+def write_data(data_raw: bytes, force=False):
+    """
+    Ajoute un enregistrement au log data.bin.
+    :param data_raw: Enregistrement (voir encode_record)
+    :param force: Ecrire et synchroniser tout de suite sur la carte SD, sans attendre le lot
+    """
+    LOG.append(data_raw, force)     # Ajouté à la fin de data.bin à l'écriture du lot
 
 
 def store_temp(sensor: int):
@@ -65,196 +128,350 @@ def store_temp(sensor: int):
     Stocke les données de température dans la configuration du BMS.
     :param sensor: Index du capteur de température (0 à 12)
     """
-    global BMS
-    for k in range(BMS.TOTAL_IC):   # Pour chaque BMS en chaine
-        BMS.config.BMS_IC[k].temp[sensor] = BMS.config.BMS_IC[k].aux.a_codes[0]
-        # Les capteurs de temp sont sur le GPIO1 (a_codes[0])
+    BMS.config.PACK.temp[:, sensor] = BMS.config.PACK.aux_codes[:, 0]   # Pour chaque BMS en chaine
+    # Les capteurs de temp sont sur le GPIO1 (a_codes[0])
+    if sensor < MAX_MUX_PIN:
+        STATS.update_sensor(sensor, temp_of_codes(BMS.config.PACK.temp[:, sensor]))    # Seul ce capteur a changé
 
 
 def update_archive():
     """
-    Comprime le fichier data.bin en un fichier 7z sans doublons pour libérer de l'espace disque.
-    """
-    with open(PATH + "data/data.bin", "rb") as f:
-        datebin = f.read(8)
-        date = datetime.datetime.fromtimestamp(int.from_bytes(datebin) / 1e8).date()    # Convertit le timestamp en date
-        written = False
-        k = 1
-        while not written:
-            if os.path.isfile("data/" + str(date) + "-" + str(k) + ".7z"):  # Si le fichier est déjà comprimé, ne pas l'écraser
-                k += 1
-            else:   # Sinon, on crée le fichier compressé
-                with py7zr.SevenZipFile(
-                    PATH + "data/" + str(date) + "-" + str(k) + ".7z", "w"
-                ) as archive:
-                    archive.writeall(PATH + "data/data.bin", "data.bin")
-                os.remove(PATH + "data/data.bin")   # On supprime le fichier data.bin après compression
-                written = True
-
-
-def calc_temp():  # Calcul sur les données de températures
-    """
-    Renvoie divers paramètres sur les températures des capteurs.
-    Températures en °C
-    :return: Tmoy, Tmax, i_max, Tmin, i_min
-    """
-    sum = 0
-    min = 100
-    max = -100
-    indicmin = [1, 1]
-    indicmax = [1, 1]
-    for k in range(BMS.TOTAL_IC):       # Pour chaque BMS en chaine
-        for i in range(MAX_MUX_PIN):    # Pour chaque capteur de température
-            tempe = temp(BMS.config.BMS_IC[k].temp[i])   # Lit la valeur du capteur de température (en V) du capteur i du BMS k et la convertit en °C via la courbe 'temp'
-            sum += tempe
-            if -50 < tempe <= min:          # On ne prend pas en compte les valeurs trop basses (en dessous de -50°C) car probablement erronées
-                indicmin = [k + 1, i + 1]   # mise à jour de l'indice du capteur de température le plus bas
-                min = tempe                 # mise à jour de la valeur minimale
-            if 500 >= tempe >= max:         # On ne prend pas en compte les valeurs trop hautes (au dessus de 500°C) car probablement erronées
-                indicmax = [k + 1, i + 1]   # mise à jour de l'indice du capteur de température le plus haut
-                max = tempe                 # mise à jour de la valeur maximale
-    return (sum / (BMS.TOTAL_IC * MAX_MUX_PIN), max, indicmax, min, indicmin)
-
-
-def calc_voltage():
-    """
-    Renvoie divers paramètres sur les tensions des cellules.
-    Tensions en V
-    :return: Ttot, Tmoy, Tmax, i_max, Tmin, i_min
-    """
-    sum = 0
-    min = 100
-    max = -100
-    indicmin = [1, 1]
-    indicmax = [1, 1]
-    for k in range(BMS.TOTAL_IC):   # Pour chaque BMS en chaine
-        for i in range(BMS.NB_CELLS):         # Pour chaque cellule du BMS k
-            volt = BMS.config.BMS_IC[k].cells.c_codes[i] * 0.0001   # Lit la valeur de tension de la cellule i du BMS k et la convertit en V
-            sum += volt
-            if volt <= min:
-                indicmin = [k + 1, i + 1]
-                min = volt
-            if volt >= max:     
-                indicmax = [k + 1, i + 1]
-                max = volt
-    return (sum, sum / (BMS.TOTAL_IC * 13), max, indicmax, min, indicmin)
-
-
-def send_data_CAN():
-    """
-    Envoie les données de tension et de température sur le bus CAN.'e
+    Ferme le fichier data.bin de la session précédente en segment, comprimé en arrière-plan par ARCHIVER.
+    Un fichier sans enregistrement (session arrêtée avant sa première écriture) est supprimé.
+    Un en-tête illisible n'empêche pas le démarrage : le fichier est archivé tel quel.
+    """
+    path = PATH + "data/data.bin"
+    try:
+        with open(path, "rb") as f:
+            logformat.LogFormat.from_file(f)    # Saute l'en-tête (absent des anciens fichiers)
+            datebin = f.read(8)
+    except ValueError as err:   # En-tête tronqué, incohérent ou de version inconnue
+        print(f"{path} : {err}", file=sys.stderr)
+        os.rename(path, segment_path(os.path.getmtime(path)))  # Nommé d'après sa dernière modification
+        return
+    if len(datebin) < 8:    # Vide, ou en-tête seul : rien à archiver
+        os.remove(path)
+        return
+    os.rename(path, segment_path(int.from_bytes(datebin) / 1e8))     # Nommé d'après son premier timestamp
+
+
+def segment_path(timestamp: float) -> str:
+    """
+    Chemin libre d'un segment de log commencé à timestamp (s), dans PATH/data.
+    """
+    return archiver.segment_path(PATH + "data", timestamp)
+
+
+def send_data_CAN(record):
+    """
+    Met à jour la trame d'état CAN avec les données de tension et de température d'une photographie,
+    et envoie la salve de télémétrie complète (toutes les cellules et tous les capteurs).
+    :param record: Photographie lue dans RING (ringbuffer.Record)
     """
     global n
-    tempe = calc_temp()     # Calcul des températures moyennes, maximales et minimales
-    volt = calc_voltage()   # Calcul des tensions moyennes, maximales et minimales
+    temps = record.temps    # Températures en °C de tous les capteurs de tous les BMS
+    tempe = record.tempe    # Températures moyenne, maximale et minimale (calculées au stockage des mesures, voir STATS)
+    volt = record.volt      # Tensions totale, moyenne, maximale et minimale
     tension = volt[0]       # Tension totale de la batterie en V
-    tensionbin = BMS.int2bin(int(tension * 100))    # Conversion de la tension totale en binaire avec 2 décimales fixes
+    tensionbytes = split_u16(int(tension * 100))    # Découpage de la tension totale en 2 octets avec 2 décimales fixes
     tempmax = tempe[1]      # Température maximale des capteurs de température en °C
-    tempmaxbin = BMS.int2bin(int(tempmax * 100))    # Conversion de la température maximale en binaire avec 2 décimales fixes
-    if len(tensionbin) <= 8:    # Si la longueur du tableau binaire de tension est inférieure ou égale à 8, on ajoute des zéros au début passer à 16 bits
-        tensionbin = [0] * 8 + tensionbin
-    if len(tempmaxbin) <= 8:    # Si la longueur du tableau binaire de température maximale est inférieure ou égale à 8, on ajoute des zéros au début passer à 16 bits
-        tempmaxbin = [0] * 8 + tempmaxbin
+    tempmaxbytes = split_u16(int(tempmax * 100))    # Découpage de la température maximale en 2 octets avec 2 décimales fixes
     n += 1     # Incrémentation du compteur de messages CAN
     n = n%201  # On remet le compteur à 0 après 200 messages pour éviter les doublons
-    with can.Bus(channel="can0", interface="socketcan") as bus:
-        msg = can.Message(
-            arbitration_id=CANID,
-            data=[
-                BMS.bin2int(tensionbin[:8]),    # 1er octet de la tension totale
-                BMS.bin2int(tensionbin[8:]),    # 2ème octet de la tension totale
-                BMS.bin2int(tempmaxbin[:8]),    # 1er octet de la température maximale
-                BMS.bin2int(tempmaxbin[8:]),    # 2ème octet de la température maximale
-                n,  # for test purpose only
-            ],
-        )       # Création du message CAN avec l'ID et les données
-        try:
-            bus.send(msg)   # Envoi du message CAN
-        except Exception as err:    # Si une erreur est levée lors de l'envoi du message CAN
-            print("Message CAN non envoyé :")
-            print(f"{type(err).__name__} was raised: {err}")
+    STATUS_FRAME.update(
+        (
+            tensionbytes[0],    # 1er octet de la tension totale
+            tensionbytes[1],    # 2ème octet de la tension totale
+            tempmaxbytes[0],    # 1er octet de la température maximale
+            tempmaxbytes[1],    # 2ème octet de la température maximale
+            n,  # for test purpose only
+        )
+    )       # Mise à jour du contenu de la trame, envoyée toutes les CAN_PERIOD secondes (erreurs affichées par canbus)
+    TELEMETRY_BURST.send(
+        TELEMETRY.pack(n, record.adc_value, volt, tempe, record.cell_codes[:, :NB_MEASURED_CELLS], temps, record.no_problem)
+    )
+
+
+def init_loop():
+    """
+    Initialise les variables de la boucle de monitoring (à appeler après BMS.init()).
+    """
+    global MUX_PIN, NO_PROBLEM_BITS, NO_PROBLEM_BYTES, NO_PROBLEM, TIMER, RING, CAN_READER, LOG_READER, TELEMETRY, TELEMETRY_BURST
+    global PROTECTION, FIRST_FAULT, FAULT_REPORTED, STATS, LOG, LOG_FORMAT, LOGGED_NO_PROBLEM, LIVE, LIVE_FORMAT
+    MUX_PIN = 0    # On commence par traiter le capteur de température au PIN 0
+    NO_PROBLEM_BITS = 32 * BMS.TOTAL_IC
+    NO_PROBLEM_BYTES = 4 * BMS.TOTAL_IC + 1
+    NO_PROBLEM = 0  # Création d'un code d'erreur en cas d'interruption (bit 0 = bit de poids fort)
+    NO_PROBLEM_OUTPUT.on()  # On allume la LED du SDC (pour indiquer qu'il n'y a pas de problème)
+    TIMER = time.time()     # On initialise le timer
+    PROTECTION = protection.ProtectionEngine(BMS.TOTAL_IC, NB_MEASURED_CELLS, MAX_MUX_PIN, PROTECTION_LIMITS)
+    FIRST_FAULT = None
+    FAULT_REPORTED = False
+    if LOG is not None:
+        LOG.close()
+    LOG_FORMAT = logformat.LogFormat(
+        BMS.TOTAL_IC, BMS.NB_CELLS, MAX_MUX_PIN, ADC.convert_current(1), NO_PROBLEM_BYTES
+    )
+    LOG = logwriter.LogWriter(
+        PATH + "data/data.bin", LOG_BATCH_RECORDS, LOG_BATCH_TIME, LOG_DURABLE, LOG_FORMAT.header(),
+        LOG_SEGMENT_BYTES, LOG_SEGMENT_TIME, segment_path, ARCHIVER.submit,
+    )
+    if LIVE is not None:
+        LIVE.close()
+    LIVE_FORMAT = logformat.LogFormat(
+        BMS.TOTAL_IC, BMS.NB_CELLS, MAX_MUX_PIN, ADC.convert_current(1), NO_PROBLEM_BYTES
+    )   # pack réutilise son tampon : un LogFormat par thread
+    LIVE = livesnapshot.LiveWriter(LIVE_FORMAT.record_size, LIVE_PATH)
+    LOGGED_NO_PROBLEM = 0
+    pack = BMS.config.PACK
+    STATS = BMS.config.PackStats(BMS.TOTAL_IC, NB_MEASURED_CELLS, MAX_MUX_PIN)
+    STATS.update_cells(pack.cell_codes)
+    STATS.set_temps(temp_of_codes(pack.temp[:, :MAX_MUX_PIN]))
+    RING = SnapshotRing(RING_CAPACITY, BMS.TOTAL_IC, BMS.NB_CELLS, MAX_MUX_PIN)
+    CAN_READER = RING.reader()
+    LOG_READER = RING.reader()
+    TELEMETRY = telemetry.TelemetrySchema(
+        BMS.TOTAL_IC, NB_MEASURED_CELLS, MAX_MUX_PIN, NO_PROBLEM_BYTES, ADC.convert_current(1)
+    )
+    TELEMETRY_BURST = CAN_BUS.burst(TELEMETRY_ID, TELEMETRY.nb_frames)
+
+
+def scan():
+    """
+    Scan complet de la chaîne : mesure des cellules (tensions) et des GPIO (températures), puis lecture des registres dans la configuration du BMS (BMS_IC.cells.c_codes et BMS_IC.aux.a_codes)
+    """
+    BMS.scan(combined=(ACQUISITION == "ADCVAX"), enable_read=READ_ENABLE)
+    STATS.update_cells(BMS.config.PACK.cell_codes)   # Toutes les cellules ont changé
 
 
-if __name__ == "__main__":
-    if os.path.isfile(PATH + "data/data.bin"):
-        update_archive()    # Si le fichier data.bin existe, on le compresse pour libérer de l'espace disque avant de lancer le monitoring
+def next_temp_sensor():
+    """
+    Passe au capteur de température suivant et stocke la valeur lue.
+    """
+    global MUX_PIN
+    if MUX_PIN <= MAX_MUX_PIN:          # l'ADC ne peut lire qu'une seule valeur de capteur de température à l ---> /!\ ATTENTION /!\ peut être une erreur ! fois, donc on lit les capteurs un par un
+        MUX_PIN += 1        # On change de capteur de température à chaque itération
+    else:
+        MUX_PIN = 1         # On revient au capteur 1 après avoir lu tous les capteurs car on lit le cellules de
+    store_temp(MUX_PIN - 1)             # On stocke la valeur du capteur de température dans la configuration du BMS (BMS_IC.temp)
 
-    BMS.init()  # On initialise les variables du BMS
-    ADC.init()  # On initialise les variables de l'ADC
 
-    BMS.write_read_cfg(READ_ENABLE)  # On écrit la config actuelle dans le BMS
+def publish():
+    """
+    Publie la photographie de l'itération dans RING pour les consommateurs (CAN, log),
+    et dans LIVE pour les autres processus (en mémoire, sans appel système : jamais retardé par la carte SD).
+    """
+    pack = BMS.config.PACK
+    cell_codes, temp = pack.cell_codes[:, : BMS.NB_CELLS], pack.temp[:, :MAX_MUX_PIN]
+    RING.publish(TIME, ADC.VALUE, NO_PROBLEM, cell_codes, temp, STATS.temps, STATS.voltage(), STATS.temperature())
+    LIVE.write(LIVE_FORMAT.pack(TIME, ADC.VALUE, cell_codes, temp, NO_PROBLEM))
 
-    ACTIVE = True  # On active la boucle
-    MUX_PIN = 0    # On commence par traiter le capteur de température au PIN 0
-    NO_PROBLEM = [0] * (32 * BMS.TOTAL_IC)
-    # Création d'un code d'erreur en cas d'interruption
-    NO_PROBLEM_OUTPUT.on()  # On allume la LED du SDC (pour indiquer qu'il n'y a pas de problème)
 
-    TIMER = time.time()     # On initialise le timer
+def log_data(record):
+    """
+    Ecrit les données selon le mode : à chaque photographie en DISCHARGE et CHARGE,
+    toutes les LOW_WRITE_TIME secondes en STANDBY.
+    Un changement de NO_PROBLEM est toujours écrit et synchronisé tout de suite.
+    :param record: Photographie lue dans RING (ringbuffer.Record)
+    """
+    global TIMER, LOGGED_NO_PROBLEM
+    data_raw = encode_record(record)
+    if record.no_problem != LOGGED_NO_PROBLEM:   # Transition de défaut : rien ne doit rester en mémoire
+        write_data(data_raw, force=True)
+        LOGGED_NO_PROBLEM = record.no_problem
+    elif MODE in ("DISCHARGE", "CHARGE"):
+        write_data(data_raw)        # On écrit les données dans le fichier data.bin
+    elif record.time - TIMER > LOW_WRITE_TIME:   # Si le temps écoulé depuis la dernière écriture est supérieur au temps d'écriture
+        write_data(data_raw)    # On écrit les données dans le fichier data.bin
+        TIMER = record.time    # Mise à jour du timer
+
+
+def can_step():
+    """
+    Consommateur CAN : envoie la photographie la plus récente (celles qui n'ont pas pu être envoyées sont sautées).
+    """
+    if CAN_READER.read(latest=True):
+        send_data_CAN(CAN_READER.record)
+
+
+def log_step():
+    """
+    Consommateur log : écrit toutes les photographies non encore lues, dans l'ordre.
+    Appelé aussi sans nouvelle photographie, pour écrire un lot qui attend depuis LOG_BATCH_TIME.
+    """
+    while LOG_READER.read():
+        log_data(LOG_READER.record)
+    LOG.flush_if_due()
+
 
+def check_protection():
+    """
+    Vérifie les bornes de protection du MODE courant (voir protection.py) et met à jour NO_PROBLEM.
+    En STANDBY on ne fait que monitorer les valeurs, sur de longues durées.
+    """
+    global NO_PROBLEM, FIRST_FAULT
+    pack = BMS.config.PACK
+    NO_PROBLEM, fault = PROTECTION.check(MODE, NO_PROBLEM, ADC.convert_current(ADC.VALUE), pack.cell_codes, pack.temp, STATS)
+    if fault is not None:
+        NO_PROBLEM_OUTPUT.off()    # On éteint la LED du SDC (pour indiquer qu'il y a un problème)
+        if FIRST_FAULT is None:
+            FIRST_FAULT = fault     # Premier canal en défaut depuis le lancement : (type, BMS, canal), affiché par report_fault
+
+
+def report_fault():
+    """
+    Affiche sur stderr le premier défaut de protection, une seule fois.
+    Appelé par le thread principal : l'étape de protection n'écrit rien.
+    """
+    global FAULT_REPORTED
+    if FIRST_FAULT is not None and not FAULT_REPORTED:
+        print("Défaut de protection :", FIRST_FAULT, file=sys.stderr)
+        FAULT_REPORTED = True
+
+
+# Etapes du thread d'acquisition, dans l'ordre (nom, fonction) : elles ne font aucune entrée/sortie lente
+ACQUISITION_STAGES = (
+    ("scan", scan),
+    ("store_temp", next_temp_sensor),
+    ("read_adc", ADC.read_value),           # On lit la valeur de l'ADC et la stocke dans ADC.VALUE (tension de la batterie)
+    ("protection", check_protection),
+    ("publish", publish),
+)
+
+# Consommateurs des photographies publiées (nom, fonction), chacun dans son thread
+CONSUMER_STAGES = (
+    ("send_data_CAN", can_step),            # Envoi des données de tension et de température sur le bus CAN
+    ("write_data", log_step),
+)
+
+# Etapes d'une itération complète, exécutée dans un seul thread (loop_iteration, benchmark.py)
+STAGES = ACQUISITION_STAGES + CONSUMER_STAGES
+
+
+ACQUISITION_HISTOGRAMS = [(stage, instrumentation.histogram(name).record) for name, stage in ACQUISITION_STAGES]
+CONSUMER_HISTOGRAMS = [(stage, instrumentation.histogram(name).record) for name, stage in CONSUMER_STAGES]
+CYCLE_HISTOGRAM = instrumentation.histogram("cycle").record
+
+
+def acquisition_iteration():
+    """
+    Une itération d'acquisition et de protection, chaque étape étant chronométrée (voir instrumentation.py).
+    """
+    global TIME
+    TIME = time.time()      # On récupère le temps actuel à chaque itération
+    cycle_start = start = instrumentation.now_ns()
+    for stage, record in ACQUISITION_HISTOGRAMS:
+        stage()
+        end = instrumentation.now_ns()
+        record(end - start)
+        start = end
+    CYCLE_HISTOGRAM(end - cycle_start)
+
+
+def loop_iteration():
+    """
+    Une itération complète dans le thread courant : acquisition puis consommateurs.
+    """
+    acquisition_iteration()
+    for stage, record in CONSUMER_HISTOGRAMS:
+        start = instrumentation.now_ns()
+        stage()
+        record(instrumentation.now_ns() - start)
+
+
+def acquisition_thread():
+    """
+    Thread d'acquisition et de protection, prioritaire : la latence de protection ne dépend
+    pas du bus CAN ni de la carte SD.
+    """
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), ACQUISITION_NICE)
+    except OSError:     # Droits insuffisants : on garde la priorité normale
+        pass
     while ACTIVE:
         # try:  # On utilise un try/except pour éviter les erreurs de lecture/écriture
-        TIME = time.time()      # On récupère le temps actuel à chaque itération
-        send_data_CAN()         # Envoi des données de tension et de température sur le bus CAN
-        BMS.start_cell_mes(READ_ENABLE)     # On démarre la mesure des cellules (tensions)
-        BMS.start_GPIO_mes(READ_ENABLE)     # On démarre la mesure des GPIO (températures)
-        BMS.read_cell_v(READ_ENABLE)        # récupère les tensions des cellules dans le registre de conversion de l'ADC et les stocke dans la configuration du BMS (BMS_IC.cells.c_codes)
-        if MUX_PIN <= MAX_MUX_PIN:          # l'ADC ne peut lire qu'une seule valeur de capteur de température à l ---> /!\ ATTENTION /!\ peut être une erreur ! fois, donc on lit les capteurs un par un
-            MUX_PIN += 1        # On change de capteur de température à chaque itération
-        else:
-            MUX_PIN = 1         # On revient au capteur 1 après avoir lu tous les capteurs car on lit le cellules de
-        BMS.read_GPIO_v(READ_ENABLE)        # récupère les valeurs des GPIO dans le registre de conversion de l'ADC et les stocke dans la configuration du BMS (BMS_IC.aux.a_codes)
-        store_temp(MUX_PIN - 1)             # On stocke la valeur du capteur de température dans la configuration du BMS (BMS_IC.temp)
-        ADC.read_value()        # On lit la valeur de l'ADC et la stocke dans ADC.VALUE (tension de la batterie)
-        if MODE == "DISCHARGE":
-            write_data()        # On écrit les données dans le fichier data.bin
-            if ADC.convert_current(ADC.VALUE) >= MAX_DISCHARGE_CURRENT:     # Si le courant de décharge est supérieur au maximum autorisé
-                NO_PROBLEM[1] = 1          # On met le code d'erreur à 1 pour indiquer qu'il y a un problème
-                NO_PROBLEM_OUTPUT.off()    # On éteint la LED du SDC (pour indiquer qu'il y a un problème)
-            for current_ic in range(BMS.TOTAL_IC):  # Pour chaque BMS en chaine
-                for cell in range(12):     # Pour chaque cellule du BMS k
-                    # On teste pour voir s'il y a des problemes d'over/undervoltage et on modifie le code d'erreur en conséquence
-                    if (
-                        BMS.config.BMS_IC[current_ic].cells.c_codes[cell] * 0.0001      # Lit la valeur de tension de la cellule i du BMS k et la convertit en V
-                        >= OVERVOLTAGE      # Surtension
-                    ):
-                        NO_PROBLEM[current_ic * 32 + cell + 2] = 1      # On met le code d'erreur à 1 pour indiquer qu'il y a un problème
-                        NO_PROBLEM_OUTPUT.off()     # On éteint la LED du SDC (pour indiquer qu'il y a un problème)
-                    elif (
-                        BMS.config.BMS_IC[current_ic].cells.c_codes[cell] * 0.0001      # Lit la valeur de tension de la cellule i du BMS k et la convertit en V
-                        <= UNDERVOLTAGE     # Sous-tension
-                    ):
-                        NO_PROBLEM[current_ic * 32 + cell + 2] = 1      # On met le code d'erreur à 1 pour indiquer qu'il y a un problème
-                        NO_PROBLEM_OUTPUT.off()     # On éteint la LED du SDC (pour indiquer qu'il y a un problème)
-                for temp_v in range(MAX_MUX_PIN):   # idem mais pour les températures
-                    if (
-                        temp(BMS.config.BMS_IC[current_ic].temp[temp_v])    # Lit la valeur du capteur de température i du BMS k
-                        >= DISCHARGE_MAX_T  # Surchauffe
-                    ):
-                        NO_PROBLEM[current_ic * 32 + 16 + 2 + temp_v] = 1   # On met le code d'erreur à 1 pour indiquer qu'il y a un problème
-                        NO_PROBLEM_OUTPUT.off()     # On éteint la LED du SDC (pour indiquer qu'il y a un problème)
-        elif MODE == "CHARGE":
-            write_data()        # On écrit les données dans le fichier data.bin
-            if ADC.convert_current(ADC.VALUE) >= MAX_DISCHARGE_CURRENT:     # Si le courant de charge est supérieur au maximum autorisé
-                NO_PROBLEM[1] = 1           # On met le code d'erreur à 1 pour indiquer qu'il y a un problème
-                NO_PROBLEM_OUTPUT.off()     # On éteint la LED du SDC (pour indiquer qu'il y a un problème)
-            for current_ic in range(BMS.TOTAL_IC):      # Pour chaque BMS en chaine
-                for cell in range(12):      # Pour chaque cellule du BMS k
-                    if (
-                        BMS.config.BMS_IC[current_ic].cells.c_codes[cell] * 0.0001      # Lit la valeur de tension de la cellule i du BMS k et la convertit en V
-                        >= OVERVOLTAGE      # Surtension
-                    ):
-                        NO_PROBLEM[current_ic * 32 + cell + 2] = 1      # On met le code d'erreur à 1 pour indiquer qu'il y a un problème
-                        NO_PROBLEM_OUTPUT.off()     # On éteint la LED du SDC (pour indiquer qu'il y a un problème)
-                for temp_v in range(MAX_MUX_PIN):   # idem mais pour les températures
-                    if temp(BMS.config.BMS_IC[current_ic].temp[temp_v]) >= CHARGE_MAX_T:    # Surchauffe
-                        NO_PROBLEM[current_ic * 32 + 16 + temp_v + 2] = 1       # On met le code d'erreur à 1 pour indiquer qu'il y a un problème
-                        NO_PROBLEM_OUTPUT.off()     # On éteint la LED du SDC (pour indiquer qu'il y a un problème)
-        else:       # MODE == "STANDBY" Dans le cas ou on veut juste monitorer les valeurs, sur de longues durées
-            if TIME - TIMER > LOW_WRITE_TIME:   # Si le temps écoulé depuis la dernière écriture est supérieur au temps d'écriture
-                write_data()    # On écrit les données dans le fichier data.bin
-                TIMER = TIME    # Mise à jour du timer
+        acquisition_iteration()
         # except:       # On utilise un try/except pour éviter les erreurs de lecture/écriture
         #     ACTIVE = False    # On arrête la boucle en cas d'erreur
-        #     NO_PROBLEM[0] = 1         # On met le code d'erreur à 1 pour indiquer qu'il y a un problème
+        #     NO_PROBLEM |= flag(0, NO_PROBLEM_BITS)         # On met le code d'erreur à 1 pour indiquer qu'il y a un problème
         #     NO_PROBLEM_OUTPUT.off()   # On éteint la LED du SDC (pour indiquer qu'il y a un problème)
+
+
+def consumer_thread(stage, record, reader):
+    """
+    Thread d'un consommateur : exécute stage à chaque nouvelle photographie de reader.
+    Une erreur (bus CAN, carte SD) est affichée sans arrêter le thread ni l'acquisition.
+    Sans photographie pendant 1 s, stage est quand même appelé (écriture des lots en attente).
+    """
+    while ACTIVE:
+        ready = reader.wait(1.0)
+        start = instrumentation.now_ns()
+        try:
+            stage()
+        except Exception as err:
+            print(f"{stage.__name__} : {type(err).__name__} was raised: {err}")
+        if ready:
+            record(instrumentation.now_ns() - start)
+
+
+def terminate(signum, frame):
+    """Gestionnaire de SIGTERM : interrompt l'attente du thread principal, qui passe par shutdown."""
+    raise SystemExit(0)
+
+
+def shutdown(acquisition, consumers):
+    """
+    Arrête les threads de la boucle et ferme les ressources : enregistrements en attente écrits,
+    instantané fermé, compression arrêtée, trames périodiques arrêtées.
+    Une ressource n'est fermée qu'une fois arrêté le thread qui l'utilise.
+    :param acquisition: Thread d'acquisition (seul écrivain de LIVE)
+    :param consumers: Threads consommateurs (CAN_BUS et LOG)
+    """
+    global ACTIVE
+    ACTIVE = False
+    for consumer in consumers:
+        consumer.join()     # Attente bornée par reader.wait(1.0) et la durée d'une étape
+    LOG.close()         # Ecriture des enregistrements en attente
+    CAN_BUS.close()     # Arrêt des trames périodiques
+    ARCHIVER.stop(5.0)  # Les segments non comprimés le seront au prochain lancement
+    acquisition.join(ACQUISITION_JOIN_TIMEOUT)
+    if acquisition.is_alive():  # Scan bloqué : l'instantané reste ouvert plutôt que d'être fermé sous son écrivain
+        print("Thread d'acquisition toujours actif : instantané non fermé", file=sys.stderr)
+    else:
+        LIVE.close()
+
+
+if __name__ == "__main__":
+    if os.path.isfile(PATH + "data/data.bin"):
+        update_archive()    # Si le fichier data.bin existe, il sera compressé en arrière-plan pour libérer de l'espace disque
+    ARCHIVER.start(PATH + "data")     # Compression des segments, dont ceux laissés par la session précédente
+
+    BMS.init()  # On initialise les variables du BMS
+    ADC.init()  # On initialise les variables de l'ADC
+
+    BMS.write_read_cfg(READ_ENABLE)  # On écrit la config actuelle dans le BMS
+
+    init_loop()
+    TELEMETRY.export(PATH + "data/telemetry", TELEMETRY_ID)  # Schéma des trames (DBC et JSON) pour les outils des stands
+    instrumentation.install_signal_handler()    # kill -USR1 <pid> pour écrire les histogrammes des durées
+    sys.setswitchinterval(SWITCH_INTERVAL)
+
+    readers = (CAN_READER, LOG_READER)
+    consumers = [
+        threading.Thread(target=consumer_thread, args=(stage, record, reader), daemon=True)
+        for (stage, record), reader in zip(CONSUMER_HISTOGRAMS, readers)
+    ]
+    acquisition = threading.Thread(target=acquisition_thread, name="acquisition", daemon=True)
+    signal.signal(signal.SIGTERM, terminate)    # kill <pid> (arrêt du service) : même arrêt propre que Ctrl-C
+    try:
+        for consumer in consumers:
+            consumer.start()
+        acquisition.start()
+        while acquisition.is_alive():
+            acquisition.join(1.0)
+            instrumentation.maybe_dump(PATH + "data/instrumentation.json")     # Histogrammes des durées, toutes les minutes ou sur SIGUSR1
+            report_fault()
+    except KeyboardInterrupt:   # Ctrl-C
+        pass
+    finally:
+        shutdown(acquisition, consumers)
@@ -1,65 +1,70 @@
 """
 Lit le fichier de log binaire et affiche les données traitées de manière lisible.
+La disposition du fichier est lue dans son en-tête (voir logformat) : pas besoin de Monitoring ni de LTC6811.
 """
 
-from LTC6811 import TOTAL_IC, NB_CELLS
-from Monitoring import MAX_MUX_PIN
-from read_temp import temp
-from ADC import convert_current
+import argparse
 import datetime
 
+from logformat import LogFormat, read_log, read_range, build_index
+from read_temp import temp_of_codes
+
 
 def print_data(n: int):
     """
     Affiche les données d'une ligne de données traitées au preaalable.
     """
-    line = data[n]
-    print("Date :", line[0])
-    print("Courant (A) :", line[1])
-    for i in range(TOTAL_IC):
+    print("Date :", datetime.datetime.fromtimestamp(times[n]))
+    print("Courant (A) :", round(currents[n], 2))
+    for i in range(log_format.total_ic):
         print("BMS " + str(i + 1))
         strcell = ""
-        for k in range(12):
-            strcell += "C" + str(k + 1) + ": " + str(line[k + 2]) + ", "
+        for k in range(log_format.nb_cells):
+            strcell += "C" + str(k + 1) + ": " + str(round(cells[n, i, k], 4)) + ", "
         print("Cellules (V) : " + strcell[:-2])
         strtemp = ""
-        for k in range(MAX_MUX_PIN):
-            strtemp += "T" + str(k + 1) + ": " + str(line[k + 12 + 2]) + ", "
+        for k in range(log_format.nb_sensors):
+            strtemp += "T" + str(k + 1) + ": " + str(round(temps[n, i, k], 4)) + ", "
         print("Températures (°C) : " + strtemp[:-2])
     print()
 
 
 if __name__ == "__main__":
-    filepath = "/usr/share/AMS/data/data.bin"       # Chemin vers le fichier de log
-
-    file = open(filepath, "rb")     # Ouverture du fichier en mode binaire (lecture)
-
-    chunksize = 8 + 2 + (12 + MAX_MUX_PIN) * 2 * TOTAL_IC   # Taille d'un bloc de données
-
-    data_raw = []
-
-    while True:
-        chunk = file.read(chunksize)    # Lecture d'un bloc de données
-        data_raw.append(chunk)          # Ajout du bloc de données à la liste
-        if not chunk:                   # Si le bloc de données est vide, on a atteint la fin du fichier
-            break
+    parser = argparse.ArgumentParser(description="Affichage du log binaire")
+    parser.add_argument("path", nargs="?", default="/usr/share/AMS/data/data.bin", help="fichier de log")
+    parser.add_argument("--start", type=int, default=0, help="premier enregistrement affiché (négatif : depuis la fin)")
+    parser.add_argument("--count", type=int, default=None, help="nombre d'enregistrements affichés (tous par défaut)")
+    parser.add_argument("--from", dest="t0", type=datetime.datetime.fromisoformat, help="début de l'intervalle (ex : 2024-05-12T14:03:00)")
+    parser.add_argument("--to", dest="t1", type=datetime.datetime.fromisoformat, help="fin de l'intervalle (exclue)")
+    parser.add_argument("--index", action="store_true", help="écrire l'index creux du fichier (recherches par date plus rapides)")
+    # Dimensions d'un ancien fichier, sans en-tête
+    parser.add_argument("--ic", type=int, default=1, help="nombre de BMS (fichier sans en-tête)")
+    parser.add_argument("--cells", type=int, default=13, help="cellules par BMS (fichier sans en-tête)")
+    parser.add_argument("--sensors", type=int, default=13, help="capteurs par BMS (fichier sans en-tête)")
+    parser.add_argument("--current-lsb", type=float, help="A par unité de l'ADC du courant, ADC.convert_current(1) (obligatoire pour un fichier sans en-tête)")
+    args = parser.parse_args()
 
-    data = []
+    legacy = None if args.current_lsb is None else LogFormat(args.ic, args.cells, args.sensors, args.current_lsb)
+    try:
+        if args.index:
+            print("Index écrit :", build_index(args.path, legacy=legacy))
+        if args.t0 is not None or args.t1 is not None:  # Dichotomie sur les timestamps : seul l'intervalle est lu
+            t0 = None if args.t0 is None else args.t0.timestamp()
+            t1 = None if args.t1 is None else args.t1.timestamp()
+            log_format, records = read_range(args.path, t0, t1, legacy=legacy)
+        else:
+            log_format, records = read_log(args.path, legacy=legacy)   # Projeté en mémoire, rien n'est lu
+    except ValueError as err:   # Fichier sans en-tête lu sans --current-lsb, ou en-tête incohérent
+        parser.error(f"{err} (--current-lsb, et --ic/--cells/--sensors)" if legacy is None else str(err))
+    print(f"{len(records)} enregistrements, {log_format.total_ic} BMS")
+    start = args.start if args.start >= 0 else max(len(records) + args.start, 0)
+    records = records[start : None if args.count is None else start + args.count]   # Vue : seules ces pages seront lues
 
-    for raw in data_raw:
-        mes = []
-        mes.append(datetime.datetime.fromtimestamp(int.from_bytes(raw[0:8]) / 1e8))     # Conversion du timestamp en date
-        mes.append(round(convert_current(int.from_bytes(raw[8:10])), 2))                # Conversion du courant en Ampères
-        for current_bms in range(TOTAL_IC):   # Pour chaque BMS
-            for cell in range(NB_CELLS):      # Pour chaque cellule du BMS k
-                indic = (current_bms * (12 + MAX_MUX_PIN) + cell + 1) * 2 + 8           # Calcul de l'indice pour accéder à la cellule
-                mes.append(round(int.from_bytes(raw[indic : indic + 2]) * 0.0001, 4))   # Conversion de la valeur de la cellule en Volts
-            for temp_n in range(MAX_MUX_PIN):   # Pour chaque capteur de température du BMS k
-                indic = (current_bms * (12 + MAX_MUX_PIN) + 12 + temp_n + 1) * 2 + 8    # Calcul de l'indice pour accéder à la température
-                mes.append(
-                    round(float(temp(int.from_bytes(raw[indic : indic + 2]) * 0.0001)), 4)    # Conversion de la valeur de la température en °C
-                )
-        data.append(mes)    # [timestamp, courant, Tensions, Températures] pour chaque BMS
+    # Conversion des enregistrements affichés, d'un coup : [timestamp, courant, Tensions, Températures] pour chaque BMS
+    times = log_format.times(records)
+    currents = log_format.currents(records)
+    cells = log_format.cell_voltages(records)
+    temps = temp_of_codes(log_format.temp_codes(records))    # Conversion du code brut des capteurs en °C (table de read_temp)
 
-    for i in range(len(data) - 1):  # Affiche les données de chaque ligne
+    for i in range(len(records)):  # Affiche les données de chaque ligne
         print_data(i)
@@ -0,0 +1,141 @@
+"""
+Compression en arrière-plan des segments du log.
+
+Le log data.bin est fermé régulièrement (voir logwriter.LogWriter, rotation) et renommé en
+segment data-<date>.bin ; le segment est confié à SegmentCompressor, dont le thread le
+comprime en data-<date>.7z (avec son index creux, voir logformat.build_index) puis le supprime.
+La compression se fait segment par segment au fil de la session, avec la priorité la plus
+basse (nice 19), au lieu d'un seul gros fichier au lancement suivant du Monitoring.
+La compression (lzma) libère le GIL : elle ne bloque pas les threads de la boucle.
+
+Un segment non compressé (arrêt pendant la compression) est repris au démarrage suivant.
+"""
+
+import datetime
+import os
+import queue
+import threading
+from typing import Optional
+
+import py7zr
+
+import logformat
+
+SEGMENT_PREFIX = "data-"
+SEGMENT_SUFFIX = ".bin"
+ARCHIVE_SUFFIX = ".7z"
+TEMPORARY_SUFFIX = ".tmp"  # Archive en cours d'écriture
+COMPRESSOR_NICE = 19  # Priorité du thread de compression (la plus basse)
+
+
+def segment_path(directory: str, timestamp: float) -> str:
+    """
+    Chemin libre d'un segment commencé à timestamp (s) :
+    directory/data-AAAA-MM-JJ_HH-MM-SS.bin, suivi de -k si le nom est déjà pris (segment ou archive).
+    """
+    stem = os.path.join(directory, SEGMENT_PREFIX + datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d_%H-%M-%S"))
+    name, k = stem, 1
+    while os.path.exists(name + SEGMENT_SUFFIX) or os.path.exists(name + ARCHIVE_SUFFIX):
+        k += 1
+        name = f"{stem}-{k}"
+    return name + SEGMENT_SUFFIX
+
+
+def compress(segment: str) -> str:
+    """
+    Comprime le segment en archive 7z (data.bin et data.bin.idx), puis le supprime.
+    L'archive est écrite sous un nom temporaire puis renommée : une archive présente est complète.
+    :return: Chemin de l'archive
+    """
+    archive_path = segment[: -len(SEGMENT_SUFFIX)] + ARCHIVE_SUFFIX
+    try:
+        index = logformat.build_index(segment)  # Recherche par date dans l'archive
+    except ValueError:  # Segment sans en-tête (ancien fichier) : pas d'index
+        index = None
+    temporary = archive_path + TEMPORARY_SUFFIX
+    with py7zr.SevenZipFile(temporary, "w") as archive:
+        archive.write(segment, "data.bin")
+        if index is not None:
+            archive.write(index, "data.bin" + logformat.INDEX_SUFFIX)
+    with open(temporary, "rb") as f:
+        os.fsync(f.fileno())    # L'archive est sur la carte SD avant la suppression du segment
+    os.rename(temporary, archive_path)
+    directory = os.open(os.path.dirname(os.path.abspath(archive_path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)     # Le nom de l'archive est sur la carte SD avant la suppression du segment
+    finally:
+        os.close(directory)
+    os.remove(segment)
+    if index is not None:
+        os.remove(index)
+    return archive_path
+
+
+class SegmentCompressor:
+    """
+    Thread de compression des segments fermés du log.
+
+    Attributs :
+    -----------
+    pending : queue.Queue
+        Segments à comprimer, dans l'ordre de fermeture.
+
+    compressed : int
+        Nombre de segments comprimés depuis le démarrage.
+    """
+
+    def __init__(self):
+        self.pending: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.thread: Optional[threading.Thread] = None
+        self.compressed = 0
+
+    def start(self, directory: str):
+        """
+        Démarre le thread, après avoir mis en attente les segments de directory laissés par une session précédente
+        et supprimé les archives temporaires d'une compression interrompue (leur segment est comprimé à nouveau).
+        """
+        for name in os.listdir(directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(ARCHIVE_SUFFIX + TEMPORARY_SUFFIX):
+                os.remove(os.path.join(directory, name))
+        leftovers = sorted(
+            name for name in os.listdir(directory) if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+        for name in leftovers:
+            self.submit(os.path.join(directory, name))
+        self.thread = threading.Thread(target=self.run, name="compressor", daemon=True)
+        self.thread.start()
+
+    def submit(self, segment: str):
+        """Met le segment fermé segment en attente de compression (appelé par LogWriter à la rotation)."""
+        self.pending.put(segment)
+
+    def stop(self, timeout: float = None):
+        """
+        Arrête le thread après le segment en cours ; les segments encore en attente seront repris au démarrage suivant.
+        """
+        if self.thread is None:
+            return
+        while True:     # Les segments en attente ne sont pas comprimés maintenant
+            try:
+                self.pending.get_nowait()
+            except queue.Empty:
+                break
+        self.pending.put(None)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def run(self):
+        """Boucle du thread : comprime les segments un par un, avec la priorité la plus basse."""
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), COMPRESSOR_NICE)
+        except OSError:
+            pass
+        while True:
+            segment = self.pending.get()
+            if segment is None:
+                return
+            try:
+                compress(segment)
+                self.compressed += 1
+            except Exception as err:    # Le segment reste sur la carte SD, repris au démarrage suivant
+                print(f"Compression de {segment} : {type(err).__name__} was raised: {err}")
@@ -0,0 +1,300 @@
+"""
+Banc de mesure d'une itération de la boucle de Monitoring, sans la voiture.
+
+Le bus SPI est remplacé par l'émulateur de chaîne LTC6811 (emulator.py), smbus2, python-can
+et gpiozero par des modules factices installés avant l'import de Monitoring.
+Pour chaque MODE et chaque nombre d'IC, chaque étape de Monitoring.STAGES est chronométrée,
+et les percentiles des durées (en µs) sont écrits en JSON pour comparer deux versions du code.
+read_temp a besoin de la table /usr/share/AMS/data/RT_table.csv, comme sur la voiture.
+
+Usage :
+    python benchmark.py [-n 200] [--ic 1 2 4 8 16] [--modes DISCHARGE CHARGE STANDBY]
+                        [--no-realtime] [-o resultats.json] [--compare avant.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import types
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+ADC_RAW = bytes([0x00, 0x40])  # Valeur renvoyée par l'ADC factice (64 → environ 0.3 A)
+
+
+### Modules factices
+
+
+class _I2cMsg:
+    """Message I2C factice (sous-ensemble de smbus2.i2c_msg)."""
+
+    def __init__(self, addr: int, buf: bytearray, read: bool):
+        self.addr = addr
+        self.buf = buf
+        self.is_read = read
+
+    @staticmethod
+    def write(addr: int, data):
+        return _I2cMsg(addr, bytearray(data), False)
+
+    @staticmethod
+    def read(addr: int, length: int):
+        return _I2cMsg(addr, bytearray(length), True)
+
+    def __bytes__(self):
+        return bytes(self.buf)
+
+    def __iter__(self):
+        return iter(self.buf)
+
+
+class _SMBus:
+    """Bus I2C factice : l'ADS1115 renvoie toujours ADC_RAW."""
+
+    def __init__(self, bus=None):
+        self.bus = bus
+
+    def i2c_rdwr(self, *msgs):
+        for msg in msgs:
+            if msg.is_read:
+                msg.buf[:] = ADC_RAW[: len(msg.buf)]
+
+    def close(self):
+        pass
+
+
+class _CanMessage:
+    def __init__(self, arbitration_id=0, data=(), **kwargs):
+        self.arbitration_id = arbitration_id
+        self.data = bytearray(data)
+
+
+class _CanError(Exception):
+    pass
+
+
+class _CyclicTask:
+    """Tâche d'envoi périodique factice : compte les mises à jour de la trame."""
+
+    def __init__(self, msg, period):
+        self.msg = msg
+        self.period = period
+
+    def modify_data(self, msg):
+        self.msg = msg
+        _CanBus.sent += 1
+
+    def stop(self):
+        pass
+
+
+class _CanBus:
+    """Bus CAN factice : compte les messages envoyés et les mises à jour des trames périodiques."""
+
+    sent = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def send(self, msg, timeout=None):
+        _CanBus.sent += 1
+
+    def send_periodic(self, msg, period, **kwargs):
+        _CanBus.sent += 1
+        return _CyclicTask(msg, period)
+
+    def shutdown(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+class _LED:
+    def __init__(self, pin):
+        self.pin = pin
+        self.is_lit = False
+
+    def on(self):
+        self.is_lit = True
+
+    def off(self):
+        self.is_lit = False
+
+
+def install_stubs():
+    """
+    Installe les modules factices smbus2, can, gpiozero et spidev dans sys.modules.
+    A appeler avant d'importer Monitoring ou ADC.
+    """
+    smbus2 = types.ModuleType("smbus2")
+    smbus2.SMBus = _SMBus
+    smbus2.i2c_msg = _I2cMsg
+    can = types.ModuleType("can")
+    can.Bus = _CanBus
+    can.Message = _CanMessage
+    can.CanError = _CanError
+    gpiozero = types.ModuleType("gpiozero")
+    gpiozero.LED = _LED
+    spidev = types.ModuleType("spidev")  # Le bus SPI passe par l'émulateur (LTC681x.set_transport)
+    sys.modules.update(smbus2=smbus2, can=can, gpiozero=gpiozero, spidev=spidev)
+
+
+### Mesures
+
+
+def summary(samples) -> dict:
+    """Statistiques (en µs) d'une série de durées en secondes."""
+    us = np.asarray(samples) * 1e6
+    stats = {f"p{p}": float(np.percentile(us, p)) for p in PERCENTILES}
+    stats.update(mean=float(us.mean()), max=float(us.max()))
+    return stats
+
+
+def run(Monitoring, mode: str, total_ic: int, iterations: int, warmup: int, realtime: bool) -> dict:
+    """
+    Chronomètre iterations itérations de la boucle de Monitoring pour un MODE et une chaîne de total_ic IC.
+    """
+    import ADC
+    import LTC681x
+    import emulator
+
+    BMS = Monitoring.BMS
+    chain = emulator.DaisyChainEmulator(total_ic, realtime=realtime)
+    LTC681x.set_transport(chain)
+    LTC681x.poll_timeouts = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        BMS.init(total_ic)
+        ADC.init()
+        BMS.write_read_cfg(False)
+    Monitoring.MODE = mode
+    Monitoring.READ_ENABLE = False
+    Monitoring.init_loop()
+
+    timings = {name: [] for name, _ in Monitoring.STAGES}
+    total = []
+    for k in range(warmup + iterations):
+        start = time.perf_counter()
+        Monitoring.TIME = time.time()  # Comme Monitoring.loop_iteration
+        for name, stage in Monitoring.STAGES:
+            t = time.perf_counter()
+            stage()
+            timings[name].append(time.perf_counter() - t)
+        total.append(time.perf_counter() - start)
+        if k + 1 == warmup:
+            for samples in timings.values():
+                samples.clear()
+            total.clear()
+
+    return {
+        "mode": mode,
+        "total_ic": total_ic,
+        "iterations": iterations,
+        "cmd_pec_errors": chain.cmd_pec_errors,
+        "poll_timeouts": LTC681x.poll_timeouts,  # Conversions non terminées avant l'échéance de LTC681x_pollAdc
+        "first_fault": Monitoring.FIRST_FAULT,  # Premier défaut de protection (type, BMS, canal), ou None
+        "stages_us": {name: summary(samples) for name, samples in timings.items()},
+        "total_us": summary(total),
+    }
+
+
+def scaling(runs) -> dict:
+    """
+    Ajuste, pour chaque MODE, la médiane de la durée d'une itération et du scan
+    sur une droite fixed_us + per_ic_us * total_ic (moindres carrés).
+    """
+    result = {}
+    for mode in dict.fromkeys(r["mode"] for r in runs):
+        ok = [r for r in runs if r["mode"] == mode and "error" not in r]
+        if len({r["total_ic"] for r in ok}) < 2:
+            continue
+        ics = np.array([r["total_ic"] for r in ok], dtype=float)
+        result[mode] = {}
+        for key, p50 in (
+            ("total", [r["total_us"]["p50"] for r in ok]),
+            ("scan", [r["stages_us"]["scan"]["p50"] for r in ok]),
+        ):
+            p50 = np.array(p50)
+            per_ic, fixed = np.polyfit(ics, p50, 1)
+            residual = p50 - (fixed + per_ic * ics)
+            result[mode][key] = {
+                "per_ic_us": float(per_ic),
+                "fixed_us": float(fixed),
+                "max_residual_us": float(np.abs(residual).max()),
+            }
+    return result
+
+
+def compare(before: dict, after: dict):
+    """Affiche le rapport des médianes (après / avant) des runs réussis communs à deux résultats."""
+    runs = {(r["mode"], r["total_ic"]): r for r in before["runs"] if "error" not in r}
+    for run_after in after["runs"]:
+        run_before = runs.get((run_after["mode"], run_after["total_ic"]))
+        if run_before is None or "error" in run_after:
+            continue
+        p50_before = run_before["total_us"]["p50"]
+        p50_after = run_after["total_us"]["p50"]
+        print(
+            f"{run_after['mode']:<10} IC={run_after['total_ic']:<3}"
+            f" p50 {p50_before:10.0f} -> {p50_after:10.0f} µs  (x{p50_after / p50_before:.2f})"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--ic", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--modes", nargs="+", default=["DISCHARGE", "CHARGE", "STANDBY"])
+    parser.add_argument("--no-realtime", action="store_true", help="ne pas attendre la durée des transferts SPI")
+    parser.add_argument("-o", "--output", help="fichier JSON de sortie (sortie standard par défaut)")
+    parser.add_argument("--compare", help="résultats JSON de référence à comparer")
+    args = parser.parse_args()
+
+    install_stubs()
+    import Monitoring
+
+    with tempfile.TemporaryDirectory() as path:
+        os.mkdir(os.path.join(path, "data"))
+        Monitoring.PATH = path + "/"
+        Monitoring.LIVE_PATH = os.path.join(path, "live")  # Sans toucher à l'instantané d'un Monitoring en cours
+        runs = []
+        for mode in args.modes:
+            for total_ic in args.ic:
+                try:
+                    runs.append(run(Monitoring, mode, total_ic, args.iterations, args.warmup, not args.no_realtime))
+                except Exception as err:  # La configuration n'est pas supportée par le code mesuré
+                    runs.append({"mode": mode, "total_ic": total_ic, "error": f"{type(err).__name__}: {err}"})
+
+    results = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "realtime": not args.no_realtime,
+        "acquisition": Monitoring.ACQUISITION,
+        "runs": runs,
+        "scaling": scaling(runs),  # Coût par IC : la durée doit rester linéaire en TOTAL_IC
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
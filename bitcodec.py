@@ -0,0 +1,69 @@
+"""
+Utilitaires de conversion bits/octets basés sur des entiers.
+Toutes les conversions se font par décalages, masques, int.to_bytes et struct,
+sans passer par des listes de bits.
+"""
+
+import struct
+from typing import List, Tuple
+
+U16_BE = struct.Struct(">H")  # Entier non signé 16 bits, octet de poids fort en premier
+S16_BE = struct.Struct(">h")  # Entier signé 16 bits (complément à 2), octet de poids fort en premier
+
+
+def bin2int(binval: List[bool]) -> int:
+    """
+    Convertit une liste de bits (bit de poids fort en premier) en entier.
+    Conservée pour les tables exprimées en bits (ex : LTC681x.CMD).
+    """
+    value = 0
+    for bit in binval:
+        value = (value << 1) | bit
+    return value
+
+
+def int2bin(nb: int) -> List[bool]:
+    """
+    Convertit un entier en liste de bits, complétée à un multiple de 8 bits.
+    Conservée pour compatibilité, à éviter dans les boucles.
+    """
+    nb = abs(nb)
+    width = 8 * ((max(nb.bit_length(), 1) - 1) // 8 + 1)
+    return [(nb >> shift) & 1 for shift in range(width - 1, -1, -1)]
+
+
+def split_u16(value: int) -> Tuple[int, int]:
+    """
+    Découpe un entier 16 bits en (octet de poids fort, octet de poids faible).
+    Une valeur hors de 0..65535 est saturée (comme telemetry.clip_u16) plutôt que tronquée à ses 16 bits de poids faible.
+    """
+    value = min(max(value, 0), 0xFFFF)
+    return value >> 8, value & 0xFF
+
+
+def u16_from_bytes(data, offset: int = 0) -> int:
+    """
+    Lit un entier non signé 16 bits (poids fort en premier) dans un buffer.
+    """
+    return U16_BE.unpack_from(data, offset)[0]
+
+
+def s16_from_bytes(data, offset: int = 0) -> int:
+    """
+    Lit un entier signé 16 bits en complément à 2 (poids fort en premier) dans un buffer.
+    """
+    return S16_BE.unpack_from(data, offset)[0]
+
+
+def nibbles(high: int, low: int) -> int:
+    """
+    Assemble deux quartets (4 bits) en un octet.
+    """
+    return ((high & 0x0F) << 4) | (low & 0x0F)
+
+
+def flag(index: int, width: int) -> int:
+    """
+    Masque du bit n° index dans un champ de width bits, le bit 0 étant celui de poids fort.
+    """
+    return 1 << (width - 1 - index)
@@ -0,0 +1,211 @@
+"""
+Bus CAN ouvert une seule fois pour toute la durée du Monitoring, et trames envoyées
+périodiquement par python-can (send_periodic) : la trame d'état part à une fréquence fixe,
+quelle que soit la vitesse de la boucle, qui ne fait que mettre à jour son contenu.
+
+Sur la voiture le bus est can0 (socketcan, le noyau envoie les trames périodiques) ;
+hors voiture l'interface virtual de python-can permet de tout faire tourner sans matériel :
+    CanTransport(channel="test", interface="virtual")
+"""
+
+from typing import List, Optional
+
+import can
+
+
+class PeriodicFrame:
+    """
+    Trame envoyée toutes les period secondes, dont le contenu est mis à jour sur place.
+    L'envoi ne démarre qu'à la première mise à jour, pour ne pas envoyer de trame vide.
+
+    Deux messages préalloués sont utilisés à tour de rôle : on écrit dans celui qui n'est
+    pas en cours d'envoi puis on le donne à la tâche, qui n'envoie donc jamais de trame
+    à moitié mise à jour.
+
+    Attributs :
+    -----------
+    arbitration_id : int
+        ID de la trame.
+
+    period : float
+        Période d'envoi, en s.
+
+    task : can.broadcastmanager.CyclicSendTaskABC
+        Tâche d'envoi de python-can (None tant que l'envoi n'a pas démarré ou après une erreur).
+    """
+
+    def __init__(self, transport: "CanTransport", arbitration_id: int, length: int, period: float):
+        self.transport = transport
+        self.arbitration_id = arbitration_id
+        self.period = period
+        self.messages = [can.Message(arbitration_id=arbitration_id, data=bytearray(length)) for _ in range(2)]
+        self.current = 0  # Message donné à la tâche
+        self.task = None
+
+    def update(self, data) -> bool:
+        """
+        Remplace le contenu de la trame (len(data) octets au plus), sans changer la période d'envoi.
+
+        Returns:
+            bool: Faux si le bus n'est pas disponible (la mise à jour sera réessayée à l'appel suivant).
+        """
+        spare = 1 - self.current
+        message = self.messages[spare]
+        message.data[:] = self.messages[self.current].data     # Les octets non fournis gardent leur valeur courante
+        message.data[: len(data)] = data
+        if self.task is not None and getattr(self.task, "stopped", False):
+            # Tâche arrêtée par une erreur d'envoi dans son thread (bus tombé) : bus rouvert et envoi redémarré
+            self.transport.reset()
+        try:
+            if self.task is None:
+                self.task = self.transport.start_periodic(message, self.period)
+                if self.task is None:
+                    return False
+            else:
+                self.task.modify_data(message)
+        except (can.CanError, OSError) as err:
+            print(f"Trame CAN {self.arbitration_id:#x} non envoyée :")
+            print(f"{type(err).__name__} was raised: {err}")
+            self.transport.reset()  # Bus rouvert à la mise à jour suivante (bus-off, interface tombée)
+            return False
+        self.current = spare
+        return True
+
+    def stop(self):
+        """Arrête l'envoi de la trame."""
+        if self.task is not None:
+            try:
+                self.task.stop()
+            except (can.CanError, OSError):
+                pass
+            self.task = None
+
+
+class FrameBurst:
+    """
+    Salve de trames de même ID envoyées à la suite à chaque cycle (messages préalloués).
+
+    Attributs :
+    -----------
+    messages : List[can.Message]
+        Un message par trame de la salve, réutilisé à chaque envoi.
+    """
+
+    def __init__(self, transport: "CanTransport", arbitration_id: int, count: int, size: int = 8):
+        self.transport = transport
+        self.size = size
+        self.messages = [can.Message(arbitration_id=arbitration_id, data=bytearray(size)) for _ in range(count)]
+
+    def send(self, buffer, timeout: float = None) -> int:
+        """
+        Envoie la salve : la trame k contient les octets [k*size, (k+1)*size[ de buffer.
+        La salve est interrompue à la première erreur (file d'émission pleine, bus coupé).
+
+        Returns:
+            int: Nombre de trames envoyées.
+        """
+        if not self.transport.open():
+            return 0
+        bus, size = self.transport.bus, self.size
+        for k, message in enumerate(self.messages):
+            message.data[:] = buffer[k * size : (k + 1) * size]
+            try:
+                bus.send(message, timeout)
+            except (can.CanError, OSError) as err:
+                print(f"Salve CAN interrompue après {k} trames :")
+                print(f"{type(err).__name__} was raised: {err}")
+                self.transport.reset()  # Bus rouvert à la salve suivante
+                return k
+        return len(self.messages)
+
+
+class CanTransport:
+    """
+    Bus CAN ouvert une fois (à la première utilisation, puis après une erreur).
+
+    Attributs :
+    -----------
+    channel, interface : str
+        Paramètres de can.Bus ("can0" et "socketcan" sur la voiture).
+
+    bus : can.BusABC
+        Bus ouvert (None s'il n'a pas pu être ouvert).
+
+    frames : List[PeriodicFrame]
+        Trames périodiques créées par periodic().
+    """
+
+    def __init__(self, channel: str = "can0", interface: str = "socketcan", **kwargs):
+        self.channel = channel
+        self.interface = interface
+        self.kwargs = kwargs
+        self.bus: Optional[can.BusABC] = None
+        self.frames: List[PeriodicFrame] = []
+
+    def open(self) -> bool:
+        """
+        Ouvre le bus s'il ne l'est pas déjà.
+
+        Returns:
+            bool: Faux si le bus n'a pas pu être ouvert (erreur affichée).
+        """
+        if self.bus is None:
+            try:
+                self.bus = can.Bus(channel=self.channel, interface=self.interface, **self.kwargs)
+            except (can.CanError, OSError) as err:
+                print("Bus CAN non ouvert :")
+                print(f"{type(err).__name__} was raised: {err}")
+                return False
+        return True
+
+    def close(self):
+        """Arrête les trames périodiques et ferme le bus."""
+        self.reset()
+
+    def reset(self):
+        """
+        Ferme le bus après une erreur (bus-off, interface tombée) : il sera rouvert à la prochaine
+        utilisation. Les trames périodiques sont arrêtées et redémarrent à leur prochaine mise à jour.
+        """
+        for frame in self.frames:
+            frame.stop()
+        if self.bus is not None:
+            try:
+                self.bus.shutdown()
+            except (can.CanError, OSError):
+                pass
+            self.bus = None
+
+    def send(self, arbitration_id: int, data) -> bool:
+        """
+        Envoie une trame une seule fois.
+
+        Returns:
+            bool: Faux si la trame n'a pas été envoyée (erreur affichée).
+        """
+        if not self.open():
+            return False
+        try:
+            self.bus.send(can.Message(arbitration_id=arbitration_id, data=data))
+        except (can.CanError, OSError) as err:
+            print("Message CAN non envoyé :")
+            print(f"{type(err).__name__} was raised: {err}")
+            self.reset()
+            return False
+        return True
+
+    def periodic(self, arbitration_id: int, length: int, period: float) -> PeriodicFrame:
+        """Crée une trame de length octets envoyée toutes les period secondes, à remplir avec update()."""
+        frame = PeriodicFrame(self, arbitration_id, length, period)
+        self.frames.append(frame)
+        return frame
+
+    def burst(self, arbitration_id: int, count: int) -> FrameBurst:
+        """Crée une salve de count trames de 8 octets, envoyée par FrameBurst.send()."""
+        return FrameBurst(self, arbitration_id, count)
+
+    def start_periodic(self, message: can.Message, period: float):
+        """Démarre l'envoi périodique de message (None si le bus n'a pas pu être ouvert)."""
+        if not self.open():
+            return None
+        return self.bus.send_periodic(message, period)
@@ -1,5 +1,7 @@
 from typing import List
 
+import numpy as np
+
 
 class CV:
     """
@@ -7,22 +9,22 @@ class CV:
     
     Attributs :
     -----------
-    c_codes : List[int]
+    c_codes : np.ndarray
         Liste des tensions mesurées sur les cellules (en code brut ADC).
         Longueur maximale : 18 cellules par circuit intégré (IC).
         Initialisation à 0 pour toutes les cellules.
         Ces valeurs seront mises à jour après lecture effective depuis les registres du LTC6811.
 
-    pec_match : List[int]
+    pec_match : np.ndarray
         Liste d’indicateurs d’erreurs PEC (Packet Error Code) pour chaque registre de tension cellule lu.
         Chaque élément vaut :
             0 → OK : le code PEC reçu correspond au code recalculé (données valides)
             1 → ERREUR : le code PEC ne correspond pas (données potentiellement corrompues)
     """
 
-    def __init__(self):
-        self.c_codes: List[int] = [0] * 18  
-        self.pec_match: List[int] = [0] * 6  
+    def __init__(self, pack: "PackState", ic: int):
+        self.c_codes: np.ndarray = pack.cell_codes[ic]  # Vue sur la ligne ic du PackState
+        self.pec_match: np.ndarray = pack.cell_pec[ic]
 
 
 class AX:
@@ -31,21 +33,21 @@ class AX:
 
     Attributs :
     -----------
-    a_codes : List[int]
+    a_codes : np.ndarray
         Liste des tensions mesurées sur les broches auxiliaires (ex : GPIO1 à GPIO5, Vref2, etc.).
         Chaque valeur est un code brut ADC, initialisé à 0.
         Longueur maximale : 9 codes (selon la configuration de l’IC).
 
-    pec_match : List[int]
+    pec_match : np.ndarray
         Liste d’indicateurs d’erreurs PEC (Packet Error Code) pour les lectures des registres auxiliaires.
         Chaque élément vaut :
             0 → OK : le code PEC reçu est correct (les données sont fiables)
             1 → ERREUR : le code PEC est incorrect (données potentiellement invalides)
     """
 
-    def __init__(self):
-        self.a_codes: List[int] = [0] * 9
-        self.pec_match: List[int] = [0] * 4
+    def __init__(self, pack: "PackState", ic: int):
+        self.a_codes: np.ndarray = pack.aux_codes[ic]  # Vue sur la ligne ic du PackState
+        self.pec_match: np.ndarray = pack.aux_pec[ic]
 
 
 class ST:
@@ -56,7 +58,7 @@ class ST:
 
     Attributs :
     -----------
-    stat_codes : List[int]
+    stat_codes : np.ndarray
         Liste contenant les valeurs mesurées dans les registres de statut internes
         Jusqu’à 4 codes peuvent être présents selon le nombre de registres activés (RDSTATA et RDSTATB).
         Chaque valeur correspond à une mesure brute (ADC), interprétée ailleurs si nécessaire.
@@ -76,19 +78,19 @@ class ST:
         composant a dépassé une limite critique, entraînant l’arrêt automatique de certaines fonctions pour éviter la surchauffe destructrice.
         Contient 1 bit indiquant si une condition de "thermal shutdown" a été détectée
 
-    pec_match : List[int]
+    pec_match : np.ndarray
         Indicateurs d’erreurs PEC associés à la lecture des registres de statut.
         Chaque élément vaut :
             0 → OK : le code PEC reçu est correct (données fiables)
             1 → ERREUR : le code PEC est incorrect (données potentiellement corrompues)
     """
 
-    def __init__(self):
-        self.stat_codes: List[int] = [0] * 4       
+    def __init__(self, pack: "PackState", ic: int):
+        self.stat_codes: np.ndarray = pack.stat_codes[ic]  # Vue sur la ligne ic du PackState
         self.flags: List[int] = [0] * 3            
         self.mux_fail: List[int] = [0] * 1         
         self.thsd: List[int] = [0] * 1             
-        self.pec_match: List[int] = [0] * 2        
+        self.pec_match: np.ndarray = pack.stat_pec[ic]
 
 
 
@@ -139,15 +141,15 @@ class PECCounter:
         Compteur d’erreurs PEC spécifiques aux registres de configuration (CFGA et CFGB).
         Ces erreurs peuvent entraîner une mauvaise configuration des paramètres critiques (seuils UV/OV, GPIO, etc.).
 
-    cell_pec : List[int]
+    cell_pec : np.ndarray
         Liste contenant les erreurs PEC associées à chaque registre de tension cellule (RDCVA à RDCVF).
         Taille 6 : un compteur par registre de mesure cellule.
 
-    aux_pec : List[int]
+    aux_pec : np.ndarray
         Liste contenant les erreurs PEC associées aux registres auxiliaires (RDAUXA à RDAUXD), utilisés notamment pour les GPIOs.
         Taille 4 : un compteur par registre auxiliaire.
 
-    stat_pec : List[int]
+    stat_pec : np.ndarray
         Liste contenant les erreurs PEC associées aux registres de statut (RDSTATA et RDSTATB).
         Taille 2 : un compteur par registre de statut.
 
@@ -160,12 +162,28 @@ class PECCounter:
         - Déclencher des actions correctives si nécessaire (relecture, sécurité...).
     """
 
-    def __init__(self):
-        self.pec_count: int = 0           
-        self.cfgr_pec: int = 0           
-        self.cell_pec: List[int] = [0] * 6  
-        self.aux_pec: List[int] = [0] * 4   
-        self.stat_pec: List[int] = [0] * 2  
+    def __init__(self, pack: "PackState", ic: int):
+        self._pack = pack
+        self._ic = ic
+        self.cell_pec: np.ndarray = pack.cell_pec_count[ic]  # Vues sur la ligne ic du PackState
+        self.aux_pec: np.ndarray = pack.aux_pec_count[ic]
+        self.stat_pec: np.ndarray = pack.stat_pec_count[ic]
+
+    @property
+    def pec_count(self) -> int:
+        return int(self._pack.pec_count[self._ic])
+
+    @pec_count.setter
+    def pec_count(self, value: int):
+        self._pack.pec_count[self._ic] = value
+
+    @property
+    def cfgr_pec(self) -> int:
+        return int(self._pack.cfgr_pec_count[self._ic])
+
+    @cfgr_pec.setter
+    def cfgr_pec(self, value: int):
+        self._pack.cfgr_pec_count[self._ic] = value
 
 
 class RegisterCfg:
@@ -211,6 +229,52 @@ class RegisterCfg:
 
 
 
+class PackState:
+    """
+    Stockage compact de l'état de tout le pack : un tableau NumPy contigu par grandeur,
+    indexé par (ic, canal). Les objets CellASIC de BMS_IC ne sont que des vues sur ces tableaux,
+    les traitements sur tout le pack (calculs, protections, enregistrement) lisent directement ces tableaux.
+
+    Attributs :
+    -----------
+    cell_codes : np.ndarray (total_ic x 18, uint16)
+        Codes bruts des tensions cellules (LSB = 100 µV).
+
+    aux_codes : np.ndarray (total_ic x 9, uint16)
+        Codes bruts des GPIO et de Vref2.
+
+    temp : np.ndarray (total_ic x 18, uint16)
+        Codes bruts du GPIO1 mémorisés pour chaque capteur de température du mux.
+
+    stat_codes : np.ndarray (total_ic x 4, uint16)
+        Codes bruts des registres de statut.
+
+    cell_pec, aux_pec, stat_pec : np.ndarray (uint8)
+        Indicateurs d'erreur PEC de la dernière lecture de chaque registre (0 → OK, 1 → ERREUR).
+
+    pec_count, cfgr_pec_count : np.ndarray (total_ic, int64)
+        Compteurs d'erreurs PEC globaux et des registres de configuration.
+
+    cell_pec_count, aux_pec_count, stat_pec_count : np.ndarray (int64)
+        Compteurs d'erreurs PEC par registre.
+    """
+
+    def __init__(self, total_ic: int):
+        self.total_ic = total_ic
+        self.cell_codes = np.zeros((total_ic, 18), dtype=np.uint16)
+        self.aux_codes = np.zeros((total_ic, 9), dtype=np.uint16)
+        self.temp = np.zeros((total_ic, 18), dtype=np.uint16)
+        self.stat_codes = np.zeros((total_ic, 4), dtype=np.uint16)
+        self.cell_pec = np.zeros((total_ic, 6), dtype=np.uint8)
+        self.aux_pec = np.zeros((total_ic, 4), dtype=np.uint8)
+        self.stat_pec = np.zeros((total_ic, 2), dtype=np.uint8)
+        self.pec_count = np.zeros(total_ic, dtype=np.int64)
+        self.cfgr_pec_count = np.zeros(total_ic, dtype=np.int64)
+        self.cell_pec_count = np.zeros((total_ic, 6), dtype=np.int64)
+        self.aux_pec_count = np.zeros((total_ic, 4), dtype=np.int64)
+        self.stat_pec_count = np.zeros((total_ic, 2), dtype=np.int64)
+
+
 class CellASIC:
     """
     Structure principale représentant un circuit intégré (IC) de gestion de batterie (BMS).
@@ -267,17 +331,19 @@ class CellASIC:
     system_open_wire : int
         Indicateur utilisé pour détecter des fils ouverts (open wire) dans les connexions de cellules.
 
-    temp : List[int]
-        Températures calculées à partir des tensions lues sur les GPIOs (via interpolation NTC).
+    temp : np.ndarray
+        Codes bruts des capteurs de température lus sur le GPIO1 (convertis en °C via interpolation NTC).
         Longueur 18 → pour couvrir toutes les entrées potentielles même si partiellement utilisées.
+
+    Les mesures (cells, aux, stat, crc_count, temp) sont des vues sur la ligne ic du PackState.
     """
 
-    def __init__(self):
+    def __init__(self, pack: PackState, ic: int):
         self.config = ICRegister()     # Registre de configuration A (CFGA)
         self.configb = ICRegister()    # Registre de configuration B (CFGB)
-        self.cells = CV()              # Mesures de tension cellule
-        self.aux = AX()                # Mesures GPIO / auxiliaires
-        self.stat = ST()               # Données internes (temp, VREG, flags)
+        self.cells = CV(pack, ic)      # Mesures de tension cellule
+        self.aux = AX(pack, ic)        # Mesures GPIO / auxiliaires
+        self.stat = ST(pack, ic)       # Données internes (temp, VREG, flags)
         self.com = ICRegister()        # Registre de communication
         self.pwm = ICRegister()        # Registre PWM A
         self.pwmb = ICRegister()       # Registre PWM B
@@ -285,15 +351,225 @@ class CellASIC:
         self.sctrlb = ICRegister()     # Registre de contrôle secondaire B
         self.sid: List[int] = [0] * 6  # Identifiant série (optionnel)
         self.isospi_reverse: bool = False  # Chaînage SPI inversé ?
-        self.crc_count = PECCounter()  # Compteur d'erreurs PEC
+        self.crc_count = PECCounter(pack, ic)  # Compteur d'erreurs PEC
         self.ic_reg = RegisterCfg()    # Configuration logique des tailles de registre
         self.system_open_wire: int = 0  # Fil ouvert détecté
-        self.temp = [0] * 18           # Températures interpolées (1 par GPIO possible)
+        self.temp = pack.temp[ic]      # Codes des capteurs de température (1 par entrée du mux possible)
+
+
+class Snapshot:
+    """
+    Photographie complète de la chaîne de BMS à l'issue d'un scan (voir LTC6811.scan).
+
+    Attributs :
+    -----------
+    timestamp : float
+        Instant (time.time()) du début du scan.
+
+    scan_time : float
+        Durée totale du scan en µs (réveil, conversions et lectures de tous les registres).
+
+    conv_time : int
+        Temps de conversion cumulé des ADC en µs.
+
+    c_codes : np.ndarray (total_ic x canaux)
+        Codes bruts des tensions cellules, une ligne par IC.
+
+    a_codes : np.ndarray (total_ic x canaux)
+        Codes bruts des GPIO et de Vref2, une ligne par IC.
+
+    stat_codes : np.ndarray (total_ic x canaux)
+        Codes bruts des registres de statut (SOC, ITMP, VA, VD), une ligne par IC.
+        Vides si les registres de statut n'ont pas été lus.
+
+    pec_error : int
+        Nombre de registres reçus avec un PEC erroné pendant le scan.
+
+    poll_timeout : int
+        Nombre de conversions non terminées avant l'échéance de LTC681x_pollAdc (non comptées dans conv_time).
+    """
+
+    def __init__(self, total_ic: int):
+        self.timestamp: float = 0.0
+        self.scan_time: float = 0.0
+        self.conv_time: int = 0
+        self.c_codes: np.ndarray = np.zeros((total_ic, 0), dtype=np.uint16)
+        self.a_codes: np.ndarray = np.zeros((total_ic, 0), dtype=np.uint16)
+        self.stat_codes: np.ndarray = np.zeros((total_ic, 0), dtype=np.uint16)
+        self.pec_error: int = 0
+        self.poll_timeout: int = 0
+
+
+class PackStats:
+    """
+    Statistiques du pack tenues à jour au moment où les mesures sont stockées, une seule fois :
+    les consommateurs (CAN, protections) lisent ces valeurs au lieu de reparcourir le pack.
+    Les cellules changent toutes à chaque scan (update_cells), les températures un capteur
+    à la fois (update_sensor) : la somme est mise à jour par différence et les extrêmes ne sont
+    recherchés dans tout le pack que si l'ancien extrême vient d'être remplacé par une valeur moins extrême.
+    Une colonne ne contenant que total_ic valeurs, les températures sont traitées en Python pur,
+    plus rapide que NumPy sur d'aussi petits tableaux.
+
+    Résultats identiques à un recalcul complet sur tout le pack (voir voltage() et temperature()) :
+    en cas d'égalité l'extrême retenu est la dernière occurrence (ordre BMS puis canal), les indices [BMS, canal] commencent à 1,
+    les températures hors de ]TEMP_MIN_VALID, 100] ne comptent pas pour le minimum, celles
+    hors de [-100, TEMP_MAX_VALID] pas pour le maximum (valeurs par défaut 100 et -100 si aucune).
+
+    Attributs :
+    -----------
+    cell_sum : int
+        Somme des codes des cellules mesurées (LSB = 100 µV).
+
+    cell_min, cell_max : int
+        Codes extrêmes des cellules, aux indices cell_min_at et cell_max_at ([BMS, cellule]).
+
+    temps : np.ndarray (total_ic x nb_sensors, float)
+        Températures des capteurs en °C.
+
+    temp_sum : float
+        Somme des températures.
+
+    temp_min, temp_max : float
+        Températures extrêmes retenues, aux indices temp_min_at et temp_max_at ([BMS, capteur]).
+    """
+
+    TEMP_MIN_VALID = -50  # °C, en dessous : valeur probablement erronée, ignorée pour le minimum
+    TEMP_MAX_VALID = 500  # °C, au dessus : valeur probablement erronée, ignorée pour le maximum
+
+    def __init__(self, total_ic: int, nb_cells: int, nb_sensors: int):
+        self.total_ic = total_ic
+        self.nb_cells = nb_cells
+        self.nb_sensors = nb_sensors
+        self.cell_sum: int = 0
+        self.cell_min: int = 0
+        self.cell_min_at: List[int] = [1, 1]
+        self.cell_max: int = 0
+        self.cell_max_at: List[int] = [1, 1]
+        self.temps = np.zeros((total_ic, nb_sensors))
+        self._columns: List[List[float]] = [[0.0] * total_ic for _ in range(nb_sensors)]
+        self.temp_sum: float = 0.0
+        self.temp_min: float = 100
+        self.temp_min_at: List[int] = [1, 1]
+        self.temp_max: float = -100
+        self.temp_max_at: List[int] = [1, 1]
+        self._low_flat = -1  # Indice à plat (BMS * nb_sensors + capteur) du minimum, -1 si aucun
+        self._high_flat = -1
+
+    ### Cellules
+
+    def update_cells(self, cell_codes: np.ndarray):
+        """
+        Met à jour les statistiques des cellules après un scan.
+        :param cell_codes: Codes des cellules (BMS x cellule, au moins nb_cells colonnes)
+        """
+        codes = cell_codes[:, : self.nb_cells]
+        self.cell_sum = int(codes.sum(dtype=np.int64))
+        flat = codes.ravel()
+        i = flat.size - 1 - int(np.argmin(flat[::-1]))  # Dernière occurrence
+        self.cell_min, self.cell_min_at = int(flat[i]), self._at(i, self.nb_cells)
+        i = flat.size - 1 - int(np.argmax(flat[::-1]))
+        self.cell_max, self.cell_max_at = int(flat[i]), self._at(i, self.nb_cells)
+
+    @property
+    def cell_mean(self) -> int:
+        return self.cell_sum / (self.total_ic * self.nb_cells)
+
+    @property
+    def cell_spread(self) -> int:
+        return self.cell_max - self.cell_min
+
+    def voltage(self) -> tuple:
+        """Statistiques des tensions : (Vtot, Vmoy, Vmax, i_max, Vmin, i_min) en V."""
+        return (
+            self.cell_sum * 0.0001,
+            self.cell_mean * 0.0001,
+            self.cell_max * 0.0001,
+            self.cell_max_at,
+            self.cell_min * 0.0001,
+            self.cell_min_at,
+        )
+
+    ### Températures
+
+    def set_temps(self, temps: np.ndarray):
+        """
+        Remplace toutes les températures (°C, BMS x capteur) et recalcule les statistiques.
+        """
+        self.temps[:] = temps[:, : self.nb_sensors]
+        self._columns = self.temps.T.tolist()   # Températures de chaque capteur (listes Python : une colonne ne contient que total_ic valeurs)
+        self.temp_sum = float(sum(map(sum, self._columns)))
+        self._rescan()
+
+    def update_sensor(self, sensor: int, temps: np.ndarray):
+        """
+        Met à jour la température du capteur sensor de chaque BMS.
+        :param temps: Nouvelles températures (°C), une par BMS
+        """
+        values = temps.tolist()
+        self.temp_sum += sum(values) - sum(self._columns[sensor])
+        self._columns[sensor] = values
+        self.temps[:, sensor] = values
+        n = self.nb_sensors
+        low_min, high_max = self.TEMP_MIN_VALID, self.TEMP_MAX_VALID
+
+        # Ancien extrême sur ce capteur devenu moins extrême : recherche dans tout le pack
+        if self._low_flat >= 0 and self._low_flat % n == sensor:
+            t = values[self._low_flat // n]
+            if not (low_min < t <= 100 and t <= self.temp_min):
+                self._rescan()
+                return
+        if self._high_flat >= 0 and self._high_flat % n == sensor:
+            t = values[self._high_flat // n]
+            if not (-100 <= t <= high_max and t >= self.temp_max):
+                self._rescan()
+                return
+
+        # Sinon, seules les nouvelles valeurs peuvent devenir l'extrême (dernière occurrence en cas d'égalité)
+        for ic, t in enumerate(values):
+            i = ic * n + sensor
+            if low_min < t <= 100 and (t < self.temp_min or (t == self.temp_min and i > self._low_flat)):
+                self._low_flat, self.temp_min, self.temp_min_at = i, t, [ic + 1, sensor + 1]
+            if -100 <= t <= high_max and (t > self.temp_max or (t == self.temp_max and i > self._high_flat)):
+                self._high_flat, self.temp_max, self.temp_max_at = i, t, [ic + 1, sensor + 1]
+
+    @property
+    def temp_mean(self) -> float:
+        return self.temp_sum / self.temps.size
+
+    @property
+    def temp_spread(self) -> float:
+        return self.temp_max - self.temp_min
+
+    def temperature(self) -> tuple:
+        """Statistiques des températures : (Tmoy, Tmax, i_max, Tmin, i_min) en °C."""
+        return (self.temp_mean, self.temp_max, self.temp_max_at, self.temp_min, self.temp_min_at)
+
+    def _rescan(self):
+        """Recherche les extrêmes des températures dans tout le pack."""
+        temps = self.temps
+        low = np.where((temps > self.TEMP_MIN_VALID) & (temps <= 100), temps, np.inf).ravel()
+        i = low.size - 1 - int(np.argmin(low[::-1]))    # Dernière occurrence
+        if np.isfinite(low[i]):
+            self._low_flat, self.temp_min, self.temp_min_at = i, float(low[i]), self._at(i, self.nb_sensors)
+        else:
+            self._low_flat, self.temp_min, self.temp_min_at = -1, 100, [1, 1]
+        high = np.where((temps <= self.TEMP_MAX_VALID) & (temps >= -100), temps, -np.inf).ravel()
+        i = high.size - 1 - int(np.argmax(high[::-1]))
+        if np.isfinite(high[i]):
+            self._high_flat, self.temp_max, self.temp_max_at = i, float(high[i]), self._at(i, self.nb_sensors)
+        else:
+            self._high_flat, self.temp_max, self.temp_max_at = -1, -100, [1, 1]
+
+    @staticmethod
+    def _at(i: int, width: int) -> List[int]:
+        ic, channel = divmod(i, width)
+        return [ic + 1, channel + 1]
 
 
 def init(total_ic):
     """
-    Initialise les configurations pour chaque IC BMS.
+    Initialise le stockage du pack et les configurations pour chaque IC BMS.
     """
-    global BMS_IC
-    BMS_IC = [CellASIC() for _ in range(total_ic)]
+    global PACK, BMS_IC
+    PACK = PackState(total_ic)
+    BMS_IC = [CellASIC(PACK, ic) for ic in range(total_ic)]
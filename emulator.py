@@ -0,0 +1,433 @@
+"""
+Émulateur logiciel d'une chaîne de LTC6811 en daisy chain, branché derrière l'interface
+de transport SPI (voir transport.py). Il permet de faire tourner et de mesurer la boucle
+de Monitoring sur un PC Linux, et de tester des chaînes de 1 à 16 IC sans matériel.
+
+Utilisation :
+    import LTC681x, emulator
+    LTC681x.set_transport(emulator.DaisyChainEmulator(total_ic))
+    LTC6811.init()
+
+Modélisé :
+    - décodage des commandes et vérification de leur PEC ;
+    - WRCFGA/RDCFGA, seuils UV/OV et ADCOPT ;
+    - ADCV/ADAX/ADSTAT/ADCVSC/ADCVAX avec les durées de conversion de la datasheet, PLADC ;
+    - RDCV/RDAUX/RDSTAT avec leur PEC, CLRCELL/CLRAUX/CLRSTAT ;
+    - WRCOMM/RDCOMM/STCOMM vers les multiplexeurs ADG728, dont la sortie est reliée au GPIO1 ;
+    - passage en IDLE de l'isoSPI (tIDLE) et en SLEEP du cœur (tSLEEP), puce par puce :
+      un transfert reçu par une puce endormie la réveille mais est perdu pour elle et les suivantes.
+Non modélisé : décharge des cellules, auto-tests (CVST, ADOW...), PWM et S control,
+registres des LTC6812/6813 (les lectures correspondantes renvoient 0xFF comme sur le bus réel).
+Les registres sont mis à jour en une fois à la fin de la conversion.
+"""
+
+import time
+import numpy as np
+
+from typing import List, Optional
+
+from LTC681x import CONV_TIME_US, pec15
+from transport import SpiTransport
+
+# Temps caractéristiques (datasheet LTC6811, valeurs typiques)
+T_IDLE = 5.5e-3  # s, l'isoSPI passe en IDLE sans activité
+T_SLEEP = 2.0  # s, le cœur passe en SLEEP sans commande valide (watchdog)
+T_READY = 10e-6  # s, réveil de l'isoSPI depuis IDLE
+T_WAKE = 300e-6  # s, réveil du cœur depuis SLEEP
+
+LSB = 100e-6  # V, résolution des codes de tension
+NUM_CELLS = 12
+NUM_GPIO = 5
+STAT_SC, STAT_ITMP, STAT_VA, STAT_VD = range(4)  # Index des codes du registre de statut
+REVISION = 0b0001  # Champ REV du registre STATB
+
+# Multiplexeurs ADG728 sur le bus I2C des GPIO
+ADG728 = 0b10011  # Bits fixes de l'adresse, suivis de A1 A0
+MUX_CHANNELS = 8  # Voies par multiplexeur
+MUX_COUNT = 4  # Adresses possibles (A1 A0)
+MUX_GPIO = 0  # Sortie commune des multiplexeurs sur GPIO1
+ICOM_START = 0b0110
+ICOM_STOP = 0b0001
+ICOM_NO_TRANSMIT = 0b0111
+FCOM_NACK_STOP = 0b1001
+
+CFGR_DEFAULT = bytes([0xF8, 0, 0, 0, 0, 0])  # GPIO en haute impédance, REFON et ADCOPT à 0
+COMM_DEFAULT = bytes([0x70, 0x07] * 3)  # NO TRANSMIT
+CODE_CLEARED = 0xFFFF  # Valeur des registres après CLRxxx ou réveil
+
+# Codes des commandes (11 bits)
+WRCFGA = 0x001
+RDCFGA = 0x002
+RDCV = {0x004: 0, 0x006: 1, 0x008: 2, 0x00A: 3}  # Commande : groupe de registres
+RDAUX = {0x00C: 0, 0x00E: 1}
+RDSTATA = 0x010
+RDSTATB = 0x012
+CLRCELL = 0x711
+CLRAUX = 0x712
+CLRSTAT = 0x713
+PLADC = 0x714
+WRCOMM = 0x721
+RDCOMM = 0x722
+STCOMM = 0x723
+
+
+def decode_conversion(code: int):
+    """
+    Décode une commande de conversion.
+
+    Args:
+        code (int): Code de la commande sur 11 bits.
+    Returns:
+        (nom, MD, voie) avec nom une clé de LTC681x.CONV_TIME_US, ou None.
+    """
+    md = (code >> 7) & 0b11
+    if code & 0x66F == 0x46F:
+        return "ADCVAX", md, 0
+    if code & 0x66F == 0x467:
+        return "ADCVSC", md, 0
+    if code & 0x678 == 0x460 and code & 0b111 <= 6:
+        return "ADAX", md, code & 0b111
+    if code & 0x678 == 0x468 and code & 0b111 <= 4:
+        return "ADSTAT", md, code & 0b111
+    if code & 0x668 == 0x260 and code & 0b111 <= 6:
+        return "ADCV", md, code & 0b111
+    return None
+
+
+class LTC6811Model:
+    """
+    Modèle d'un LTC6811 de la chaîne.
+
+    Attributs :
+    -----------
+    cell_voltages : np.ndarray
+        Tensions des 12 cellules, en V.
+
+    gpio_voltages : np.ndarray
+        Tensions appliquées sur GPIO1 à GPIO5, en V.
+        GPIO1 est remplacée par la voie sélectionnée sur les multiplexeurs quand il y en a une.
+
+    sensor_voltages : np.ndarray
+        Tensions des capteurs de température sur les voies des multiplexeurs, en V
+        (voie k du multiplexeur d'adresse a : index a * 8 + k).
+
+    vref2, va, vd : float
+        Tensions de la seconde référence et des régulateurs analogique et numérique, en V.
+
+    die_temp : float
+        Température interne de la puce, en °C.
+
+    noise : float
+        Écart type du bruit ajouté à chaque mesure, en V.
+    """
+
+    def __init__(self, rng: np.random.Generator):
+        self.rng = rng
+        self.cell_voltages: np.ndarray = np.full(NUM_CELLS, 3.7)
+        self.gpio_voltages: np.ndarray = np.full(NUM_GPIO, 1.5)
+        self.sensor_voltages: np.ndarray = np.full(MUX_COUNT * MUX_CHANNELS, 1.5)
+        self.vref2: float = 3.0
+        self.va: float = 5.0
+        self.vd: float = 3.0
+        self.die_temp: float = 25.0
+        self.noise: float = 0.0
+
+        self.mux = [0] * MUX_COUNT  # Octet de sélection des voies de chaque ADG728
+        self.last_activity = float("-inf")  # Dernier transfert reçu
+        self.last_command = float("-inf")  # Dernière commande valide (watchdog)
+        self.ready_at = float("-inf")  # Fin du réveil en cours
+        self.reset()
+
+    def reset(self):
+        """Remet les registres à leur valeur de réveil (le cœur sort de SLEEP)."""
+        self.cfgr = bytearray(CFGR_DEFAULT)
+        self.comm = bytearray(COMM_DEFAULT)
+        self.cell_codes = np.full(NUM_CELLS, CODE_CLEARED, dtype=np.uint16)
+        self.aux_codes = np.full(NUM_GPIO + 1, CODE_CLEARED, dtype=np.uint16)
+        self.stat_codes = np.full(4, CODE_CLEARED, dtype=np.uint16)
+        self.cuv = np.zeros(NUM_CELLS, dtype=bool)
+        self.cov = np.zeros(NUM_CELLS, dtype=bool)
+        self.pending = []  # (tableau, index, codes) appliqués à la fin de la conversion
+        self.conv_end = float("-inf")
+
+    ### Réveil
+
+    def ready(self, t: float) -> bool:
+        """Vrai si la puce peut recevoir un transfert commençant à t."""
+        return (
+            t - self.last_command < T_SLEEP
+            and t >= self.ready_at
+            and t - self.last_activity < T_IDLE
+        )
+
+    def wake(self, t: float):
+        """Réveille la puce par un transfert commençant à t (le transfert est perdu)."""
+        if t < self.ready_at:
+            pass  # Réveil déjà en cours
+        elif t - self.last_command >= T_SLEEP:
+            self.reset()
+            self.ready_at = t + T_WAKE
+            self.last_command = t  # Le watchdog démarre au réveil du cœur
+        else:
+            self.ready_at = t + T_READY
+        self.last_activity = t
+
+    ### Conversions
+
+    def measure(self, volts) -> np.ndarray:
+        """Convertit des tensions en codes ADC (bruit compris)."""
+        volts = np.asarray(volts, dtype=float)
+        if self.noise:
+            volts = volts + self.rng.normal(0.0, self.noise, volts.shape)
+        return np.clip(np.rint(volts / LSB), 0, 0xFFFF).astype(np.uint16)
+
+    def gpio_inputs(self) -> np.ndarray:
+        """Tensions vues sur GPIO1 à GPIO5 puis VREF2."""
+        inputs = np.append(self.gpio_voltages, self.vref2)
+        selected = [
+            adr * MUX_CHANNELS + k
+            for adr, pins in enumerate(self.mux)
+            for k in range(MUX_CHANNELS)
+            if pins >> k & 1
+        ]
+        if selected:
+            # Plusieurs voies fermées court-circuitent leurs capteurs
+            inputs[MUX_GPIO] = self.sensor_voltages[selected].mean()
+        return inputs
+
+    def stat_inputs(self) -> np.ndarray:
+        """Tensions correspondant aux codes SC, ITMP, VA et VD."""
+        return np.array(
+            [
+                self.cell_voltages.sum() / 20,
+                (self.die_temp + 273) * 7.5e-3,
+                self.va,
+                self.vd,
+            ]
+        )
+
+    def start_conversion(self, conv: str, md: int, channel: int, t: float):
+        """
+        Démarre une conversion, dont les résultats seront visibles à partir de conv_end.
+
+        Args:
+            conv (str): Nom de la conversion (clé de LTC681x.CONV_TIME_US).
+            md (int): Mode de l'ADC.
+            channel (int): Champ CH, CHG ou CHST de la commande (0 : toutes les voies).
+            t (float): Début de la conversion.
+        """
+        duration = CONV_TIME_US[conv][md][self.cfgr[0] & 0x01] * 1e-6
+        cells = slice(None)
+        pending = []
+        if conv == "ADCV" and channel:
+            cells = [channel - 1, channel + 5]
+            duration /= 6  # Une seule paire de cellules
+        if conv in ("ADCV", "ADCVSC", "ADCVAX"):
+            pending.append((self.cell_codes, cells, self.measure(self.cell_voltages[cells])))
+        if conv == "ADAX":
+            aux = slice(None) if not channel else channel - 1
+            if channel:
+                duration /= 6
+            pending.append((self.aux_codes, aux, self.measure(self.gpio_inputs()[aux])))
+        if conv == "ADCVAX":
+            pending.append((self.aux_codes, slice(0, 2), self.measure(self.gpio_inputs()[:2])))
+        if conv == "ADSTAT":
+            stat = slice(None) if not channel else channel - 1
+            if channel:
+                duration /= 4
+            pending.append((self.stat_codes, stat, self.measure(self.stat_inputs()[stat])))
+        if conv == "ADCVSC":
+            pending.append((self.stat_codes, STAT_SC, self.measure(self.stat_inputs()[STAT_SC])))
+        self.pending = pending
+        self.conv_end = t + duration
+
+    def settle(self, t: float):
+        """Applique les résultats de la conversion si elle est terminée à t."""
+        if not self.pending or t < self.conv_end:
+            return
+        for array, index, codes in self.pending:
+            array[index] = codes
+            if array is self.cell_codes:
+                self.check_thresholds(index)
+        self.pending = []
+
+    def check_thresholds(self, cells):
+        """Met à jour les drapeaux UV/OV des cellules converties, d'après les seuils de CFGR."""
+        vuv = self.cfgr[1] | (self.cfgr[2] & 0x0F) << 8
+        vov = self.cfgr[2] >> 4 | self.cfgr[3] << 4
+        codes = self.cell_codes[cells].astype(int)
+        self.cuv[cells] = codes < (vuv + 1) * 16
+        self.cov[cells] = codes > vov * 16
+
+    ### Registres
+
+    def read_register(self, code: int) -> Optional[bytes]:
+        """Contenu (6 octets) du registre lu par la commande code, None si elle n'en lit pas."""
+        if code == RDCFGA:
+            return bytes(self.cfgr)
+        if code in RDCV:
+            group = RDCV[code]
+            return self.cell_codes[3 * group : 3 * group + 3].astype("<u2").tobytes()
+        if code in RDAUX:
+            group = RDAUX[code]
+            return self.aux_codes[3 * group : 3 * group + 3].astype("<u2").tobytes()
+        if code == RDSTATA:
+            return self.stat_codes[:3].astype("<u2").tobytes()
+        if code == RDSTATB:
+            flags = 0
+            for cell in range(NUM_CELLS):
+                flags |= int(self.cuv[cell]) << 2 * cell | int(self.cov[cell]) << 2 * cell + 1
+            return (
+                self.stat_codes[STAT_VD : STAT_VD + 1].astype("<u2").tobytes()
+                + flags.to_bytes(3, "little")
+                + bytes([REVISION << 4])
+            )
+        if code == RDCOMM:
+            return bytes(self.comm)
+        return None
+
+    def write_register(self, code: int, data: bytes):
+        """Écrit les 6 octets data dans le registre de la commande code."""
+        if code == WRCFGA:
+            self.cfgr[:] = data
+        elif code == WRCOMM:
+            self.comm[:] = data
+
+    def execute(self, code: int, t: float):
+        """Exécute une commande sans données."""
+        conversion = decode_conversion(code)
+        if conversion is not None:
+            self.start_conversion(*conversion, t)
+        elif code == CLRCELL:
+            self.cell_codes[:] = CODE_CLEARED
+        elif code == CLRAUX:
+            self.aux_codes[:] = CODE_CLEARED
+        elif code == CLRSTAT:
+            self.stat_codes[:] = CODE_CLEARED
+            self.cuv[:] = False
+            self.cov[:] = False
+        elif code == STCOMM:
+            self.stcomm()
+
+    def stcomm(self):
+        """Envoie sur le bus I2C les 3 octets du registre COMM."""
+        target = None  # Octet d'adresse de la transaction en cours
+        for k in range(3):
+            icom = self.comm[2 * k] >> 4
+            fcom = self.comm[2 * k + 1] & 0x0F
+            byte = (self.comm[2 * k] & 0x0F) << 4 | self.comm[2 * k + 1] >> 4
+            if icom == ICOM_NO_TRANSMIT:
+                continue
+            if icom == ICOM_STOP:
+                target = None
+                continue
+            if icom == ICOM_START:
+                target = byte
+            elif target is not None and target >> 3 == ADG728 and not target & 1:
+                self.mux[(target >> 1) & 0b11] = byte
+            if fcom == FCOM_NACK_STOP:
+                target = None
+
+
+class DaisyChainEmulator(SpiTransport):
+    """
+    Chaîne de total_ic LTC6811 vue depuis le maître SPI.
+    La puce d'index 0 est la plus proche du maître : elle répond en premier
+    et reçoit le dernier bloc de données d'une écriture.
+
+    Attributs :
+    -----------
+    chips : List[LTC6811Model]
+        Les puces de la chaîne, modifiables pour imposer les tensions mesurées.
+
+    realtime : bool
+        Si vrai, chaque transfert dure le temps réel de son envoi sur le bus.
+        Sinon le temps du bus est seulement compté (horloge virtuelle en avance sur l'horloge réelle).
+
+    cmd_pec_errors : int
+        Nombre de commandes rejetées pour une erreur de PEC.
+    """
+
+    def __init__(self, total_ic: int = 1, realtime: bool = True, noise: float = 0.0, seed=None):
+        super().__init__()
+        rng = np.random.default_rng(seed)
+        self.chips: List[LTC6811Model] = [LTC6811Model(rng) for _ in range(total_ic)]
+        for chip in self.chips:
+            chip.noise = noise
+        self.realtime: bool = realtime
+        self.cmd_pec_errors: int = 0
+        self.bus_time = float("-inf")  # Fin du dernier transfert
+
+    def open(self, bus: int, device: int) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def xfer3(self, data: List[int]) -> List[int]:
+        tx = bytes(data)
+        start = max(time.perf_counter(), self.bus_time)
+        self.bus_time = start + 8 * len(tx) / self.max_speed_hz
+        rx = self.transfer(tx, start)
+        if self.realtime:
+            remaining = self.bus_time - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+        return list(rx)
+
+    def wake(self, t: float) -> int:
+        """
+        Propage un transfert commençant à t le long de la chaîne.
+
+        Returns:
+            int: Nombre de puces qui reçoivent le transfert (les suivantes sont inaccessibles).
+        """
+        for k, chip in enumerate(self.chips):
+            if not chip.ready(t):
+                chip.wake(t)
+                return k
+            chip.last_activity = t
+        return len(self.chips)
+
+    def transfer(self, tx: bytes, start: float) -> bytearray:
+        """Traite un transfert complet (chip select bas) et renvoie les octets lus."""
+        rx = bytearray(b"\xff" * len(tx))  # SDO reste haut quand personne ne répond
+        chips = self.chips[: self.wake(start)]
+        if len(tx) < 4 or not chips or not tx.strip(b"\xff"):
+            return rx  # Transfert de réveil, sans commande
+        if pec15(tx[:2]) != (tx[2] << 8) | tx[3]:
+            self.cmd_pec_errors += 1
+            return rx
+
+        code = (tx[0] << 8 | tx[1]) & 0x7FF
+        for chip in chips:
+            chip.last_command = start
+            chip.settle(start)
+
+        if code in (WRCFGA, WRCOMM):
+            payload = tx[4:]
+            blocks = len(payload) // 8
+            for k, chip in enumerate(chips):
+                if k >= blocks:
+                    break
+                # Les données destinées au haut de la chaîne sont envoyées en premier
+                block = payload[8 * (blocks - 1 - k) : 8 * (blocks - k)]
+                if pec15(block[:6]) == (block[6] << 8) | block[7]:
+                    chip.write_register(code, block[:6])
+        elif code == PLADC:
+            # SDO reste bas tant qu'une puce de la chaîne convertit
+            conv_end = max(chip.conv_end for chip in chips)
+            byte_time = 8 / self.max_speed_hz
+            for i in range(4, len(tx)):
+                rx[i] = 0xFF if start + i * byte_time >= conv_end else 0x00
+        elif chips[0].read_register(code) is not None:
+            for k, chip in enumerate(chips):
+                data = chip.read_register(code)
+                pec = pec15(data)
+                block = data + bytes([pec >> 8, pec & 0xFF])
+                offset = 4 + 8 * k
+                rx[offset : offset + 8] = block[: max(0, len(tx) - offset)]
+        else:
+            for chip in chips:
+                chip.execute(code, start)
+        return rx
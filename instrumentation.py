@@ -0,0 +1,163 @@
+"""
+Instrumentation permanente du chemin critique : durée de chaque étape de la boucle de
+Monitoring et des fonctions SPI du driver, rangée dans des histogrammes à cases fixes.
+
+Les durées sont mesurées en ns (time.perf_counter_ns) et rangées dans des cases de
+largeur doublée à chaque fois : la case k compte les durées de [2^(k-1), 2^k[ x 1024 ns,
+la case 0 celles de moins de 1024 ns. Enregistrer une durée ne coûte qu'un décalage et
+quelques additions, l'instrumentation peut donc rester active sur la voiture.
+
+Les histogrammes sont écrits en JSON toutes les DUMP_PERIOD secondes par maybe_dump(),
+ou au cycle suivant la réception de SIGUSR1 (kill -USR1 <pid>).
+"""
+
+import functools
+import json
+import os
+import signal
+import time
+from typing import Dict, List
+
+ENABLED = True  # Instrumente les fonctions décorées par timed (lu à l'import des modules)
+NB_BUCKETS = 24  # Case 23 : au-delà de 2^22 x 1024 ns (~4.3 s)
+BUCKET_SHIFT = 10  # Largeur de la case 0 : 2^10 ns
+DUMP_PERIOD = 60  # s, période d'écriture des histogrammes
+
+now_ns = time.perf_counter_ns
+
+_start = time.monotonic()
+_last_dump = _start
+_dump_requested = False
+
+
+class Histogram:
+    """
+    Histogramme des durées d'une étape.
+
+    Attributs :
+    -----------
+    counts : List[int]
+        Nombre de durées dans chaque case.
+
+    count, total, max : int
+        Nombre de durées enregistrées, leur somme et leur maximum, en ns.
+    """
+
+    def __init__(self):
+        self.counts: List[int] = [0] * NB_BUCKETS
+        self.count: int = 0
+        self.total: int = 0
+        self.max: int = 0
+
+    def record(self, ns: int):
+        """Enregistre une durée en ns."""
+        bucket = (ns >> BUCKET_SHIFT).bit_length()
+        self.counts[bucket if bucket < NB_BUCKETS else NB_BUCKETS - 1] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, p: float) -> float:
+        """Borne supérieure (en µs) de la case contenant le percentile p."""
+        rank = self.count * p / 100
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return bucket_edge_us(bucket)
+        return 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count / 1e3 if self.count else 0.0,
+            "max_us": self.max / 1e3,
+            "p50_us": self.percentile(50),
+            "p99_us": self.percentile(99),
+            "counts": self.counts,
+        }
+
+
+HISTOGRAMS: Dict[str, Histogram] = {}
+
+
+def bucket_edge_us(bucket: int) -> float:
+    """Borne supérieure (exclue) de la case bucket, en µs."""
+    return (1 << (bucket + BUCKET_SHIFT)) / 1e3
+
+
+def histogram(name: str) -> Histogram:
+    """Renvoie l'histogramme name, créé au premier appel."""
+    if name not in HISTOGRAMS:
+        HISTOGRAMS[name] = Histogram()
+    return HISTOGRAMS[name]
+
+
+def timed(name: str):
+    """
+    Décorateur enregistrant la durée de chaque appel dans l'histogramme name.
+    Sans effet si ENABLED est faux.
+    """
+
+    def decorator(func):
+        if not ENABLED:
+            return func
+        record = histogram(name).record
+        now = now_ns  # Variables locales de la fermeture, plus rapides que les globales
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = now()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(now() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def reset():
+    """Remet à zéro tous les histogrammes."""
+    for hist in HISTOGRAMS.values():
+        hist.__init__()
+
+
+def dump() -> dict:
+    """Contenu de tous les histogrammes."""
+    return {
+        "uptime_s": time.monotonic() - _start,
+        "bucket_edges_us": [bucket_edge_us(bucket) for bucket in range(NB_BUCKETS)],
+        "histograms": {name: hist.to_dict() for name, hist in HISTOGRAMS.items()},
+    }
+
+
+def dump_to(path: str):
+    """Ecrit les histogrammes dans le fichier JSON path (remplacé en une fois)."""
+    global _last_dump, _dump_requested
+    with open(path + ".tmp", "w") as f:
+        json.dump(dump(), f, indent=1)
+    os.replace(path + ".tmp", path)
+    _last_dump = time.monotonic()
+    _dump_requested = False
+
+
+def maybe_dump(path: str):
+    """
+    Ecrit les histogrammes si DUMP_PERIOD est écoulée ou si SIGUSR1 a été reçu.
+    A appeler une fois par cycle, hors des étapes mesurées.
+    """
+    if _dump_requested or time.monotonic() - _last_dump >= DUMP_PERIOD:
+        dump_to(path)
+
+
+def _request_dump(signum, frame):
+    global _dump_requested
+    _dump_requested = True  # L'écriture est faite par maybe_dump, hors d'un transfert SPI
+
+
+def install_signal_handler(signum=signal.SIGUSR1):
+    """Demande une écriture des histogrammes à la réception du signal signum."""
+    signal.signal(signum, _request_dump)
@@ -0,0 +1,159 @@
+"""
+Dernier enregistrement de la boucle de Monitoring, partagé en mémoire avec les autres processus
+(tableaux de bord, outils de diagnostic) à la place du fichier actualdata.bin réécrit à chaque cycle.
+
+Le fichier LIVE_PATH est dans /dev/shm (en RAM, jamais sur la carte SD) et projeté en mémoire
+(mmap) par l'écrivain et par chaque lecteur : une fois ouvert, lire ou écrire ne fait aucun
+appel système. La cohérence est assurée par un seqlock : l'écrivain rend le compteur impair
+pendant la copie puis pair après ; le lecteur recommence s'il a vu un compteur impair ou s'il
+a changé pendant sa copie. Un CRC32 du contenu détecte en plus une lecture incohérente due à
+l'ordre des accès mémoire entre cœurs (aucune barrière mémoire n'est disponible en Python).
+
+Disposition du fichier (little-endian) :
+    0   magic b"AMSL"
+    4   version (u16), taille de l'en-tête (u16)
+    8   taille maximale du contenu (u32), réservé (u32)
+    16  compteur du seqlock (u64) : impair pendant une écriture, 2 x nombre d'écritures sinon
+    24  CRC32 du contenu (u32), taille du contenu (u32)
+    32  contenu : l'enregistrement du log (voir Monitoring.encode_record)
+
+Lecture depuis un autre processus :
+    reader = LiveReader()
+    data = reader.read()            # dernier enregistrement cohérent (None si aucun)
+    data = reader.read_if_new()     # None s'il n'a pas changé depuis la lecture précédente
+ou en ligne de commande : python livesnapshot.py [--rate 1000]
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Optional
+
+LIVE_PATH = "/dev/shm/ams_live"
+MAGIC = b"AMSL"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")  # magic, version, taille de l'en-tête, taille maximale, réservé
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 16
+CONTENT = struct.Struct("<II")  # CRC32, taille du contenu
+CONTENT_OFFSET = 24
+HEADER_SIZE = 32
+READ_TIMEOUT = 0.1  # Durée (s) maximale d'une lecture avant d'abandonner (écrivain bloqué au milieu d'une écriture)
+
+
+class LiveWriter:
+    """
+    Ecrivain du dernier enregistrement. Un seul écrivain, dont dépend la validité du seqlock :
+    l'étape publish du thread d'acquisition de Monitoring.
+
+    Attributs :
+    -----------
+    capacity : int
+        Taille maximale d'un enregistrement, en octets.
+
+    seq : int
+        Compteur du seqlock (pair hors écriture).
+    """
+
+    def __init__(self, capacity: int, path: str = LIVE_PATH):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size < HEADER_SIZE + capacity:
+                size = HEADER_SIZE + capacity
+                os.ftruncate(fd, size)  # Jamais réduit : un lecteur encore ouvert lirait hors du fichier (SIGBUS)
+            self.map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)  # La projection reste valable après la fermeture du fichier
+        self.capacity = size - HEADER_SIZE
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, HEADER_SIZE, self.capacity, 0)
+        self.seq = SEQ.unpack_from(self.map, SEQ_OFFSET)[0] & ~1  # Reprend après une écriture interrompue
+        SEQ.pack_into(self.map, SEQ_OFFSET, self.seq)
+
+    def write(self, data: bytes):
+        """Publie data (au plus capacity octets) comme dernier enregistrement."""
+        size = len(data)
+        if size > self.capacity:
+            raise ValueError(f"Enregistrement de {size} octets, {self.capacity} au plus")
+        m = self.map
+        SEQ.pack_into(m, SEQ_OFFSET, self.seq + 1)  # Impair : écriture en cours
+        m[HEADER_SIZE : HEADER_SIZE + size] = data
+        CONTENT.pack_into(m, CONTENT_OFFSET, zlib.crc32(data), size)
+        self.seq += 2
+        SEQ.pack_into(m, SEQ_OFFSET, self.seq)
+
+    def close(self):
+        self.map.close()
+
+
+class LiveReader:
+    """
+    Lecteur du dernier enregistrement, depuis n'importe quel processus.
+
+    Attributs :
+    -----------
+    seq : int
+        Compteur du seqlock de la dernière lecture réussie (nombre d'écritures x 2).
+
+    retries : int
+        Nombre de lectures recommencées (écriture concurrente ou contenu incohérent).
+    """
+
+    def __init__(self, path: str = LIVE_PATH):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_size, capacity, _ = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} n'est pas un instantané AMS (version {VERSION})")
+        self.capacity = capacity
+        self.seq = -1
+        self.retries = 0
+
+    def read(self) -> Optional[bytes]:
+        """
+        Dernier enregistrement cohérent, None si aucun n'a encore été écrit.
+        Lève TimeoutError si l'écrivain semble bloqué au milieu d'une écriture.
+        """
+        m = self.map
+        deadline = None
+        while True:
+            seq = SEQ.unpack_from(m, SEQ_OFFSET)[0]
+            if not seq & 1:
+                crc, size = CONTENT.unpack_from(m, CONTENT_OFFSET)
+                data = m[HEADER_SIZE : HEADER_SIZE + min(size, self.capacity)]
+                if SEQ.unpack_from(m, SEQ_OFFSET)[0] == seq and zlib.crc32(data) == crc:
+                    self.seq = seq
+                    return data if seq else None
+            self.retries += 1
+            if deadline is None:
+                deadline = time.monotonic() + READ_TIMEOUT
+            elif time.monotonic() > deadline:
+                raise TimeoutError("Instantané en cours d'écriture depuis trop longtemps")
+            os.sched_yield()  # Laisse l'écrivain terminer
+
+    def read_if_new(self) -> Optional[bytes]:
+        """Comme read, mais None si l'enregistrement n'a pas changé depuis la dernière lecture."""
+        if SEQ.unpack_from(self.map, SEQ_OFFSET)[0] == self.seq:
+            return None
+        return self.read()
+
+    def close(self):
+        self.map.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lecture de l'instantané partagé de Monitoring")
+    parser.add_argument("--path", default=LIVE_PATH)
+    parser.add_argument("--rate", type=float, default=10, help="lectures par seconde")
+    args = parser.parse_args()
+    reader = LiveReader(args.path)
+    while True:
+        data = reader.read_if_new()
+        if data is not None:
+            timestamp = int.from_bytes(data[:8]) / 1e8  # Début de l'enregistrement : timestamp (voir Monitoring.encode_record)
+            print(f"écriture {reader.seq // 2} : {len(data)} octets, t = {timestamp:.3f}")
+        time.sleep(1 / args.rate)
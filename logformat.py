@@ -0,0 +1,292 @@
+"""
+Format du log binaire data.bin : un en-tête décrivant le fichier, puis des enregistrements
+de taille fixe, de disposition décrite par un seul struct.Struct précompilé et écrits dans un
+tampon réutilisé.
+
+L'en-tête contient tout ce qu'il faut pour relire le fichier sans importer Monitoring,
+LTC6811 ou ADC : nombre de BMS, de cellules et de capteurs, taille de NO_PROBLEM et
+d'un enregistrement, et facteurs d'échelle des valeurs brutes.
+
+Disposition (big-endian, comme les enregistrements) :
+    En-tête (HEADER_SIZE octets, complété par des zéros) :
+        magic b"AMSB", version (u16), taille de l'en-tête (u16),
+        total_ic, nb_cells, nb_sensors, no_problem_bytes (u16), taille d'un enregistrement (u32),
+        time_lsb (s), voltage_lsb (V), current_lsb (A) (f64)
+    Enregistrement :
+        timestamp (u64, en time_lsb), valeur de l'ADC du courant (i16),
+        pour chaque BMS : codes des nb_cells cellules puis des nb_sensors capteurs (u16, en voltage_lsb),
+        NO_PROBLEM (no_problem_bytes octets, bit 0 = bit de poids fort)
+
+Les fichiers écrits avant l'en-tête (version 0) ont les mêmes enregistrements, sans en-tête :
+ils se relisent en donnant les dimensions et le facteur d'échelle du courant à LogFormat.
+
+Recherche par date (read_range) : les timestamps étant croissants, les enregistrements d'un
+intervalle sont trouvés par dichotomie, en lisant log2(nombre d'enregistrements) timestamps.
+Un index creux (path + INDEX_SUFFIX, timestamp d'un enregistrement sur INDEX_STRIDE, voir
+build_index) réduit encore les lectures, par exemple pour une archive sur la carte SD.
+
+Disposition de l'index (big-endian) :
+    magic b"AMSI", version (u16), réservé (u16), pas (u32), taille d'un enregistrement (u32),
+    nombre d'enregistrements indexés (u64), puis un timestamp (u64) tous les pas enregistrements
+"""
+
+import os
+import struct
+from typing import BinaryIO, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"AMSB"
+VERSION = 1
+HEADER = struct.Struct(">4sHHHHHHIddd")
+HEADER_SIZE = 64  # Place libre après HEADER pour de futurs champs
+TIME_LSB = 1e-8  # s par unité du timestamp
+VOLTAGE_LSB = 0.0001  # V par code du LTC6811 (cellules et GPIO des capteurs)
+
+INDEX_MAGIC = b"AMSI"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct(">4sHHIIQ")
+INDEX_SUFFIX = ".idx"
+INDEX_STRIDE = 4096  # Enregistrements entre deux entrées de l'index (environ 7 minutes à 10 Hz)
+
+
+class LogFormat:
+    """
+    Disposition d'un fichier de log.
+
+    Attributs :
+    -----------
+    total_ic, nb_cells, nb_sensors : int
+        Nombre de BMS, de cellules et de capteurs de température par BMS.
+
+    no_problem_bytes : int
+        Taille de NO_PROBLEM en fin d'enregistrement.
+
+    header_size : int
+        Taille de l'en-tête (0 pour un fichier sans en-tête).
+
+    record : struct.Struct
+        Structure d'un enregistrement (record_size octets). pack écrit les mêmes champs directement
+        dans buffer : struct pour le timestamp et l'ADC, vue numpy big-endian pour les codes
+        (un pack_into de tous les codes coûte une liste Python de total_ic x ic_values entiers).
+
+    dtype : np.dtype
+        Même disposition pour numpy (tableau structuré d'enregistrements, voir read_log).
+        Les conversions (times, currents, cell_voltages, temp_codes) se font sur n'importe
+        quelle tranche de ce tableau, seulement quand elles sont demandées.
+    """
+
+    def __init__(self, total_ic: int, nb_cells: int, nb_sensors: int, current_lsb: float, no_problem_bytes: int = None,
+                 time_lsb: float = TIME_LSB, voltage_lsb: float = VOLTAGE_LSB, header_size: int = HEADER_SIZE):
+        """
+        :param current_lsb: A par unité de la valeur brute de l'ADC du courant (ADC.convert_current(1))
+        """
+        self.total_ic = total_ic
+        self.nb_cells = nb_cells
+        self.nb_sensors = nb_sensors
+        self.no_problem_bytes = 4 * total_ic + 1 if no_problem_bytes is None else no_problem_bytes
+        self.time_lsb = time_lsb
+        self.time_scale = 1 / time_lsb  # Unités du timestamp par seconde (même arrondi que time * 1e8)
+        self.voltage_lsb = voltage_lsb
+        self.current_lsb = current_lsb
+        self.header_size = header_size
+        self.ic_values = nb_cells + nb_sensors
+        nb_values = total_ic * self.ic_values
+        self.record = struct.Struct(f">Qh{nb_values}H{self.no_problem_bytes}s")
+        self.record_size = self.record.size
+        self.dtype = np.dtype([
+            ("time", ">u8"),
+            ("adc", ">i2"),
+            ("codes", ">u2", (total_ic, self.ic_values)),
+            ("no_problem", f"V{self.no_problem_bytes}"),
+        ])
+        self.fields = struct.Struct(">Qh")  # Début de record : timestamp et valeur de l'ADC
+        self.no_problem_offset = self.record_size - self.no_problem_bytes
+        self.buffer = bytearray(self.record_size)  # Enregistrement réutilisé par pack
+        # Codes de buffer vus comme un tableau big-endian (BMS x valeurs) : pack y écrit sans conversion intermédiaire
+        self.values = np.frombuffer(self.buffer, dtype=">u2", count=nb_values, offset=self.fields.size).reshape(
+            total_ic, self.ic_values
+        )
+
+    def header(self) -> bytes:
+        """En-tête du fichier (header_size octets)."""
+        header = HEADER.pack(
+            MAGIC, VERSION, self.header_size, self.total_ic, self.nb_cells, self.nb_sensors,
+            self.no_problem_bytes, self.record_size, self.time_lsb, self.voltage_lsb, self.current_lsb,
+        )
+        return header.ljust(self.header_size, b"\0")
+
+    @classmethod
+    def from_header(cls, data: bytes) -> Optional["LogFormat"]:
+        """
+        Disposition décrite par l'en-tête data (début du fichier), None si data ne commence pas par MAGIC
+        (fichier sans en-tête). Lève ValueError pour un en-tête tronqué (écriture interrompue),
+        une version inconnue ou un en-tête incohérent.
+        """
+        if data[:4] != MAGIC:
+            return None
+        if len(data) < HEADER.size:
+            raise ValueError(f"En-tête tronqué : {len(data)} octets sur {HEADER.size}")
+        magic, version, header_size, total_ic, nb_cells, nb_sensors, no_problem_bytes, record_size, \
+            time_lsb, voltage_lsb, current_lsb = HEADER.unpack_from(data)
+        if version != VERSION:
+            raise ValueError(f"Version de log {version} inconnue (version {VERSION} attendue)")
+        log_format = cls(total_ic, nb_cells, nb_sensors, current_lsb, no_problem_bytes, time_lsb, voltage_lsb, header_size)
+        if log_format.record_size != record_size:
+            raise ValueError(f"En-tête incohérent : enregistrement de {record_size} octets, {log_format.record_size} calculés")
+        return log_format
+
+    @classmethod
+    def from_file(cls, file: BinaryIO) -> Optional["LogFormat"]:
+        """Lit l'en-tête au début de file (None pour un fichier sans en-tête) ; file reste positionné après."""
+        data = file.read(HEADER_SIZE)
+        log_format = cls.from_header(data)
+        file.seek(0 if log_format is None else log_format.header_size)
+        return log_format
+
+    def pack(self, time: float, adc_value: int, cell_codes, temp_codes, no_problem: int) -> bytearray:
+        """
+        Ecrit un enregistrement dans buffer et le renvoie (réutilisé à l'appel suivant : à copier avant).
+        :param time: Timestamp (s)
+        :param adc_value: Valeur brute de l'ADC du courant
+        :param cell_codes: Codes des cellules (BMS x nb_cells)
+        :param temp_codes: Codes des capteurs de température (BMS x nb_sensors)
+        :param no_problem: Code d'erreur NO_PROBLEM
+        """
+        buffer = self.buffer
+        self.fields.pack_into(buffer, 0, int(time * self.time_scale), adc_value)
+        self.values[:, : self.nb_cells] = cell_codes
+        self.values[:, self.nb_cells :] = temp_codes
+        buffer[self.no_problem_offset :] = no_problem.to_bytes(self.no_problem_bytes)
+        return buffer
+
+    def unpack(self, data) -> Tuple[float, int, np.ndarray, int]:
+        """Enregistrement data décodé : (timestamp (s), valeur de l'ADC, codes (BMS x valeurs), NO_PROBLEM)."""
+        fields = self.record.unpack(data)
+        codes = np.array(fields[2:-1], dtype=np.uint16).reshape(self.total_ic, self.ic_values)
+        return fields[0] * self.time_lsb, fields[1], codes, int.from_bytes(fields[-1])
+
+    def records(self, data) -> np.ndarray:
+        """Enregistrements complets de data (enregistrements à la suite, sans en-tête), sans copie."""
+        count = len(data) // self.record_size
+        return np.frombuffer(data, dtype=self.dtype, count=count)
+
+    def times(self, records: np.ndarray) -> np.ndarray:
+        """Timestamps (s) des enregistrements."""
+        return records["time"] * self.time_lsb
+
+    def currents(self, records: np.ndarray) -> np.ndarray:
+        """Courants (A) des enregistrements."""
+        return records["adc"] * self.current_lsb
+
+    def cell_voltages(self, records: np.ndarray) -> np.ndarray:
+        """Tensions des cellules (V), enregistrement x BMS x cellule."""
+        return records["codes"][:, :, : self.nb_cells] * self.voltage_lsb
+
+    def temp_codes(self, records: np.ndarray) -> np.ndarray:
+        """Codes bruts des capteurs de température, enregistrement x BMS x capteur (voir read_temp.temp_of_codes)."""
+        return records["codes"][:, :, self.nb_cells :].astype(np.uint16)
+
+    def no_problems(self, records: np.ndarray):
+        """Codes NO_PROBLEM des enregistrements (entiers Python)."""
+        return [int.from_bytes(bytes(value)) for value in records["no_problem"]]
+
+
+def read_log(path: str, legacy: LogFormat = None) -> Tuple[LogFormat, np.ndarray]:
+    """
+    Ouvre le fichier de log path, projeté en mémoire (mmap) : les enregistrements sont une vue
+    sur le fichier, sans copie ni lecture préalable ; seules les pages utilisées sont lues.
+    Un enregistrement incomplet en fin de fichier (écriture interrompue) est ignoré.
+    :param legacy: Disposition d'un fichier sans en-tête ; sans elle, un tel fichier lève ValueError
+    :return: (disposition, enregistrements en lecture seule)
+    """
+    with open(path, "rb") as f:
+        log_format = LogFormat.from_file(f) or legacy
+        if log_format is None:
+            raise ValueError(f"{path} n'a pas d'en-tête : donner sa disposition (legacy)")
+        offset = f.tell()   # Début des enregistrements (0 sans en-tête)
+        count = (os.fstat(f.fileno()).st_size - offset) // log_format.record_size
+    if not count:
+        return log_format, np.empty(0, dtype=log_format.dtype)     # mmap refuse une projection vide
+    return log_format, np.memmap(path, dtype=log_format.dtype, mode="r", offset=offset, shape=(count,))
+
+
+def bisect_time(records: np.ndarray, time_raw: int, lo: int = 0, hi: int = None) -> int:
+    """
+    Premier indice de records[lo:hi] dont le timestamp brut est >= time_raw (hi s'il n'y en a pas).
+    Ne lit que log2(hi - lo) timestamps : np.searchsorted convertirait toute la colonne (big-endian).
+    """
+    times = records["time"]
+    hi = len(records) if hi is None else hi
+    while lo < hi:
+        middle = (lo + hi) // 2
+        if times[middle] < time_raw:
+            lo = middle + 1
+        else:
+            hi = middle
+    return lo
+
+
+def build_index(path: str, stride: int = INDEX_STRIDE, legacy: LogFormat = None) -> str:
+    """
+    Ecrit l'index creux du log path (path + INDEX_SUFFIX) et renvoie son chemin.
+    :param stride: Enregistrements entre deux entrées
+    """
+    log_format, records = read_log(path, legacy)
+    entries = np.ascontiguousarray(records["time"][::stride])
+    index_path = path + INDEX_SUFFIX
+    with open(index_path, "wb") as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, stride, log_format.record_size, len(records)))
+        f.write(entries.astype(">u8").tobytes())
+    return index_path
+
+
+def load_index(path: str, log_format: LogFormat, nb_records: int) -> Optional[Tuple[int, int, np.ndarray]]:
+    """
+    Index creux du log path : (pas, nombre d'enregistrements indexés, timestamps bruts),
+    None s'il n'existe pas, ne correspond pas à la disposition du log ou indexe plus que ses
+    nb_records enregistrements (index d'un fichier remplacé depuis, par rotation par exemple).
+    """
+    try:
+        with open(path + INDEX_SUFFIX, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < INDEX_HEADER.size:
+        return None
+    magic, version, _, stride, record_size, count = INDEX_HEADER.unpack_from(data)
+    if magic != INDEX_MAGIC or version != INDEX_VERSION or record_size != log_format.record_size or not stride:
+        return None
+    if count > nb_records:
+        return None
+    entries = np.frombuffer(data, dtype=">u8", offset=INDEX_HEADER.size).astype(np.uint64)
+    if len(entries) != -(-count // stride):     # Index tronqué
+        return None
+    return stride, count, entries
+
+
+def read_range(path: str, t0: float = None, t1: float = None, legacy: LogFormat = None) -> Tuple[LogFormat, np.ndarray]:
+    """
+    Enregistrements du log path de timestamp dans [t0, t1[ (s, None : pas de limite), vue sur le fichier projeté en mémoire.
+    Les timestamps doivent être croissants (un recul de l'horloge système fausserait la recherche).
+    L'index creux est utilisé s'il existe ; les enregistrements écrits après lui sont cherchés par dichotomie.
+    :param legacy: Disposition d'un fichier sans en-tête (voir read_log)
+    :return: (disposition, enregistrements de l'intervalle)
+    """
+    log_format, records = read_log(path, legacy)
+    raw0 = 0 if t0 is None else max(int(t0 * log_format.time_scale), 0)
+    raw1 = 2**64 if t1 is None else max(int(t1 * log_format.time_scale), 0)
+    index = load_index(path, log_format, len(records))
+    if index is None:
+        bounds = [(0, len(records))] * 2
+    else:
+        stride, count, entries = index
+        bounds = []
+        for raw in (raw0, raw1):
+            block = int(np.searchsorted(entries, raw))  # entries[block - 1] < raw <= entries[block]
+            lo = max(block - 1, 0) * stride
+            hi = min(block * stride, count) if block < len(entries) else len(records)
+            bounds.append((lo, hi))
+    start = bisect_time(records, raw0, *bounds[0])
+    end = bisect_time(records, raw1, max(start, bounds[1][0]), bounds[1][1])
+    return log_format, records[start:end]
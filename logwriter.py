@@ -0,0 +1,177 @@
+"""
+Ecriture du log binaire (data.bin) sans ouvrir ni fermer de fichier à chaque enregistrement.
+
+Les fichiers restent ouverts ; les enregistrements sont accumulés en mémoire et écrits en un
+seul appel système quand batch_records enregistrements sont en attente ou que le plus ancien
+attend depuis batch_time secondes. Avec durable, chaque écriture est suivie d'un fdatasync :
+les données sont sur la carte SD, pas seulement dans le cache du noyau.
+Une écriture immédiate (et synchronisée) peut être forcée, par exemple quand NO_PROBLEM change.
+Un fichier vide commence par l'en-tête header (voir logformat).
+
+Rotation : après max_bytes octets ou max_age secondes, le fichier est fermé et devient un
+segment (segment_path), confié à on_rotate (ex : archiver.SegmentCompressor.submit) ; un
+nouveau fichier path, avec son en-tête, le remplace. Le nouveau fichier est préparé sous un
+nom temporaire puis mis en place par os.replace : path existe toujours, ancien ou nouveau.
+Les écritures ne portent donc jamais sur un très gros fichier.
+"""
+
+import os
+import time
+from typing import Callable
+
+fdatasync = getattr(os, "fdatasync", os.fsync)  # fdatasync n'existe pas sur toutes les plateformes
+
+
+class LogWriter:
+    """
+    Log binaire bufferisé.
+
+    Attributs :
+    -----------
+    batch_records : int
+        Nombre d'enregistrements en attente déclenchant une écriture.
+
+    batch_time : float
+        Attente maximale (s) d'un enregistrement avant écriture.
+
+    durable : bool
+        fdatasync après chaque écriture.
+
+    max_bytes, max_age : int, float
+        Taille (octets) et âge (s) d'un fichier déclenchant la rotation (None : pas de limite).
+
+    records, flushes, syncs, rotations : int
+        Nombre d'enregistrements reçus, d'écritures, de synchronisations et de rotations depuis l'ouverture.
+    """
+
+    def __init__(self, path: str, batch_records: int = 64, batch_time: float = 1.0, durable: bool = True, header: bytes = b"",
+                 max_bytes: int = None, max_age: float = None,
+                 segment_path: Callable[[float], str] = None, on_rotate: Callable[[str], None] = None):
+        """
+        :param segment_path: Chemin du segment d'un fichier commencé à l'instant donné (time.time()) ; None : pas de rotation
+        :param on_rotate: Appelé avec le chemin de chaque segment fermé
+        """
+        self.path = path
+        self.batch_records = batch_records
+        self.batch_time = batch_time
+        self.durable = durable
+        self.header = header
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.segment_path = segment_path
+        self.on_rotate = on_rotate
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.size = os.fstat(self.fd).st_size
+        if header and self.size == 0:
+            self.size += os.write(self.fd, header)
+        self.started = time.time()  # Début du fichier courant (nom du segment)
+        self.opened = time.monotonic()  # Même instant, pour max_age
+        self.rotations = 0
+        self.buffer = bytearray()
+        self.pending = 0  # Enregistrements en attente dans buffer
+        self.oldest = 0.0  # Instant (time.monotonic()) de réception du plus ancien enregistrement en attente
+        self.records = 0
+        self.flushes = 0
+        self.syncs = 0
+
+    def append(self, data: bytes, force: bool = False):
+        """
+        Ajoute un enregistrement ; écrit le lot si l'un des seuils est atteint ou si force.
+        :param force: Ecrire et synchroniser immédiatement (transition de défaut)
+        """
+        if not self.pending:
+            self.oldest = time.monotonic()
+        self.buffer += data
+        self.pending += 1
+        self.records += 1
+        if force:
+            self.flush(sync=True)
+        elif self.pending >= self.batch_records or time.monotonic() - self.oldest >= self.batch_time:
+            self.flush()
+
+    def flush_if_due(self):
+        """
+        Ecrit le lot si le plus ancien enregistrement attend depuis batch_time, et fait la rotation
+        si elle est due (à appeler périodiquement).
+        """
+        if self.pending and time.monotonic() - self.oldest >= self.batch_time:
+            self.flush()
+        elif self.rotation_due():
+            self.rotate()
+
+    def flush(self, sync: bool = None):
+        """
+        Ecrit les enregistrements en attente.
+        :param sync: Synchroniser sur la carte SD (durable par défaut)
+        """
+        if not self.pending:
+            return
+        try:
+            with memoryview(self.buffer) as data:
+                written = 0
+                try:
+                    while written < len(data):
+                        with data[written:] as chunk:   # Libérée même si os.write échoue (buffer redimensionné ensuite)
+                            written += os.write(self.fd, chunk)  # Une écriture partielle est possible
+                except OSError:
+                    if written:     # Un enregistrement à moitié écrit décalerait tous les suivants
+                        os.ftruncate(self.fd, self.size)
+                    raise
+                self.size += written
+            if self.durable if sync is None else sync:
+                fdatasync(self.fd)
+                self.syncs += 1
+        finally:
+            del self.buffer[:]  # En cas d'erreur (carte SD pleine), le lot est perdu comme un enregistrement l'était avant
+            self.pending = 0
+            self.flushes += 1
+        if self.rotation_due():
+            self.rotate()
+
+    def rotation_due(self) -> bool:
+        """Vrai si le fichier courant contient des enregistrements et a atteint max_bytes ou max_age."""
+        if self.segment_path is None or self.size <= len(self.header):
+            return False
+        return (self.max_bytes is not None and self.size >= self.max_bytes) or (
+            self.max_age is not None and time.monotonic() - self.opened >= self.max_age
+        )
+
+    def rotate(self):
+        """
+        Ferme le fichier courant en segment et ouvre un nouveau fichier path (enregistrements en attente non compris).
+        """
+        segment = self.segment_path(self.started)
+        temporary = self.path + ".new"
+        fd = os.open(temporary, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            size = os.write(fd, self.header) if self.header else 0
+            try:
+                os.link(self.path, segment)     # Le segment et path désignent le même fichier...
+            except OSError:     # Système de fichiers sans liens physiques : path manque un instant
+                os.rename(self.path, segment)
+            os.replace(temporary, self.path)    # ... jusqu'à ce que path désigne le nouveau fichier
+        except OSError:
+            os.close(fd)
+            raise
+        if self.durable:
+            fdatasync(self.fd)
+            directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+            try:
+                os.fsync(directory)     # Les nouveaux noms sont sur la carte SD
+            finally:
+                os.close(directory)
+        os.close(self.fd)
+        self.fd = fd
+        self.size = size
+        self.started = time.time()
+        self.opened = time.monotonic()
+        self.rotations += 1
+        if self.on_rotate is not None:
+            self.on_rotate(segment)
+
+    def close(self):
+        """Ecrit les enregistrements en attente et ferme les fichiers."""
+        try:
+            self.flush()
+        finally:
+            os.close(self.fd)
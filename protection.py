@@ -0,0 +1,230 @@
+"""
+Moteur de protection : vérifie en une seule comparaison vectorisée toutes les cellules et
+tous les capteurs de tous les BMS de la chaîne, contre des tableaux de limites par MODE.
+
+Les limites de tension sont converties une fois en codes bruts du LTC6811 (seuil exact
+de la comparaison code * 0.0001 >= limite), les températures passent par la table de
+read_temp : la vérification ne fait ni multiplication ni conversion par canal.
+
+Position des défauts dans NO_PROBLEM (bit 0 = bit de poids fort, 32 bits par BMS) :
+    1                      : surintensité
+    32 * ic + 2 + cell     : sur/sous-tension de la cellule cell du BMS ic
+    32 * ic + 18 + capteur : surchauffe du capteur du BMS ic
+
+Micro-benchmark (durée d'une vérification selon le nombre de BMS) :
+    python protection.py [-n 2000] [--ic 1 2 4 8 16]
+"""
+
+import argparse
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from read_temp import TEMP_TABLE_ARRAY, NB_CODES, CODE_LSB
+
+BITS_PER_IC = 32
+CURRENT_BIT = 1
+CELL_BIT = 2  # Premier bit des cellules d'un BMS
+TEMP_BIT = 18  # Premier bit des capteurs d'un BMS
+
+CODES = np.arange(NB_CODES) * CODE_LSB  # Tension (V) de chaque code brut
+# Les températures de la table sont toutes dans la plage retenue pour le maximum de config.PackStats,
+# son temp_max est donc bien le maximum de tous les capteurs (voir check)
+STATS_TEMP_MAX_EXACT = bool(TEMP_TABLE_ARRAY.min() >= -100 and TEMP_TABLE_ARRAY.max() <= 500)
+
+
+class Limits:
+    """
+    Limites de protection d'un MODE. Chaque limite est un scalaire ou un tableau
+    (BMS x canal) pour des limites par cellule ou par capteur ; None désactive la vérification.
+
+    Attributs :
+    -----------
+    overvoltage, undervoltage : float
+        Tensions de cellule maximale et minimale (V), défaut si tension >= overvoltage ou <= undervoltage.
+
+    max_temp : float
+        Température maximale (°C), défaut si température >= max_temp.
+
+    max_current : float
+        Courant maximal (A), défaut si courant >= max_current.
+    """
+
+    def __init__(self, overvoltage=None, undervoltage=None, max_temp=None, max_current=None):
+        self.overvoltage = overvoltage
+        self.undervoltage = undervoltage
+        self.max_temp = max_temp
+        self.max_current = max_current
+
+
+class ProtectionEngine:
+    """
+    Vérification vectorisée des limites pour une chaîne de total_ic BMS.
+
+    Attributs :
+    -----------
+    ov_codes, uv_codes : Dict[str, np.ndarray]
+        Par MODE, codes bruts (BMS x cellule) à partir desquels (>=) ou jusqu'auxquels (<=)
+        la cellule est en défaut.
+
+    max_temps : Dict[str, np.ndarray]
+        Par MODE, températures maximales (BMS x capteur).
+
+    bits : np.ndarray (total_ic x 32, bool)
+        Défauts de la dernière vérification, bit par bit.
+    """
+
+    def __init__(self, total_ic: int, nb_cells: int, nb_sensors: int, limits: Dict[str, Limits]):
+        if CELL_BIT + nb_cells > TEMP_BIT or TEMP_BIT + nb_sensors > BITS_PER_IC:
+            raise ValueError(f"{nb_cells} cellules et {nb_sensors} capteurs ne tiennent pas dans {BITS_PER_IC} bits par BMS")
+        self.total_ic = total_ic
+        self.nb_cells = nb_cells
+        self.nb_sensors = nb_sensors
+        self.limits = limits
+        cells, sensors = (total_ic, nb_cells), (total_ic, nb_sensors)
+        self.ov_codes: Dict[str, np.ndarray] = {}
+        self.uv_codes: Dict[str, np.ndarray] = {}
+        self.max_temps: Dict[str, np.ndarray] = {}
+        self.bounds: Dict[str, Tuple[int, int, float]] = {}  # Limites les plus strictes de chaque MODE (ov, uv, température)
+        for mode, limit in limits.items():
+            self.ov_codes[mode] = np.broadcast_to(code_threshold(limit.overvoltage, above=True), cells)
+            self.uv_codes[mode] = np.broadcast_to(code_threshold(limit.undervoltage, above=False), cells)
+            max_temp = np.inf if limit.max_temp is None else np.asarray(limit.max_temp, dtype=float)
+            self.max_temps[mode] = np.broadcast_to(max_temp, sensors)
+            self.bounds[mode] = (
+                int(self.ov_codes[mode].min()),
+                int(self.uv_codes[mode].max()),
+                float(self.max_temps[mode].min()) if STATS_TEMP_MAX_EXACT else -np.inf,
+            )
+        self.bits = np.zeros((total_ic, BITS_PER_IC), dtype=bool)
+
+    def check(self, mode: str, no_problem: int, current: float, cell_codes, temp_codes, stats=None) -> Tuple[int, Optional[Tuple[str, int, int]]]:
+        """
+        Vérifie les limites du MODE mode (aucune vérification pour un MODE sans limites, ex : STANDBY).
+        Avec stats (config.PackStats à jour), les extrêmes du pack sont d'abord comparés aux limites
+        les plus strictes : s'ils sont dans les limites, aucun canal n'est parcouru.
+        :param no_problem: Code d'erreur NO_PROBLEM courant (les défauts sont ajoutés, jamais effacés)
+        :param current: Courant de la batterie (A)
+        :param cell_codes: Codes bruts des cellules (BMS x cellule, au moins nb_cells colonnes)
+        :param temp_codes: Codes bruts des capteurs de température (BMS x capteur, au moins nb_sensors colonnes)
+        :param stats: Statistiques des mêmes mesures (facultatif)
+        :return: (NO_PROBLEM mis à jour, premier défaut de cette vérification ou None)
+                 Le premier défaut est (type, BMS, canal), type parmi "current", "cell" et "temp".
+        """
+        limit = self.limits.get(mode)
+        if limit is None:
+            return no_problem, None
+        overcurrent = limit.max_current is not None and current >= limit.max_current
+        if stats is not None and not overcurrent:
+            ov, uv, max_temp = self.bounds[mode]
+            if stats.cell_max < ov and stats.cell_min > uv and stats.temp_max < max_temp:
+                return no_problem, None
+        cells = cell_codes[:, : self.nb_cells]
+        cell_fault = (cells >= self.ov_codes[mode]) | (cells <= self.uv_codes[mode])
+        temp_fault = TEMP_TABLE_ARRAY[temp_codes[:, : self.nb_sensors]] >= self.max_temps[mode]
+        if not (overcurrent or cell_fault.any() or temp_fault.any()):
+            return no_problem, None
+
+        bits = self.bits
+        bits[:] = False
+        bits[0, CURRENT_BIT] = overcurrent
+        bits[:, CELL_BIT : CELL_BIT + self.nb_cells] = cell_fault
+        bits[:, TEMP_BIT : TEMP_BIT + self.nb_sensors] = temp_fault
+        no_problem |= int.from_bytes(np.packbits(bits).tobytes())
+        return no_problem, self.channel(int(np.flatnonzero(bits)[0]))
+
+    @staticmethod
+    def channel(bit: int) -> Tuple[str, int, int]:
+        """(type, BMS, canal) du défaut au bit bit de NO_PROBLEM."""
+        ic, offset = divmod(bit, BITS_PER_IC)
+        if offset >= TEMP_BIT:
+            return "temp", ic, offset - TEMP_BIT
+        if offset >= CELL_BIT:
+            return "cell", ic, offset - CELL_BIT
+        return "current", ic, 0
+
+
+def code_threshold(volts, above: bool):
+    """
+    Limite de tension (V, scalaire ou tableau) convertie en code brut :
+    above : plus petit code c tel que c * CODE_LSB >= volts (NB_CODES si aucun) ;
+    sinon : plus grand code c tel que c * CODE_LSB <= volts (-1 si aucun).
+    None désactive la limite.
+    """
+    if volts is None:
+        return np.int32(NB_CODES if above else -1)
+    volts = np.asarray(volts, dtype=float)
+    if above:
+        return np.searchsorted(CODES, volts, side="left").astype(np.int32)
+    return (np.searchsorted(CODES, volts, side="right") - 1).astype(np.int32)
+
+
+### Micro-benchmark
+
+
+def reference_check(engine: ProtectionEngine, mode: str, no_problem: int, current: float, cell_codes, temp_codes) -> int:
+    """Vérification canal par canal (boucles Python), pour contrôler le résultat du moteur."""
+    limit = engine.limits.get(mode)
+    if limit is None:
+        return no_problem
+    width = BITS_PER_IC * engine.total_ic
+    if limit.max_current is not None and current >= limit.max_current:
+        no_problem |= 1 << (width - 1 - CURRENT_BIT)
+    shape = (engine.total_ic, engine.nb_cells)
+    ov = np.broadcast_to(np.inf if limit.overvoltage is None else limit.overvoltage, shape)
+    uv = np.broadcast_to(-np.inf if limit.undervoltage is None else limit.undervoltage, shape)
+    for ic in range(engine.total_ic):
+        for cell in range(engine.nb_cells):
+            volts = cell_codes[ic, cell] * CODE_LSB
+            if volts >= ov[ic, cell] or volts <= uv[ic, cell]:
+                no_problem |= 1 << (width - 1 - (ic * BITS_PER_IC + CELL_BIT + cell))
+        for sensor in range(engine.nb_sensors):
+            if TEMP_TABLE_ARRAY[temp_codes[ic, sensor]] >= engine.max_temps[mode][ic, sensor]:
+                no_problem |= 1 << (width - 1 - (ic * BITS_PER_IC + TEMP_BIT + sensor))
+    return no_problem
+
+
+def micro_benchmark(iterations: int, ics, nb_cells: int = 12, nb_sensors: int = 13):
+    """
+    Durée (µs) d'une vérification en DISCHARGE selon le nombre de BMS, sans défaut
+    (cas courant) et avec défauts, après contrôle du résultat contre reference_check,
+    et durée de reference_check pour comparaison.
+    """
+    rng = np.random.default_rng(0)
+    limits = {"DISCHARGE": Limits(overvoltage=4.2, undervoltage=2.55, max_temp=57.5, max_current=95)}
+    ok_temp = int(np.argmin(np.abs(TEMP_TABLE_ARRAY - 25)))  # Code d'un capteur à 25 °C
+    print(f"{'IC':>3} {'sans défaut (µs)':>18} {'avec défauts (µs)':>18} {'boucles (µs)':>14}")
+    for total_ic in ics:
+        engine = ProtectionEngine(total_ic, nb_cells, nb_sensors, limits)
+        cells = rng.integers(30000, 40000, (total_ic, 18)).astype(np.uint16)
+        temps = np.full((total_ic, 18), ok_temp, dtype=np.uint16)
+        faulty_cells = cells.copy()
+        faulty_cells[rng.integers(total_ic), rng.integers(nb_cells)] = 43000
+        faulty_temps = rng.integers(0, 30000, (total_ic, 18)).astype(np.uint16)
+        cases = ((cells, temps, 10.0), (faulty_cells, faulty_temps, 120.0))
+        durations = []
+        for cell_codes, temp_codes, current in cases:
+            result = engine.check("DISCHARGE", 0, current, cell_codes, temp_codes)[0]
+            assert result == reference_check(engine, "DISCHARGE", 0, current, cell_codes, temp_codes)
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter_ns()
+                engine.check("DISCHARGE", 0, current, cell_codes, temp_codes)
+                samples.append(time.perf_counter_ns() - start)
+            durations.append(np.median(samples) / 1e3)
+        samples = []
+        for _ in range(max(iterations // 20, 1)):   # Vérification canal par canal, pour comparaison
+            start = time.perf_counter_ns()
+            reference_check(engine, "DISCHARGE", 0, 10.0, cells, temps)
+            samples.append(time.perf_counter_ns() - start)
+        durations.append(np.median(samples) / 1e3)
+        print(f"{total_ic:>3} {durations[0]:>18.1f} {durations[1]:>18.1f} {durations[2]:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark du moteur de protection")
+    parser.add_argument("-n", "--iterations", type=int, default=2000)
+    parser.add_argument("--ic", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+    micro_benchmark(args.iterations, args.ic)
@@ -1,4 +1,5 @@
 import csv
+import numpy as np
 from scipy.interpolate import CubicSpline
 
 """
@@ -44,3 +45,59 @@ temp = CubicSpline(voltage_sorted, temperature_sorted)
 # convertir une température en tension équivalente 
 # (moins utilisée, utile pour tests, calibrations ou visualisations)
 volt = CubicSpline(temperature, voltage_read)
+
+
+# Table de conversion indexée directement par le code brut 16 bits du GPIO (LSB = 100 µV) :
+# TEMP_TABLE[code] = temp(code * CODE_LSB), calculée une seule fois à l'import.
+# La conversion d'un capteur coûte un accès à une liste au lieu d'une évaluation de spline.
+# Hors de la plage de la table RT, l'extrapolation de la spline n'a pas de sens physique
+# (-800 000 °C à 6.5 V) : on garde la température de l'extrémité la plus proche.
+CODE_LSB = 0.0001  # V par code du LTC6811
+NB_CODES = 1 << 16
+V_MIN = voltage_sorted[0]
+V_MAX = voltage_sorted[-1]
+
+TEMP_TABLE_ARRAY = temp(np.clip(np.arange(NB_CODES) * CODE_LSB, V_MIN, V_MAX))  # version numpy, pour les tableaux de codes
+TEMP_TABLE = TEMP_TABLE_ARRAY.tolist()  # version liste, pour un code seul (float Python)
+
+
+def temp_of_code(code: int) -> float:
+    """
+    Température (°C) d'un capteur à partir du code brut lu sur le GPIO.
+    """
+    return TEMP_TABLE[code]
+
+
+def temp_of_codes(codes: np.ndarray) -> np.ndarray:
+    """
+    Températures (°C) d'un tableau de codes bruts (n'importe quelle forme, entiers non signés 16 bits).
+    """
+    return TEMP_TABLE_ARRAY[codes]
+
+
+def table_error(oversampling: int = 10) -> dict:
+    """
+    Erreur (°C) de la table par rapport à la spline, dans la plage de la table RT :
+    - quantization : tension quelconque arrondie au code le plus proche, évaluée sur une grille
+      de oversampling points par code (erreur due au pas de 100 µV du LTC6811) ;
+    - rt_points : points de la table RT (température du fichier vs table au code le plus proche).
+    """
+    volts = np.arange(int(V_MIN / CODE_LSB) * oversampling, int(V_MAX / CODE_LSB) * oversampling + 1) * (CODE_LSB / oversampling)
+    volts = volts[(volts >= V_MIN) & (volts <= V_MAX)]
+    quantization = np.abs(TEMP_TABLE_ARRAY[np.rint(volts / CODE_LSB).astype(np.int64)] - temp(volts))
+    points = np.abs(
+        TEMP_TABLE_ARRAY[np.rint(np.array(voltage_sorted) / CODE_LSB).astype(np.int64)] - np.array(temperature_sorted)
+    )
+    return {
+        "quantization_max": float(quantization.max()),
+        "quantization_mean": float(quantization.mean()),
+        "rt_points_max": float(points.max()),
+        "range_codes": (int(np.ceil(V_MIN / CODE_LSB)), int(V_MAX / CODE_LSB)),
+    }
+
+
+if __name__ == "__main__":
+    error = table_error()
+    print(f"Plage de la table RT : codes {error['range_codes'][0]} à {error['range_codes'][1]}")
+    print(f"Erreur de la table vs spline (pas de {CODE_LSB * 1e6:.0f} µV) : max {error['quantization_max']:.4f} °C, moyenne {error['quantization_mean']:.4f} °C")
+    print(f"Erreur aux points de la table RT : max {error['rt_points_max']:.4f} °C")
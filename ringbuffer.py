@@ -0,0 +1,169 @@
+"""
+Buffer circulaire préalloué de photographies de la batterie, entre le thread d'acquisition
+(un seul producteur) et les consommateurs (envoi CAN, écriture du log).
+
+Le producteur n'attend jamais : il écrit dans la case suivante puis publie son numéro de
+séquence. Chaque consommateur a son propre curseur ; s'il prend trop de retard, les
+photographies écrasées sont comptées dans dropped et il reprend à la plus ancienne restante
+(un consommateur qui ne lit que la plus récente compte de même celles qu'il saute).
+Une case est marquée en cours d'écriture (seq = -1) pendant sa mise à jour, le consommateur
+vérifie après copie qu'elle n'a pas été réécrite entre-temps.
+"""
+
+import threading
+from typing import List
+
+import numpy as np
+
+
+class Record:
+    """
+    Copie d'une photographie, côté consommateur.
+
+    Attributs :
+    -----------
+    seq : int
+        Numéro de séquence de la photographie (0 pour la première publiée).
+
+    time : float
+        Timestamp de l'itération d'acquisition (time.time()).
+
+    adc_value : int
+        Valeur brute de l'ADC (courant batterie).
+
+    no_problem : int
+        Code d'erreur NO_PROBLEM après les vérifications de protection.
+
+    cell_codes, temp : np.ndarray
+        Codes bruts des cellules et des capteurs de température (BMS x voie).
+
+    temps : np.ndarray
+        Températures des capteurs en °C (BMS x capteur).
+
+    volt, tempe : tuple
+        Statistiques du pack au moment de la photographie (config.PackStats.voltage() et temperature()).
+    """
+
+    def __init__(self, total_ic: int, nb_cells: int, nb_sensors: int):
+        self.seq: int = -1
+        self.time: float = 0.0
+        self.adc_value: int = 0
+        self.no_problem: int = 0
+        self.cell_codes: np.ndarray = np.zeros((total_ic, nb_cells), dtype=np.uint16)
+        self.temp: np.ndarray = np.zeros((total_ic, nb_sensors), dtype=np.uint16)
+        self.temps: np.ndarray = np.zeros((total_ic, nb_sensors))
+        self.volt: tuple = ()
+        self.tempe: tuple = ()
+
+
+class SnapshotRing:
+    """
+    Buffer circulaire de capacity photographies.
+    """
+
+    def __init__(self, capacity: int, total_ic: int, nb_cells: int, nb_sensors: int):
+        self.capacity = capacity
+        self.shape = (total_ic, nb_cells, nb_sensors)
+        self.seq: List[int] = [-1] * capacity  # Numéro de la photographie de chaque case
+        self.time = np.zeros(capacity)
+        self.adc_value = np.zeros(capacity, dtype=np.int16)
+        self.no_problem: List[int] = [0] * capacity
+        self.cell_codes = np.zeros((capacity, total_ic, nb_cells), dtype=np.uint16)
+        self.temp = np.zeros((capacity, total_ic, nb_sensors), dtype=np.uint16)
+        self.temps = np.zeros((capacity, total_ic, nb_sensors))
+        self.stats: List[tuple] = [((), ())] * capacity  # (volt, tempe) de chaque case, tuples non modifiés après publication
+        self.head = 0  # Nombre de photographies publiées
+        self.readers: List["RingReader"] = []
+
+    def publish(self, time: float, adc_value: int, no_problem: int, cell_codes, temp, temps, volt: tuple, tempe: tuple):
+        """
+        Publie une photographie (appelé par le seul thread d'acquisition).
+        """
+        seq = self.head
+        slot = seq % self.capacity
+        self.seq[slot] = -1  # Case en cours d'écriture
+        self.time[slot] = time
+        self.adc_value[slot] = adc_value
+        self.no_problem[slot] = no_problem
+        self.cell_codes[slot] = cell_codes
+        self.temp[slot] = temp
+        self.temps[slot] = temps
+        self.stats[slot] = (volt, tempe)
+        self.seq[slot] = seq
+        self.head = seq + 1
+        for reader in self.readers:
+            reader.ready.set()
+
+    def reader(self) -> "RingReader":
+        """Crée un curseur de lecture, positionné après la dernière photographie publiée."""
+        reader = RingReader(self)
+        self.readers.append(reader)
+        return reader
+
+
+class RingReader:
+    """
+    Curseur de lecture d'un consommateur.
+
+    Attributs :
+    -----------
+    record : Record
+        Dernière photographie lue (réutilisée à chaque lecture).
+
+    dropped : int
+        Nombre de photographies jamais remises au consommateur : écrasées parce qu'il était trop
+        en retard, ou sautées par une lecture latest. Chaque photographie publiée après la création
+        du curseur est soit lue, soit comptée une fois, soit encore en attente (pending).
+    """
+
+    def __init__(self, ring: SnapshotRing):
+        self.ring = ring
+        self.next = ring.head  # Prochaine photographie à lire
+        self.record = Record(*ring.shape)
+        self.dropped = 0
+        self.ready = threading.Event()
+
+    def pending(self) -> int:
+        """Nombre de photographies publiées non lues."""
+        return self.ring.head - self.next
+
+    def read(self, latest=False) -> bool:
+        """
+        Copie dans record la photographie suivante (la plus récente si latest, les précédentes
+        non lues étant comptées dans dropped).
+
+        Returns:
+            bool: Faux s'il n'y a pas de nouvelle photographie.
+        """
+        ring = self.ring
+        while True:
+            head = ring.head
+            if self.next >= head:
+                self.ready.clear()
+                if ring.head == head:
+                    return False
+                continue  # Publication pendant le clear
+            oldest = max(head - ring.capacity + 1, 0)  # La case de head - capacity peut être en cours d'écriture
+            seq = head - 1 if latest else max(self.next, oldest)
+            self.dropped += seq - self.next     # Photographies sautées (écrasées, ou plus anciennes que la dernière si latest)
+            slot = seq % ring.capacity
+            record = self.record
+            record.time = float(ring.time[slot])
+            record.adc_value = int(ring.adc_value[slot])
+            record.no_problem = ring.no_problem[slot]
+            record.cell_codes[:] = ring.cell_codes[slot]
+            record.temp[:] = ring.temp[slot]
+            record.temps[:] = ring.temps[slot]
+            record.volt, record.tempe = ring.stats[slot]
+            if ring.seq[slot] != seq:
+                # Case réécrite pendant la copie : le consommateur est trop en retard
+                self.dropped += 1
+                self.next = seq + 1
+                continue
+            record.seq = seq
+            self.next = seq + 1
+            return True
+
+    def wait(self, timeout: float = None) -> bool:
+        """Attend une nouvelle photographie (au plus timeout secondes)."""
+        return self.ready.wait(timeout)
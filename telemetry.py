@@ -0,0 +1,315 @@
+"""
+Télémétrie CAN complète : tension de chaque cellule, température de chaque capteur,
+courant, extrêmes et leurs indices, et code d'erreur NO_PROBLEM.
+
+Toutes les trames ont le même ID (TELEMETRY_ID dans Monitoring) et 8 octets ; l'octet 0
+est le multiplexeur (numéro de la trame dans la salve), les 7 suivants les signaux de
+cette trame, en little-endian. La salve complète est envoyée à chaque cycle.
+
+Les formats struct de chaque trame sont calculés une seule fois, à partir de la même
+liste de signaux que le schéma exporté (DBC et JSON) pour les outils des stands :
+    python telemetry.py --ic 2 --current-lsb 0.00399 -o telemetry   # écrit telemetry.dbc et telemetry.json (LSB : ADC.convert_current(1))
+"""
+
+import argparse
+import json
+import math
+import struct
+from typing import List, Tuple
+
+import numpy as np
+
+FRAME_SIZE = 8  # octets par trame CAN
+PAYLOAD_SIZE = FRAME_SIZE - 1  # l'octet 0 est le multiplexeur
+VALUES_PER_FRAME = 3  # valeurs 16 bits par trame de cellules ou de capteurs
+
+CELL_FACTOR = 0.0001  # V par unité (code brut du LTC6811)
+TEMP_FACTOR = 0.1  # °C par unité
+PACK_VOLTAGE_FACTOR = 0.01  # V par unité
+
+SIGNED = {"B": False, "H": False, "b": True, "h": True}
+
+
+class Signal:
+    """
+    Signal d'une trame.
+
+    Attributs :
+    -----------
+    name : str
+        Nom du signal.
+
+    fmt : str
+        Format struct ("B", "H", "b" ou "h").
+
+    factor : float
+        Valeur physique = valeur brute x factor.
+
+    unit : str
+        Unité de la valeur physique.
+
+    start : int
+        Premier bit du signal dans la trame (calculé par Frame).
+    """
+
+    def __init__(self, name: str, fmt: str, factor: float = 1, unit: str = ""):
+        self.name = name
+        self.fmt = fmt
+        self.factor = factor
+        self.unit = unit
+        self.start = 0
+
+    @property
+    def length(self) -> int:
+        return 8 * struct.calcsize(self.fmt)
+
+    def raw_range(self) -> Tuple[int, int]:
+        if SIGNED[self.fmt]:
+            return -(1 << (self.length - 1)), (1 << (self.length - 1)) - 1
+        return 0, (1 << self.length) - 1
+
+
+class Frame:
+    """
+    Trame multiplexée : le numéro mux puis les signaux, complétés à FRAME_SIZE octets.
+    """
+
+    def __init__(self, mux: int, name: str, signals: List[Signal]):
+        self.mux = mux
+        self.name = name
+        self.signals = signals
+        fmt = "<B" + "".join(signal.fmt for signal in signals)
+        start = 8
+        for signal in signals:
+            signal.start = start
+            start += signal.length
+        if start > 8 * FRAME_SIZE:
+            raise ValueError(f"Trame {name} trop longue ({start} bits)")
+        self.struct = struct.Struct(fmt + "x" * (FRAME_SIZE - struct.calcsize(fmt)))
+
+
+class TelemetrySchema:
+    """
+    Liste des trames de la salve pour une chaîne de total_ic BMS, et leur mise en forme.
+
+    Ordre des trames (mux) : état du pack, extrêmes, NO_PROBLEM, cellules, capteurs.
+    Les cellules et les capteurs sont numérotés BMS par BMS (BMS 0 cellule 0, BMS 0 cellule 1, ...).
+    Les indices des extrêmes (CellMaxIC, CellMaxIndex, ...) commencent à 1, comme dans Monitoring.
+
+    Attributs :
+    -----------
+    frames : List[Frame]
+        Trames de la salve, la trame i ayant le mux i.
+
+    buffer : bytearray
+        Salve mise en forme par pack() (FRAME_SIZE octets par trame).
+    """
+
+    def __init__(self, total_ic: int, nb_cells: int, nb_sensors: int, fault_bytes: int, current_lsb: float):
+        """
+        :param current_lsb: A par unité de la valeur brute de l'ADC du courant (ADC.convert_current(1))
+        """
+        self.total_ic = total_ic
+        self.nb_cells = nb_cells
+        self.nb_sensors = nb_sensors
+        self.fault_bytes = fault_bytes
+        frames = [
+            ("PackStatus", [
+                Signal("PackVoltage", "H", PACK_VOLTAGE_FACTOR, "V"),
+                Signal("Current", "h", current_lsb, "A"),
+                Signal("Counter", "B"),
+                Signal("TotalIC", "B"),
+            ]),
+            ("CellMax", [
+                Signal("CellMax", "H", CELL_FACTOR, "V"),
+                Signal("CellMaxIC", "B"),
+                Signal("CellMaxIndex", "B"),
+                Signal("CellAverage", "H", CELL_FACTOR, "V"),
+            ]),
+            ("CellMin", [
+                Signal("CellMin", "H", CELL_FACTOR, "V"),
+                Signal("CellMinIC", "B"),
+                Signal("CellMinIndex", "B"),
+            ]),
+            ("TempMax", [
+                Signal("TempMax", "h", TEMP_FACTOR, "degC"),
+                Signal("TempMaxIC", "B"),
+                Signal("TempMaxIndex", "B"),
+                Signal("TempAverage", "h", TEMP_FACTOR, "degC"),
+            ]),
+            ("TempMin", [
+                Signal("TempMin", "h", TEMP_FACTOR, "degC"),
+                Signal("TempMinIC", "B"),
+                Signal("TempMinIndex", "B"),
+            ]),
+        ]
+        self.first_fault = len(frames)
+        for k in range(math.ceil(fault_bytes / PAYLOAD_SIZE)):
+            size = min(PAYLOAD_SIZE, fault_bytes - k * PAYLOAD_SIZE)
+            frames.append((f"Faults_{k}", [Signal(f"Fault_{k * PAYLOAD_SIZE + i}", "B") for i in range(size)]))
+        self.first_cell = len(frames)
+        frames += self._values("Cell", "H", CELL_FACTOR, "V", total_ic * nb_cells, nb_cells)
+        self.first_temp = len(frames)
+        frames += self._values("Temp", "h", TEMP_FACTOR, "degC", total_ic * nb_sensors, nb_sensors)
+        if len(frames) > 256:
+            raise ValueError(f"{len(frames)} trames : le multiplexeur est sur un octet")
+        self.frames = [Frame(mux, name, signals) for mux, (name, signals) in enumerate(frames)]
+        self.buffer = bytearray(FRAME_SIZE * len(self.frames))
+        # Valeurs des trames de cellules et de capteurs, complétées à un multiple de VALUES_PER_FRAME
+        self._cells = np.zeros(self._padded(total_ic * nb_cells), dtype=np.int64)
+        self._temps = np.zeros(self._padded(total_ic * nb_sensors), dtype=np.int64)
+
+    @staticmethod
+    def _padded(count: int) -> int:
+        return math.ceil(count / VALUES_PER_FRAME) * VALUES_PER_FRAME
+
+    @staticmethod
+    def _values(prefix: str, fmt: str, factor: float, unit: str, count: int, per_ic: int):
+        frames = []
+        for k in range(math.ceil(count / VALUES_PER_FRAME)):
+            signals = []
+            for i in range(k * VALUES_PER_FRAME, min(count, (k + 1) * VALUES_PER_FRAME)):
+                ic, channel = divmod(i, per_ic)
+                signals.append(Signal(f"{prefix}_{ic}_{channel}", fmt, factor, unit))
+            frames.append((f"{prefix}s_{k}", signals))
+        return frames
+
+    @property
+    def nb_frames(self) -> int:
+        return len(self.frames)
+
+    def pack(self, counter: int, adc_value: int, volt, tempe, cell_codes, temps, no_problem: int) -> bytearray:
+        """
+        Met en forme la salve d'un cycle dans buffer.
+        :param volt: Résultat de config.PackStats.voltage() (Vtot, Vmoy, Vmax, i_max, Vmin, i_min)
+        :param tempe: Résultat de config.PackStats.temperature() (Tmoy, Tmax, i_max, Tmin, i_min)
+        :param cell_codes: Codes des cellules mesurées (BMS x cellule)
+        :param temps: Températures des capteurs en °C (BMS x capteur)
+        :param no_problem: Code d'erreur NO_PROBLEM
+        """
+        frames, buffer = self.frames, self.buffer
+        frames[0].struct.pack_into(buffer, 0, 0, clip_u16(volt[0] / PACK_VOLTAGE_FACTOR), adc_value, counter & 0xFF, self.total_ic)
+        frames[1].struct.pack_into(buffer, 8, 1, clip_u16(volt[2] / CELL_FACTOR), *volt[3], clip_u16(volt[1] / CELL_FACTOR))
+        frames[2].struct.pack_into(buffer, 16, 2, clip_u16(volt[4] / CELL_FACTOR), *volt[5])
+        frames[3].struct.pack_into(buffer, 24, 3, clip_s16(tempe[1] / TEMP_FACTOR), *tempe[2], clip_s16(tempe[0] / TEMP_FACTOR))
+        frames[4].struct.pack_into(buffer, 32, 4, clip_s16(tempe[3] / TEMP_FACTOR), *tempe[4])
+
+        faults = no_problem.to_bytes(self.fault_bytes)  # Octet de poids fort en premier, comme dans le log
+        for k in range(self.first_fault, self.first_cell):
+            start = (k - self.first_fault) * PAYLOAD_SIZE
+            frames[k].struct.pack_into(buffer, FRAME_SIZE * k, k, *faults[start : start + PAYLOAD_SIZE])
+
+        self._cells[: cell_codes.size] = cell_codes.ravel()
+        self._pack_values(self.first_cell, self._cells, cell_codes.size)
+        np.clip(np.rint(temps.ravel() / TEMP_FACTOR), -0x8000, 0x7FFF, out=self._temps[: temps.size], casting="unsafe")
+        self._pack_values(self.first_temp, self._temps, temps.size)
+        return buffer
+
+    def _pack_values(self, first: int, values: np.ndarray, count: int):
+        frames, buffer = self.frames, self.buffer
+        values = values.tolist()
+        for k in range(math.ceil(count / VALUES_PER_FRAME)):
+            frame = frames[first + k]
+            n = len(frame.signals)
+            frame.struct.pack_into(buffer, FRAME_SIZE * (first + k), first + k, *values[k * VALUES_PER_FRAME : k * VALUES_PER_FRAME + n])
+
+    ### Export du schéma
+
+    def to_dict(self, arbitration_id: int, is_extended_id: bool = True) -> dict:
+        """Schéma en JSON : trames, signaux (bit de départ, longueur, signe, facteur, unité)."""
+        return {
+            "arbitration_id": arbitration_id,
+            "is_extended_id": is_extended_id,
+            "frame_size": FRAME_SIZE,
+            "byte_order": "little_endian",
+            "multiplexer": {"start": 0, "length": 8},
+            "total_ic": self.total_ic,
+            "nb_cells": self.nb_cells,
+            "nb_sensors": self.nb_sensors,
+            "frames": [
+                {
+                    "mux": frame.mux,
+                    "name": frame.name,
+                    "signals": [
+                        {
+                            "name": signal.name,
+                            "start": signal.start,
+                            "length": signal.length,
+                            "signed": SIGNED[signal.fmt],
+                            "factor": signal.factor,
+                            "unit": signal.unit,
+                        }
+                        for signal in frame.signals
+                    ],
+                }
+                for frame in self.frames
+            ],
+        }
+
+    def to_dbc(self, arbitration_id: int, is_extended_id: bool = True, node: str = "AMS") -> str:
+        """Schéma au format DBC (un message multiplexé, octet 0 multiplexeur)."""
+        dbc_id = arbitration_id | (0x80000000 if is_extended_id else 0)
+        lines = [
+            'VERSION ""',
+            "",
+            "NS_ :",
+            "",
+            "BS_:",
+            "",
+            f"BU_: {node}",
+            "",
+            f"BO_ {dbc_id} {node}_Telemetry: {FRAME_SIZE} {node}",
+            ' SG_ Mux M : 0|8@1+ (1,0) [0|255] "" Vector__XXX',
+        ]
+        for frame in self.frames:
+            for signal in frame.signals:
+                low, high = signal.raw_range()
+                sign = "-" if SIGNED[signal.fmt] else "+"
+                lines.append(
+                    f" SG_ {signal.name} m{frame.mux} : {signal.start}|{signal.length}@1{sign}"
+                    f" ({signal.factor:.10g},0) [{low * signal.factor:.10g}|{high * signal.factor:.10g}]"
+                    f' "{signal.unit}" Vector__XXX'
+                )
+        lines += ["", f'CM_ BO_ {dbc_id} "AMS telemetry: {self.total_ic} BMS, burst of {self.nb_frames} frames per cycle";', ""]
+        return "\n".join(lines)
+
+    def export(self, path: str, arbitration_id: int, is_extended_id: bool = True):
+        """Ecrit le schéma dans path.dbc et path.json."""
+        with open(path + ".dbc", "w") as f:
+            f.write(self.to_dbc(arbitration_id, is_extended_id))
+        with open(path + ".json", "w") as f:
+            json.dump(self.to_dict(arbitration_id, is_extended_id), f, indent=1)
+
+
+def clip_u16(value: float) -> int:
+    return min(max(int(round(value)), 0), 0xFFFF)
+
+
+def clip_s16(value: float) -> int:
+    return min(max(int(round(value)), -0x8000), 0x7FFF)
+
+
+def decode(schema: TelemetrySchema, payloads) -> dict:
+    """
+    Décode des trames reçues (8 octets chacune) en valeurs physiques, par nom de signal.
+    Utile côté stands et pour vérifier une salve.
+    """
+    values = {}
+    for payload in payloads:
+        frame = schema.frames[payload[0]]
+        raw = frame.struct.unpack_from(payload)[1:]
+        for signal, value in zip(frame.signals, raw):
+            values[signal.name] = value * signal.factor
+    return values
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export du schéma de télémétrie CAN (DBC et JSON)")
+    parser.add_argument("--ic", type=int, default=1, help="nombre de BMS en chaîne")
+    parser.add_argument("--cells", type=int, default=12, help="cellules mesurées par BMS")
+    parser.add_argument("--sensors", type=int, default=13, help="capteurs de température par BMS")
+    parser.add_argument("--id", type=lambda x: int(x, 0), default=0x18, help="ID des trames")
+    parser.add_argument("--current-lsb", type=float, required=True, help="A par unité de l'ADC du courant (ADC.convert_current(1))")
+    parser.add_argument("-o", "--output", default="telemetry", help="préfixe des fichiers écrits")
+    args = parser.parse_args()
+    TelemetrySchema(args.ic, args.cells, args.sensors, 4 * args.ic + 1, args.current_lsb).export(args.output, args.id)
@@ -0,0 +1,157 @@
+"""
+Tests du pilote LTC681x contre l'émulateur de la chaîne (emulator.DaisyChainEmulator), sans matériel :
+    python -m unittest test_LTC681x
+"""
+
+import contextlib
+import io
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import LTC681x
+import LTC6811
+import config
+import emulator
+
+TOTAL_IC = 3
+
+
+def reference_pec15(data) -> int:
+    """PEC15 bit par bit, comme l'algorithme de la datasheet (registre de 15 bits, polynôme 0x4599, graine 16)."""
+    remainder = 16
+    for byte in data:
+        for bit in range(7, -1, -1):
+            top = (remainder >> 14 & 1) ^ (byte >> bit & 1)
+            remainder = (remainder << 1) & 0x7FFF
+            if top:
+                remainder ^= 0x4599
+    return remainder << 1
+
+
+class FaultyChain(emulator.DaisyChainEmulator):
+    """
+    Chaîne dont la réponse à la commande corrupt_code est altérée (un bit du bloc de la puce corrupt_ic),
+    et dont les conversions ne se terminent jamais si stuck (SDO reste bas pendant PLADC).
+    """
+
+    corrupt_code = None
+    corrupt_ic = 0
+    stuck = False
+
+    def transfer(self, tx, start):
+        rx = super().transfer(tx, start)
+        code = (tx[0] << 8 | tx[1]) & 0x7FF if len(tx) >= 4 else None
+        if code == self.corrupt_code:
+            rx[4 + 8 * self.corrupt_ic + 1] ^= 0x01
+        if code == emulator.PLADC and self.stuck:
+            rx[4:] = bytes(len(rx) - 4)
+        return rx
+
+
+class ChainTest(unittest.TestCase):
+    def setUp(self):
+        # Ces tests ne portent pas sur le réveil : un thread retardé par l'ordonnanceur entre deux
+        # transferts ne doit pas laisser l'isoSPI passer en IDLE (transfert perdu)
+        idle = mock.patch.object(emulator, "T_IDLE", 1.0)
+        idle.start()
+        self.addCleanup(idle.stop)
+        self.chain = FaultyChain(TOTAL_IC)
+        LTC681x.set_transport(self.chain)
+        with contextlib.redirect_stdout(io.StringIO()):
+            LTC6811.init(TOTAL_IC)
+            LTC6811.write_read_cfg(False)
+
+    def scan(self) -> config.Snapshot:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return LTC6811.scan(enable_read=False)
+
+
+class PecTest(ChainTest):
+    def test_pec15_matches_reference(self):
+        rng = np.random.default_rng(6811)
+        for size in (0, 1, 2, 6, 7, 64):
+            for _ in range(50):
+                data = rng.bytes(size)
+                self.assertEqual(LTC681x.pec15(data), reference_pec15(data))
+
+    def test_datasheet_examples(self):
+        self.assertEqual(LTC681x.pec15(b"\x00\x01"), 0x3D6E)    # WRCFGA
+        self.assertEqual(LTC681x.pec15(b"\x00\x04"), 0x07C2)    # RDCVA
+
+    def test_command_frames(self):
+        frames = list(LTC681x.CMD_FRAME.values())
+        for table in (LTC681x.ADCV_FRAME, LTC681x.ADAX_FRAME, LTC681x.ADSTAT_FRAME, LTC681x.ADCVSC_FRAME, LTC681x.ADCVAX_FRAME):
+            frames += table.values()
+        for frame in frames:
+            self.assertEqual((frame[2] << 8) | frame[3], reference_pec15(frame[:2]), frame)
+
+    def test_commands_accepted(self):
+        snapshot = self.scan()
+        self.assertEqual(self.chain.cmd_pec_errors, 0)
+        self.assertEqual(snapshot.pec_error, 0)
+        LTC681x.cmd_68([0x07, 0x11, 0x00, 0x00])    # CLRCELL avec un PEC faux : ignorée par la chaîne
+        self.assertEqual(self.chain.cmd_pec_errors, 1)
+
+    def test_configuration_written(self):
+        for ic, chip in enumerate(self.chain.chips):    # Le PEC de chaque bloc écrit a été accepté par sa puce
+            self.assertEqual(bytes(chip.cfgr), bytes(config.BMS_IC[ic].config.tx_data[:6]))
+        self.assertTrue(all(bms.config.rx_pec_match == 0 for bms in config.BMS_IC))
+
+    def test_cell_codes(self):
+        for ic, chip in enumerate(self.chain.chips):
+            chip.cell_voltages = 3.0 + 0.1 * ic + 0.001 * np.arange(emulator.NUM_CELLS)
+        snapshot = self.scan()
+        expected = [np.rint(chip.cell_voltages / emulator.LSB) for chip in self.chain.chips]
+        np.testing.assert_array_equal(snapshot.c_codes, expected)
+
+    def test_read_pec_error(self):
+        self.chain.corrupt_code, self.chain.corrupt_ic = 0x004, 1   # RDCVA, réponse de la 2e puce
+        before = config.PACK.pec_count.copy()
+        snapshot = self.scan()
+        self.assertEqual(snapshot.pec_error, 1)
+        self.assertEqual(config.PACK.cell_pec[:, 0].tolist(), [0, 1, 0])
+        np.testing.assert_array_equal(config.PACK.pec_count - before, [0, 1, 0])
+        self.assertEqual(config.PACK.cell_pec_count[1, 0], 1)
+
+
+class PollAdcTest(ChainTest):
+    def conversion_us(self) -> float:
+        """Durée de la conversion ADCV en cours selon l'émulateur (µs)."""
+        chip = self.chain.chips[0]
+        return emulator.CONV_TIME_US["ADCV"][LTC6811.ADC_CONVERSION_MODE][chip.cfgr[0] & 0x01]
+
+    def start_adcv(self):
+        LTC681x.wakeup_sleep(TOTAL_IC)
+        LTC681x.LTC681x_adcv(LTC6811.ADC_CONVERSION_MODE, LTC6811.ADC_DCP, LTC6811.CELL_CH_TO_CONVERT)
+
+    def test_conversion_time(self):
+        for _ in range(5):
+            self.start_adcv()
+            conv_time = LTC681x.LTC681x_pollAdc()
+            self.assertGreaterEqual(conv_time, self.conversion_us() - 50)  # Pas avant la fin de la conversion
+            self.assertLess(conv_time, self.conversion_us() + 5000)  # Ni bien après (un burst PLADC, l'ordonnanceur)
+
+    def test_timeout(self):
+        self.chain.stuck = True
+        timeouts = LTC681x.poll_timeouts
+        self.start_adcv()
+        start = time.perf_counter()
+        self.assertEqual(LTC681x.LTC681x_pollAdc(), LTC681x.POLL_TIMEOUT)
+        self.assertLess(time.perf_counter() - start, 0.5)   # Abandonne à l'échéance
+        self.assertEqual(LTC681x.poll_timeouts, timeouts + 1)
+
+    def test_scan_counts_timeouts(self):
+        snapshot = self.scan()
+        self.assertEqual(snapshot.poll_timeout, 0)
+        self.assertGreater(snapshot.conv_time, 0)
+        self.chain.stuck = True
+        snapshot = self.scan()  # Cellules puis GPIO : deux conversions non terminées
+        self.assertEqual(snapshot.poll_timeout, 2)
+        self.assertEqual(snapshot.conv_time, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+"""
+Tests de la compression des segments du log (archiver), dans un dossier temporaire :
+    python -m unittest test_archiver
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+import py7zr
+
+import archiver
+import logformat
+from archiver import SegmentCompressor, compress, segment_path
+
+LOG_FORMAT = logformat.LogFormat(1, 13, 8, 0.0125)
+T0 = 1.7e9
+
+
+def segment_content(count: int, header: bool = True) -> bytes:
+    """Contenu d'un segment de count enregistrements, à 10 Hz à partir de T0."""
+    cells = np.arange(13, dtype=np.uint16).reshape(1, 13)
+    temps = np.arange(8, dtype=np.uint16).reshape(1, 8)
+    records = (bytes(LOG_FORMAT.pack(T0 + k * 0.1, k, cells, temps, k)) for k in range(count))
+    return (LOG_FORMAT.header() if header else b"") + b"".join(records)
+
+
+class ArchiverTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_segment(self, content: bytes, timestamp: float = T0) -> str:
+        segment = segment_path(self.directory, timestamp)
+        with open(segment, "wb") as f:
+            f.write(content)
+        return segment
+
+    def extract(self, archive: str) -> dict:
+        """Fichiers de l'archive : {nom: contenu}."""
+        target = tempfile.mkdtemp(dir=self.directory)
+        with py7zr.SevenZipFile(archive, "r") as f:
+            f.extractall(target)
+        result = {}
+        for name in os.listdir(target):
+            with open(os.path.join(target, name), "rb") as f:
+                result[name] = f.read()
+        return result
+
+    def wait_compressed(self, compressor: SegmentCompressor, count: int):
+        deadline = time.monotonic() + 10
+        while compressor.compressed < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(compressor.compressed, count)
+
+    def test_segment_path(self):
+        first = segment_path(self.directory, T0)
+        self.assertTrue(os.path.basename(first).startswith(archiver.SEGMENT_PREFIX))
+        self.assertTrue(first.endswith(archiver.SEGMENT_SUFFIX))
+        open(first, "wb").close()
+        second = segment_path(self.directory, T0)   # Même seconde : nom suivant
+        self.assertEqual(second, first[: -len(archiver.SEGMENT_SUFFIX)] + "-2" + archiver.SEGMENT_SUFFIX)
+        os.rename(first, first[: -len(archiver.SEGMENT_SUFFIX)] + archiver.ARCHIVE_SUFFIX)    # Déjà comprimé
+        self.assertEqual(segment_path(self.directory, T0), second)
+
+    def test_compress(self):
+        content = segment_content(50)
+        segment = self.write_segment(content)
+        archive = compress(segment)
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(archive)])   # Segment, index et .tmp supprimés
+        files = self.extract(archive)
+        self.assertEqual(files["data.bin"], content)
+        index = files["data.bin" + logformat.INDEX_SUFFIX]
+        magic, _, _, stride, record_size, count = logformat.INDEX_HEADER.unpack_from(index)
+        self.assertEqual((magic, record_size, count), (logformat.INDEX_MAGIC, LOG_FORMAT.record_size, 50))
+
+    def test_compress_header_less(self):
+        content = segment_content(5, header=False)
+        archive = compress(self.write_segment(content))
+        self.assertEqual(self.extract(archive), {"data.bin": content})     # Pas d'index
+
+    def test_compressor(self):
+        compressor = SegmentCompressor()
+        compressor.start(self.directory)
+        segments = [self.write_segment(segment_content(10), T0 + k) for k in range(3)]
+        for segment in segments:
+            compressor.submit(segment)
+        self.wait_compressed(compressor, 3)
+        compressor.stop(5.0)
+        self.assertIsNone(compressor.thread)
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            sorted(os.path.basename(s)[: -len(archiver.SEGMENT_SUFFIX)] + archiver.ARCHIVE_SUFFIX for s in segments),
+        )
+
+    def test_resume_leftovers(self):
+        content = segment_content(20)
+        segment = self.write_segment(content)
+        archive = segment[: -len(archiver.SEGMENT_SUFFIX)] + archiver.ARCHIVE_SUFFIX
+        with open(archive + archiver.TEMPORARY_SUFFIX, "wb") as f:
+            f.write(b"7z\xbc\xaf")   # Archive interrompue par un arrêt pendant la compression
+        compressor = SegmentCompressor()
+        compressor.start(self.directory)
+        self.wait_compressed(compressor, 1)
+        compressor.stop(5.0)
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(archive)])
+        self.assertEqual(self.extract(archive)["data.bin"], content)
+
+    def test_stop_keeps_pending(self):
+        SegmentCompressor().stop()  # Jamais démarré : rien à faire
+        started, release = threading.Event(), threading.Event()
+        compressed = []
+
+        def slow_compress(segment):
+            started.set()
+            release.wait(5.0)
+            compressed.append(segment)
+
+        compressor = SegmentCompressor()
+        with mock.patch("archiver.compress", slow_compress):
+            compressor.start(self.directory)
+            thread = compressor.thread
+            first, second = (self.write_segment(segment_content(5), T0 + k) for k in range(2))
+            compressor.submit(first)
+            compressor.submit(second)
+            self.assertTrue(started.wait(5.0))
+            compressor.stop(0.01)   # Segment en cours terminé, segments en attente laissés
+            release.set()
+            thread.join(5.0)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(compressed, [first])
+        self.assertTrue(os.path.exists(second))     # Repris au démarrage suivant
+
+    def test_error_keeps_running(self):
+        compressor = SegmentCompressor()
+        compressor.start(self.directory)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            compressor.submit(os.path.join(self.directory, "data-missing.bin"))
+            segment = self.write_segment(segment_content(5))
+            compressor.submit(segment)
+            self.wait_compressed(compressor, 1)
+        compressor.stop(5.0)
+        self.assertIn("data-missing.bin", output.getvalue())
+        self.assertFalse(os.path.exists(segment))
+
+
+if __name__ == "__main__":
+    unittest.main()
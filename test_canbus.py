@@ -0,0 +1,93 @@
+"""
+Tests de canbus sur l'interface virtual de python-can (sans matériel) :
+    python -m unittest test_canbus
+"""
+
+import itertools
+import time
+import unittest
+
+import can
+
+from canbus import CanTransport
+
+CHANNELS = itertools.count()    # Un canal virtuel par test : les tests ne se voient pas
+
+
+class CanTransportTest(unittest.TestCase):
+    def setUp(self):
+        channel = f"test_canbus_{next(CHANNELS)}"
+        self.transport = CanTransport(channel=channel, interface="virtual")
+        self.listener = can.Bus(channel=channel, interface="virtual")  # Autre noeud du même bus
+
+    def tearDown(self):
+        self.transport.close()
+        self.listener.shutdown()
+
+    def receive(self, timeout: float = 1.0) -> can.Message:
+        message = self.listener.recv(timeout)
+        self.assertIsNotNone(message, "aucune trame reçue")
+        return message
+
+    def drain(self):
+        while self.listener.recv(0) is not None:
+            pass
+
+    def test_send(self):
+        self.assertTrue(self.transport.send(0x17, b"\x01\x02"))
+        message = self.receive()
+        self.assertEqual(message.arbitration_id, 0x17)
+        self.assertEqual(bytes(message.data), b"\x01\x02")
+
+    def test_periodic_update(self):
+        frame = self.transport.periodic(0x17, 5, 0.01)
+        self.assertTrue(frame.update(b"\x01\x01\x01\x01\x01"))
+        self.assertEqual(bytes(self.receive().data), b"\x01\x01\x01\x01\x01")
+        self.assertTrue(frame.update(b"\x02\x02"))  # Seuls les premiers octets changent
+        time.sleep(0.05)
+        self.drain()
+        self.assertEqual(bytes(self.receive().data), b"\x02\x02\x01\x01\x01")
+
+    def test_burst(self):
+        burst = self.transport.burst(0x18, 3)
+        self.assertEqual(burst.send(bytes(range(24))), 3)
+        for k in range(3):
+            self.assertEqual(bytes(self.receive().data), bytes(range(8 * k, 8 * k + 8)))
+
+    def test_reopen_after_send_error(self):
+        self.assertTrue(self.transport.send(0x17, b"\x01"))
+        self.receive()
+        self.transport.bus.shutdown()   # Bus tombé : le handle ne sert plus
+        self.assertFalse(self.transport.send(0x17, b"\x02"))
+        self.assertIsNone(self.transport.bus)
+        self.assertTrue(self.transport.send(0x17, b"\x03"))     # Rouvert
+        self.assertEqual(bytes(self.receive().data), b"\x03")
+
+    def test_burst_reopen_after_error(self):
+        burst = self.transport.burst(0x18, 2)
+        self.assertEqual(burst.send(bytes(16)), 2)
+        self.transport.bus.shutdown()
+        self.assertEqual(burst.send(bytes(16)), 0)
+        self.assertIsNone(self.transport.bus)
+        self.drain()
+        self.assertEqual(burst.send(bytes(range(16))), 2)
+        self.assertEqual(bytes(self.receive().data), bytes(range(8)))
+
+    def test_periodic_restart_after_bus_error(self):
+        frame = self.transport.periodic(0x17, 1, 0.01)
+        self.assertTrue(frame.update(b"\x01"))
+        self.receive()
+        dead = self.transport.bus
+        dead.shutdown()     # La tâche d'envoi s'arrête sur l'erreur suivante
+        deadline = time.monotonic() + 1.0
+        while not frame.task.stopped and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(frame.update(b"\x02"))
+        self.assertIsNot(self.transport.bus, dead)  # Nouveau handle
+        time.sleep(0.05)
+        self.drain()
+        self.assertEqual(bytes(self.receive().data), b"\x02")
+
+
+if __name__ == "__main__":
+    unittest.main()
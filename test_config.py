@@ -0,0 +1,98 @@
+"""
+Tests des statistiques incrémentales du pack (config.PackStats), comparées à un recalcul complet :
+    python -m unittest test_config
+"""
+
+import unittest
+
+import numpy as np
+
+from config import PackStats
+
+TOTAL_IC = 4
+NB_CELLS = 12
+NB_SENSORS = 8
+
+
+def reference_voltage(cell_codes):
+    """Recalcul sur tout le pack, boucle par boucle : (Vtot, Vmoy, Vmax, i_max, Vmin, i_min) en V."""
+    total, high, low = 0.0, -100, 100
+    high_at, low_at = [1, 1], [1, 1]
+    for ic in range(cell_codes.shape[0]):
+        for cell in range(NB_CELLS):
+            v = int(cell_codes[ic, cell]) * 0.0001
+            total += v
+            if v >= high:   # Dernière occurrence en cas d'égalité
+                high, high_at = v, [ic + 1, cell + 1]
+            if v <= low:
+                low, low_at = v, [ic + 1, cell + 1]
+    return (total, total / (cell_codes.shape[0] * NB_CELLS), high, high_at, low, low_at)
+
+
+def reference_temperature(temps):
+    """Recalcul sur tout le pack, boucle par boucle : (Tmoy, Tmax, i_max, Tmin, i_min) en °C."""
+    total, high, low = 0.0, -100, 100
+    high_at, low_at = [1, 1], [1, 1]
+    found_high = found_low = False
+    for ic in range(temps.shape[0]):
+        for sensor in range(temps.shape[1]):
+            t = float(temps[ic, sensor])
+            total += t
+            if -100 <= t <= PackStats.TEMP_MAX_VALID and (not found_high or t >= high):
+                high, high_at, found_high = t, [ic + 1, sensor + 1], True
+            if PackStats.TEMP_MIN_VALID < t <= 100 and (not found_low or t <= low):
+                low, low_at, found_low = t, [ic + 1, sensor + 1], True
+    return (total / temps.size, high, high_at, low, low_at)
+
+
+def random_temps(rng, shape):
+    """Températures entières (égalités fréquentes), dont quelques valeurs hors des plages retenues."""
+    temps = rng.integers(15, 40, size=shape).astype(float)
+    outliers = rng.random(shape) < 0.1
+    temps[outliers] = rng.choice([-200.0, -60.0, -50.0, 100.0, 125.0, 600.0], size=int(outliers.sum()))
+    return temps
+
+
+class PackStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(6811)
+        self.stats = PackStats(TOTAL_IC, NB_CELLS, NB_SENSORS)
+
+    def assertStatsEqual(self, got, expected):
+        self.assertEqual(len(got), len(expected))
+        for g, e in zip(got, expected):
+            if isinstance(e, list):
+                self.assertEqual(g, e)
+            else:
+                self.assertAlmostEqual(g, e, places=6)
+
+    def test_voltage(self):
+        for _ in range(200):
+            codes = self.rng.integers(30000, 30010, size=(TOTAL_IC, NB_CELLS + 1), dtype=np.uint16)
+            self.stats.update_cells(codes)  # Colonnes au-delà de nb_cells ignorées
+            self.assertStatsEqual(self.stats.voltage(), reference_voltage(codes))
+
+    def test_set_temps(self):
+        for _ in range(200):
+            temps = random_temps(self.rng, (TOTAL_IC, NB_SENSORS))
+            self.stats.set_temps(temps)
+            self.assertStatsEqual(self.stats.temperature(), reference_temperature(temps))
+
+    def test_update_sensor(self):
+        temps = random_temps(self.rng, (TOTAL_IC, NB_SENSORS))
+        self.stats.set_temps(temps)
+        for _ in range(2000):
+            sensor = int(self.rng.integers(NB_SENSORS))
+            temps[:, sensor] = random_temps(self.rng, (TOTAL_IC,))
+            self.stats.update_sensor(sensor, temps[:, sensor].copy())
+            self.assertStatsEqual(self.stats.temperature(), reference_temperature(temps))
+        np.testing.assert_array_equal(self.stats.temps, temps)
+
+    def test_no_valid_temperature(self):
+        temps = np.full((TOTAL_IC, NB_SENSORS), 1000.0)   # Aucune valeur retenue : valeurs par défaut
+        self.stats.set_temps(temps)
+        self.assertStatsEqual(self.stats.temperature(), (1000.0, -100, [1, 1], 100, [1, 1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Tests de l'instantané partagé (livesnapshot), dans un dossier temporaire :
+    python -m unittest test_livesnapshot
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import livesnapshot
+from livesnapshot import LiveReader, LiveWriter, SEQ, SEQ_OFFSET
+
+CAPACITY = 123
+
+
+def payload(k: int, size: int = CAPACITY) -> bytes:
+    """Contenu k : tous les octets dérivent de k (une lecture mélangée se voit)."""
+    return k.to_bytes(8) + bytes([k % 251]) * (size - 8)
+
+
+class LiveSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "ams_live")
+        self.writer = LiveWriter(CAPACITY, self.path)
+        self.reader = LiveReader(self.path)
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close()
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        self.assertIsNone(self.reader.read())   # Rien d'écrit
+        self.writer.write(payload(1))
+        self.assertEqual(self.reader.read(), payload(1))
+        self.writer.write(payload(2, 20))   # Contenu plus court
+        self.assertEqual(self.reader.read(), payload(2, 20))
+        self.assertEqual(self.reader.seq, 4)
+
+    def test_read_if_new(self):
+        self.writer.write(payload(1))
+        self.assertEqual(self.reader.read_if_new(), payload(1))
+        self.assertIsNone(self.reader.read_if_new())
+        self.writer.write(payload(2))
+        self.assertEqual(self.reader.read_if_new(), payload(2))
+
+    def test_too_large(self):
+        with self.assertRaises(ValueError):
+            self.writer.write(bytes(CAPACITY + 1))
+
+    def test_corrupt_content_retried(self):
+        self.writer.write(payload(1))
+        self.writer.map[livesnapshot.HEADER_SIZE] ^= 0xFF    # Contenu incohérent avec le CRC
+        with self.assertRaises(TimeoutError):
+            self.reader.read()
+        self.assertGreater(self.reader.retries, 0)
+
+    def test_writer_stuck(self):
+        self.writer.write(payload(1))
+        SEQ.pack_into(self.writer.map, SEQ_OFFSET, self.writer.seq + 1)     # Ecriture interrompue : compteur impair
+        with self.assertRaises(TimeoutError):
+            self.reader.read()
+
+    def test_writer_resumes_after_interrupted_write(self):
+        self.writer.write(payload(1))
+        SEQ.pack_into(self.writer.map, SEQ_OFFSET, self.writer.seq + 1)
+        self.writer.close()
+        self.writer = LiveWriter(CAPACITY, self.path)   # Relancé après un arrêt au milieu d'une écriture
+        self.assertEqual(self.writer.seq % 2, 0)
+        self.writer.write(payload(2))
+        self.assertEqual(self.reader.read(), payload(2))
+
+    def test_not_a_snapshot(self):
+        other = os.path.join(self.directory, "other")
+        with open(other, "wb") as f:
+            f.write(bytes(64))
+        with self.assertRaises(ValueError):
+            LiveReader(other)
+
+    def test_concurrent_writer(self):
+        """Les lectures pendant des écritures continues renvoient toujours un contenu entier."""
+        total = 20000
+        writer = threading.Thread(target=lambda: [self.writer.write(payload(k)) for k in range(1, total + 1)])
+        writer.start()
+        last = 0
+        while writer.is_alive():
+            data = self.reader.read()
+            if data is not None:
+                k = int.from_bytes(data[:8])
+                self.assertEqual(data, payload(k))
+                self.assertGreaterEqual(k, last)    # Jamais un contenu plus ancien que le précédent
+                last = k
+        writer.join()
+        self.assertEqual(self.reader.read(), payload(total))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,224 @@
+"""
+Tests du format du log binaire (logformat), dans un dossier temporaire :
+    python -m unittest test_logformat
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import logformat
+from logformat import LogFormat, read_log
+
+TOTAL_IC = 2
+NB_CELLS = 13
+NB_SENSORS = 8
+CURRENT_LSB = 0.0125
+
+
+def random_records(log_format, rng, count, t_start=1.7e9, period=0.1):
+    """count enregistrements (timestamp, ADC, codes des cellules, codes des capteurs, NO_PROBLEM), timestamps croissants."""
+    result = []
+    for k in range(count):
+        result.append((
+            t_start + k * period,
+            int(rng.integers(-2**15, 2**15)),
+            rng.integers(0, 2**16, (log_format.total_ic, log_format.nb_cells), dtype=np.uint16),
+            rng.integers(0, 2**16, (log_format.total_ic, log_format.nb_sensors), dtype=np.uint16),
+            int.from_bytes(rng.bytes(log_format.no_problem_bytes)),
+        ))
+    return result
+
+
+class LogFormatTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(6811)
+        self.log_format = LogFormat(TOTAL_IC, NB_CELLS, NB_SENSORS, CURRENT_LSB)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "data.bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_log(self, log_format, records, header=True):
+        with open(self.path, "wb") as f:
+            if header:
+                f.write(log_format.header())
+            for record in records:
+                f.write(log_format.pack(*record))
+
+    def test_pack_unpack(self):
+        log_format = self.log_format
+        self.assertEqual(log_format.record_size, 10 + TOTAL_IC * (NB_CELLS + NB_SENSORS) * 2 + log_format.no_problem_bytes)
+        for time, adc, cells, temps, no_problem in random_records(log_format, self.rng, 50):
+            data = bytes(log_format.pack(time, adc, cells, temps, no_problem))
+            self.assertEqual(data, log_format.record.pack(
+                int(time * 1e8), adc, *np.hstack((cells, temps)).ravel().tolist(), no_problem.to_bytes(log_format.no_problem_bytes)
+            ))  # Vue numpy et struct : même disposition
+            got_time, got_adc, codes, got_no_problem = log_format.unpack(data)
+            self.assertAlmostEqual(got_time, time, places=6)
+            self.assertEqual((got_adc, got_no_problem), (adc, no_problem))
+            np.testing.assert_array_equal(codes, np.hstack((cells, temps)))
+
+    def test_header_round_trip(self):
+        header = self.log_format.header()
+        self.assertEqual(len(header), logformat.HEADER_SIZE)
+        log_format = LogFormat.from_header(header)
+        for name in ("total_ic", "nb_cells", "nb_sensors", "no_problem_bytes", "record_size", "header_size",
+                     "time_lsb", "voltage_lsb", "current_lsb"):
+            self.assertEqual(getattr(log_format, name), getattr(self.log_format, name), name)
+        f = io.BytesIO(header + b"rest")
+        self.assertIsNotNone(LogFormat.from_file(f))
+        self.assertEqual(f.read(), b"rest")     # Positionné après l'en-tête
+
+    def test_header_less(self):
+        f = io.BytesIO(b"\x02\x5c" + bytes(20))     # Ancien fichier : commence par un timestamp
+        self.assertIsNone(LogFormat.from_file(f))
+        self.assertEqual(f.tell(), 0)
+        self.assertIsNone(LogFormat.from_header(b""))
+
+    def test_bad_header(self):
+        header = bytearray(self.log_format.header())
+        with self.assertRaisesRegex(ValueError, "tronqué"):
+            LogFormat.from_header(bytes(header[:20]))
+        version = header.copy()
+        version[4:6] = (logformat.VERSION + 1).to_bytes(2)
+        with self.assertRaisesRegex(ValueError, "Version"):
+            LogFormat.from_header(bytes(version))
+        size = header.copy()
+        size[16:20] = (self.log_format.record_size + 1).to_bytes(4)
+        with self.assertRaisesRegex(ValueError, "incohérent"):
+            LogFormat.from_header(bytes(size))
+
+    def test_read_log(self):
+        records = random_records(self.log_format, self.rng, 20)
+        self.write_log(self.log_format, records)
+        with open(self.path, "ab") as f:
+            f.write(b"\x01" * 7)    # Enregistrement incomplet (écriture interrompue) : ignoré
+        log_format, read = read_log(self.path)
+        self.assertEqual(len(read), 20)
+        np.testing.assert_allclose(log_format.times(read), [r[0] for r in records], atol=1e-6)
+        np.testing.assert_allclose(log_format.currents(read), [r[1] * CURRENT_LSB for r in records])
+        np.testing.assert_allclose(log_format.cell_voltages(read), [r[2] * 0.0001 for r in records])
+        np.testing.assert_array_equal(log_format.temp_codes(read), [r[3] for r in records])
+        self.assertEqual(log_format.no_problems(read), [r[4] for r in records])
+
+    def test_read_log_legacy(self):
+        records = random_records(self.log_format, self.rng, 5)
+        self.write_log(self.log_format, records, header=False)
+        with self.assertRaises(ValueError):
+            read_log(self.path)     # Disposition inconnue
+        legacy = LogFormat(TOTAL_IC, NB_CELLS, NB_SENSORS, CURRENT_LSB, header_size=0)
+        log_format, read = read_log(self.path, legacy)
+        self.assertIs(log_format, legacy)
+        np.testing.assert_array_equal(log_format.temp_codes(read), [r[3] for r in records])
+
+    def test_read_log_empty(self):
+        self.write_log(self.log_format, [])
+        log_format, read = read_log(self.path)
+        self.assertEqual(len(read), 0)
+
+
+class RangeTest(unittest.TestCase):
+    """Recherche par date (bisect_time, index creux, read_range), comparée à un filtre sur tous les timestamps."""
+
+    COUNT = 1000
+    STRIDE = 64
+
+    def setUp(self):
+        self.rng = np.random.default_rng(6811)
+        self.log_format = LogFormat(1, NB_CELLS, NB_SENSORS, CURRENT_LSB)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "data.bin")
+        steps = self.rng.choice([0.0, 0.05, 0.1, 2.0], size=self.COUNT)    # Timestamps égaux et trous
+        self.times = 1.7e9 + np.cumsum(steps)
+        self.write(self.times)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, times, mode="wb"):
+        cells = np.zeros((1, NB_CELLS), dtype=np.uint16)
+        temps = np.zeros((1, NB_SENSORS), dtype=np.uint16)
+        with open(self.path, mode) as f:
+            if mode == "wb":
+                f.write(self.log_format.header())
+            for time in times:
+                f.write(self.log_format.pack(time, 0, cells, temps, 0))
+
+    def expected(self, t0, t1):
+        raw = (self.times * 1e8).astype(np.uint64)
+        mask = np.ones(len(raw), dtype=bool)
+        if t0 is not None:
+            mask &= raw >= np.uint64(int(t0 * 1e8))
+        if t1 is not None:
+            mask &= raw < np.uint64(int(t1 * 1e8))
+        return np.flatnonzero(mask)
+
+    def bounds(self):
+        """Intervalles à chercher : extrémités, timestamps exacts, entre deux, hors du fichier, sans limite."""
+        times = self.times
+        points = [None, times[0] - 10, times[0], times[-1], times[-1] + 10]
+        points += list(self.rng.choice(times, 20)) + list(self.rng.uniform(times[0], times[-1], 20))
+        for t0 in points:
+            for t1 in self.rng.choice(np.array(points, dtype=object), 6):
+                yield t0, t1
+
+    def assertRange(self, t0, t1):
+        log_format, records = logformat.read_range(self.path, t0, t1)
+        expected = self.expected(t0, t1)
+        all_times = logformat.read_log(self.path)[1]["time"]
+        np.testing.assert_array_equal(records["time"], all_times[expected], err_msg=f"[{t0}, {t1}[")
+
+    def test_bisect_time(self):
+        records = logformat.read_log(self.path)[1]
+        raw = records["time"].astype(np.uint64)
+        for value in list(raw[::37]) + [0, int(raw[-1]) + 1, int(raw[0]) - 1]:
+            self.assertEqual(logformat.bisect_time(records, int(value)), int(np.searchsorted(raw, np.uint64(value))))
+        self.assertEqual(logformat.bisect_time(records, int(raw[500]), 100, 200), 200)     # Borné à [lo, hi]
+
+    def test_read_range_without_index(self):
+        for t0, t1 in self.bounds():
+            self.assertRange(t0, t1)
+
+    def test_read_range_with_index(self):
+        index_path = logformat.build_index(self.path, self.STRIDE)
+        stride, count, entries = logformat.load_index(self.path, self.log_format, self.COUNT)
+        self.assertEqual((stride, count), (self.STRIDE, self.COUNT))
+        np.testing.assert_array_equal(entries, (self.times[:: self.STRIDE] * 1e8).astype(np.uint64))
+        self.assertTrue(os.path.isfile(index_path))
+        for t0, t1 in self.bounds():
+            self.assertRange(t0, t1)
+
+    def test_records_after_index(self):
+        logformat.build_index(self.path, self.STRIDE)
+        later = self.times[-1] + np.arange(1, 101) * 0.1    # Ecrits après l'index : cherchés par dichotomie
+        self.write(later, "ab")
+        self.times = np.concatenate((self.times, later))
+        for t0, t1 in self.bounds():
+            self.assertRange(t0, t1)
+
+    def test_load_index_rejected(self):
+        self.assertIsNone(logformat.load_index(self.path, self.log_format, self.COUNT))    # Pas d'index
+        logformat.build_index(self.path, self.STRIDE)
+        self.assertIsNone(logformat.load_index(self.path, self.log_format, self.COUNT - 1))     # Plus d'enregistrements que le log
+        other = LogFormat(2, NB_CELLS, NB_SENSORS, CURRENT_LSB)
+        self.assertIsNone(logformat.load_index(self.path, other, self.COUNT))   # Autre disposition
+        with open(self.path + logformat.INDEX_SUFFIX, "r+b") as f:
+            f.truncate(os.path.getsize(self.path + logformat.INDEX_SUFFIX) - 8)     # Index tronqué
+        self.assertIsNone(logformat.load_index(self.path, self.log_format, self.COUNT))
+
+    def test_replaced_log_ignores_index(self):
+        logformat.build_index(self.path, self.STRIDE)
+        self.times = self.times[:100] + 1000     # Fichier remplacé (rotation), index resté en place
+        self.write(self.times)
+        for t0, t1 in self.bounds():
+            self.assertRange(t0, t1)
+
+
+if __name__ == "__main__":
+    unittest.main()
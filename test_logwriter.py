@@ -0,0 +1,148 @@
+"""
+Tests du log binaire bufferisé (logwriter.LogWriter), dans un dossier temporaire :
+    python -m unittest test_logwriter
+"""
+
+import errno
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from logwriter import LogWriter
+
+HEADER = b"HEAD" * 4
+RECORD_SIZE = 10
+
+
+def record(k: int) -> bytes:
+    return bytes([k % 256]) * RECORD_SIZE
+
+
+class LogWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "data.bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def content(self, path=None) -> bytes:
+        with open(path or self.path, "rb") as f:
+            return f.read()
+
+    def test_batch_records(self):
+        log = LogWriter(self.path, batch_records=3, batch_time=60, durable=False, header=HEADER)
+        self.assertEqual(self.content(), HEADER)
+        log.append(record(0))
+        log.append(record(1))
+        self.assertEqual(self.content(), HEADER)    # Lot incomplet : rien n'est écrit
+        log.append(record(2))
+        self.assertEqual(self.content(), HEADER + record(0) + record(1) + record(2))
+        self.assertEqual((log.flushes, log.syncs, log.size), (1, 0, len(HEADER) + 3 * RECORD_SIZE))
+        log.append(record(3))
+        log.close()     # Ecrit les enregistrements en attente
+        self.assertEqual(self.content(), HEADER + b"".join(map(record, range(4))))
+
+    def test_batch_time(self):
+        log = LogWriter(self.path, batch_records=100, batch_time=0.05, durable=False)
+        log.append(record(0))
+        log.flush_if_due()
+        self.assertEqual(self.content(), b"")
+        time.sleep(0.06)
+        log.flush_if_due()
+        self.assertEqual(self.content(), record(0))
+        log.close()
+
+    def test_force(self):
+        log = LogWriter(self.path, batch_records=100, batch_time=60, durable=False)
+        log.append(record(0))
+        log.append(record(1), force=True)   # Ecrit et synchronisé tout de suite
+        self.assertEqual(self.content(), record(0) + record(1))
+        self.assertEqual(log.syncs, 1)
+        log.close()
+
+    def test_reopen_keeps_header(self):
+        LogWriter(self.path, durable=False, header=HEADER).close()
+        log = LogWriter(self.path, batch_records=1, durable=False, header=HEADER)   # Fichier existant : pas de nouvel en-tête
+        log.append(record(0))
+        log.close()
+        self.assertEqual(self.content(), HEADER + record(0))
+
+    def test_partial_write_truncated(self):
+        log = LogWriter(self.path, batch_records=3, batch_time=60, durable=False, header=HEADER)
+        for k in range(3):
+            log.append(record(k))
+        write = os.write
+        calls = []
+
+        def failing_write(fd, data):
+            calls.append(len(data))
+            if len(calls) == 1:
+                return write(fd, bytes(data[: RECORD_SIZE + 3]))    # Ecriture partielle, au milieu d'un enregistrement
+            raise OSError(errno.ENOSPC, "No space left on device")
+
+        log.append(record(3))
+        log.append(record(4))
+        with mock.patch("os.write", failing_write):
+            with self.assertRaises(OSError):
+                log.append(record(5))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.content(), HEADER + b"".join(map(record, range(3))))  # Lot perdu en entier, sans reste
+        self.assertEqual(log.size, len(HEADER) + 3 * RECORD_SIZE)
+        self.assertEqual(log.pending, 0)
+        for k in range(6, 9):
+            log.append(record(k))
+        log.close()
+        self.assertEqual(self.content(), HEADER + b"".join(map(record, (0, 1, 2, 6, 7, 8))))    # Toujours aligné
+
+    def rotating_writer(self, **kwargs) -> LogWriter:
+        self.segments = []
+        names = iter(range(1000))
+        return LogWriter(
+            self.path, durable=False, header=HEADER,
+            segment_path=lambda started: os.path.join(self.directory, f"data-{next(names)}.bin"),
+            on_rotate=self.segments.append, **kwargs,
+        )
+
+    def test_rotation_by_size(self):
+        log = self.rotating_writer(batch_records=2, batch_time=60, max_bytes=len(HEADER) + 4 * RECORD_SIZE)
+        for k in range(11):
+            log.append(record(k))
+        log.close()
+        self.assertEqual(log.rotations, 2)
+        self.assertEqual(len(self.segments), 2)
+        contents = [self.content(segment) for segment in self.segments] + [self.content()]
+        for content in contents:
+            self.assertTrue(content.startswith(HEADER))     # Chaque fichier se relit seul
+        self.assertEqual(contents[0], HEADER + b"".join(map(record, range(4))))
+        self.assertEqual(b"".join(content[len(HEADER):] for content in contents), b"".join(map(record, range(11))))
+        self.assertFalse(os.path.exists(self.path + ".new"))
+
+    def test_rotation_by_age(self):
+        log = self.rotating_writer(batch_records=1, max_age=0.05)
+        log.flush_if_due()
+        time.sleep(0.06)
+        log.flush_if_due()
+        self.assertEqual(log.rotations, 0)  # En-tête seul : pas de segment vide
+        log.append(record(0))   # Ecrit, puis rotation due
+        self.assertEqual(log.rotations, 1)
+        self.assertEqual(self.content(self.segments[0]), HEADER + record(0))
+        self.assertEqual(self.content(), HEADER)
+        log.append(record(1))
+        log.close()
+        self.assertEqual(self.content(), HEADER + record(1))
+
+    def test_no_rotation_without_segment_path(self):
+        log = LogWriter(self.path, batch_records=1, durable=False, max_bytes=1)
+        log.append(record(0))
+        log.append(record(1))
+        log.close()
+        self.assertEqual(log.rotations, 0)
+        self.assertEqual(self.content(), record(0) + record(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
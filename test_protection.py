@@ -0,0 +1,108 @@
+"""
+Tests du moteur de protection, comparé à la vérification canal par canal (protection.reference_check) :
+    python -m unittest test_protection
+"""
+
+import unittest
+
+import numpy as np
+
+from config import PackStats
+from protection import BITS_PER_IC, CODE_LSB, NB_CODES, Limits, ProtectionEngine, code_threshold, reference_check
+from read_temp import TEMP_TABLE_ARRAY
+
+TOTAL_IC = 3
+NB_CELLS = 12
+NB_SENSORS = 13
+
+LIMITS = {
+    "DISCHARGE": Limits(overvoltage=4.2, undervoltage=2.55, max_temp=57.5, max_current=95),
+    "CHARGE": Limits(overvoltage=4.2, max_temp=45),
+}
+
+
+def first_fault(engine, no_problem):
+    """Premier défaut (bit de poids fort) de no_problem, None si aucun."""
+    if not no_problem:
+        return None
+    width = BITS_PER_IC * engine.total_ic
+    return engine.channel(width - no_problem.bit_length())
+
+
+class ProtectionEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(6811)
+        self.engine = ProtectionEngine(TOTAL_IC, NB_CELLS, NB_SENSORS, LIMITS)
+        self.ok_temp = int(np.argmin(np.abs(TEMP_TABLE_ARRAY - 25)))  # Code d'un capteur à 25 °C
+        hot = np.flatnonzero(np.abs(TEMP_TABLE_ARRAY - 57.5) < 0.5)
+        self.near_temps = np.concatenate((hot, [self.ok_temp])).astype(np.uint16)   # Codes autour de la limite
+
+    def random_case(self, fault_rate):
+        """Mesures au voisinage des limites, une fraction fault_rate des canaux en défaut en moyenne."""
+        shape = (TOTAL_IC, NB_CELLS + 1)
+        cells = self.rng.integers(30000, 40000, shape)
+        edges = self.rng.random(shape) < fault_rate
+        cells[edges] = self.rng.choice([25499, 25500, 25501, 41999, 42000, 42001], size=int(edges.sum()))
+        temps = np.full((TOTAL_IC, NB_SENSORS), self.ok_temp)
+        hot = self.rng.random(temps.shape) < fault_rate
+        temps[hot] = self.rng.choice(self.near_temps, size=int(hot.sum()))
+        current = float(self.rng.choice([10.0, 94.99, 95.0, 120.0]))
+        return cells.astype(np.uint16), temps.astype(np.uint16), current
+
+    def test_matches_reference(self):
+        for mode in ("DISCHARGE", "CHARGE", "STANDBY"):
+            for fault_rate in (0.0, 0.02, 0.3):
+                for _ in range(100):
+                    cells, temps, current = self.random_case(fault_rate)
+                    expected = reference_check(self.engine, mode, 0, current, cells, temps)
+                    no_problem, fault = self.engine.check(mode, 0, current, cells, temps)
+                    self.assertEqual(no_problem, expected)
+                    self.assertEqual(fault, first_fault(self.engine, expected))
+
+    def test_stats_fast_path(self):
+        stats = PackStats(TOTAL_IC, NB_CELLS, NB_SENSORS)
+        for fault_rate in (0.0, 0.0, 0.02, 0.3):
+            for _ in range(100):
+                cells, temps, current = self.random_case(fault_rate)
+                stats.update_cells(cells)
+                stats.set_temps(TEMP_TABLE_ARRAY[temps])
+                for mode in LIMITS:
+                    self.assertEqual(
+                        self.engine.check(mode, 0, current, cells, temps, stats),
+                        self.engine.check(mode, 0, current, cells, temps),
+                    )
+
+    def test_faults_are_kept(self):
+        cells, temps, _ = self.random_case(0.0)
+        previous = 1 << 5
+        self.assertEqual(self.engine.check("DISCHARGE", previous, 10.0, cells, temps), (previous, None))
+        cells[1, 3] = 42000
+        no_problem, fault = self.engine.check("DISCHARGE", previous, 10.0, cells, temps)
+        self.assertEqual(no_problem & previous, previous)
+        self.assertEqual(fault, ("cell", 1, 3))
+
+    def test_per_channel_limits(self):
+        overvoltage = np.full((TOTAL_IC, NB_CELLS), 4.2)
+        overvoltage[2, 0] = 3.9     # Cellule plus fragile
+        engine = ProtectionEngine(TOTAL_IC, NB_CELLS, NB_SENSORS, {"DISCHARGE": Limits(overvoltage=overvoltage)})
+        cells = np.full((TOTAL_IC, NB_CELLS), 39500, dtype=np.uint16)
+        temps = np.full((TOTAL_IC, NB_SENSORS), self.ok_temp, dtype=np.uint16)
+        no_problem, fault = engine.check("DISCHARGE", 0, 0.0, cells, temps)
+        self.assertEqual(fault, ("cell", 2, 0))
+        self.assertEqual(no_problem, reference_check(engine, "DISCHARGE", 0, 0.0, cells, temps))
+
+    def test_code_threshold(self):
+        codes = np.arange(NB_CODES)
+        for volts in (2.55, 3.0001, 4.2, 4.19995):
+            above = int(code_threshold(volts, above=True))
+            below = int(code_threshold(volts, above=False))
+            np.testing.assert_array_equal(codes >= above, codes * CODE_LSB >= volts)
+            np.testing.assert_array_equal(codes <= below, codes * CODE_LSB <= volts)
+
+    def test_too_many_channels(self):
+        with self.assertRaises(ValueError):
+            ProtectionEngine(1, 17, 13, LIMITS)
+
+
+if __name__ == "__main__":
+    unittest.main()
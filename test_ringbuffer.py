@@ -0,0 +1,119 @@
+"""
+Tests du buffer circulaire de photographies (ringbuffer) :
+    python -m unittest test_ringbuffer
+"""
+
+import threading
+import unittest
+
+import numpy as np
+
+from ringbuffer import SnapshotRing
+
+CAPACITY = 8
+TOTAL_IC = 2
+NB_CELLS = 12
+NB_SENSORS = 8
+
+
+def publish(ring, k):
+    """Publie la photographie k, dont tous les champs dérivent de k."""
+    ring.publish(
+        float(k), k % 1000, k,
+        np.full((TOTAL_IC, NB_CELLS), k % 65536), np.full((TOTAL_IC, NB_SENSORS), k % 65536),
+        np.full((TOTAL_IC, NB_SENSORS), k / 10), (k,), (-k,),
+    )
+
+
+class SnapshotRingTest(unittest.TestCase):
+    def setUp(self):
+        self.ring = SnapshotRing(CAPACITY, TOTAL_IC, NB_CELLS, NB_SENSORS)
+        self.reader = self.ring.reader()
+
+    def assertRecord(self, record, k):
+        self.assertEqual(record.seq, k)
+        self.assertEqual(record.time, float(k))
+        self.assertEqual(record.adc_value, k % 1000)
+        self.assertEqual(record.no_problem, k)
+        self.assertTrue((record.cell_codes == k % 65536).all())
+        self.assertTrue((record.temp == k % 65536).all())
+        self.assertTrue((record.temps == k / 10).all())
+        self.assertEqual((record.volt, record.tempe), ((k,), (-k,)))
+
+    def test_in_order(self):
+        self.assertFalse(self.reader.read())
+        for k in range(3):
+            publish(self.ring, k)
+        self.assertEqual(self.reader.pending(), 3)
+        for k in range(3):
+            self.assertTrue(self.reader.read())
+            self.assertRecord(self.reader.record, k)
+        self.assertFalse(self.reader.read())
+        self.assertEqual(self.reader.dropped, 0)
+
+    def test_reader_starts_after_head(self):
+        publish(self.ring, 0)
+        late = self.ring.reader()
+        self.assertFalse(late.read())
+        publish(self.ring, 1)
+        self.assertTrue(late.read())
+        self.assertRecord(late.record, 1)
+
+    def test_overrun(self):
+        for k in range(3 * CAPACITY):
+            publish(self.ring, k)
+        self.assertTrue(self.reader.read())
+        oldest = 3 * CAPACITY - CAPACITY + 1    # La plus ancienne case peut être en cours de réécriture
+        self.assertRecord(self.reader.record, oldest)
+        self.assertEqual(self.reader.dropped, oldest)
+        delivered = 1
+        while self.reader.read():
+            delivered += 1
+        self.assertEqual(delivered + self.reader.dropped, 3 * CAPACITY)
+
+    def test_latest(self):
+        for k in range(5):
+            publish(self.ring, k)
+        self.assertTrue(self.reader.read(latest=True))
+        self.assertRecord(self.reader.record, 4)
+        self.assertEqual(self.reader.dropped, 4)    # Sautées : jamais remises
+        self.assertFalse(self.reader.read(latest=True))
+        publish(self.ring, 5)
+        self.assertTrue(self.reader.read(latest=True))
+        self.assertRecord(self.reader.record, 5)
+        self.assertEqual(self.reader.dropped, 4)
+
+    def test_wait(self):
+        self.assertFalse(self.reader.wait(0.01))
+        timer = threading.Timer(0.05, publish, (self.ring, 0))
+        timer.start()
+        self.assertTrue(self.reader.wait(1.0))
+        timer.join()
+        self.assertTrue(self.reader.read())
+        self.reader.read()  # Plus rien : l'événement est effacé
+        self.assertFalse(self.reader.wait(0.01))
+
+    def test_concurrent_producer(self):
+        """Chaque photographie est soit lue intacte, soit comptée une fois dans dropped."""
+        total = 20000
+        producer = threading.Thread(target=lambda: [publish(self.ring, k) for k in range(total)])
+        latest = self.ring.reader()
+        delivered = delivered_latest = 0
+        producer.start()
+        while producer.is_alive() or self.reader.pending():
+            self.reader.wait(0.01)
+            while self.reader.read():
+                self.assertRecord(self.reader.record, self.reader.record.seq)
+                delivered += 1
+            if latest.read(latest=True):
+                self.assertRecord(latest.record, latest.record.seq)
+                delivered_latest += 1
+        producer.join()
+        while latest.read(latest=True):
+            delivered_latest += 1
+        self.assertEqual(delivered + self.reader.dropped, total)
+        self.assertEqual(delivered_latest + latest.dropped, total)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+Couche de transport SPI utilisée par le driver LTC681x.
+Le driver ne parle qu'à un objet exposant l'interface de SpiTransport, ce qui permet
+de remplacer le bus réel (spidev, sur la Raspberry) par l'émulateur de emulator.py
+pour faire tourner ou mesurer la boucle sans la batterie.
+"""
+
+from abc import ABC, abstractmethod
+from typing import List
+
+try:
+    import spidev
+except ImportError:  # Hors Raspberry Pi : seul l'émulateur est utilisable
+    spidev = None
+
+
+class SpiTransport(ABC):
+    """
+    Interface minimale d'un bus SPI (sous-ensemble de spidev.SpiDev utilisé par le driver).
+    Classe abstraite : une implémentation doit définir open, close et xfer3.
+
+    Attributs :
+    -----------
+    max_speed_hz : int
+        Fréquence d'horloge du bus, en Hz.
+
+    mode : int
+        Mode SPI (polarité et phase de l'horloge), 3 pour le LTC6811.
+    """
+
+    def __init__(self):
+        self.max_speed_hz: int = int(1e6)
+        self.mode: int = 3
+
+    @abstractmethod
+    def open(self, bus: int, device: int) -> None:
+        """
+        Ouvre le bus bus avec la ligne de chip select device,
+        avec les réglages max_speed_hz et mode courants.
+        """
+
+    @abstractmethod
+    def close(self) -> None:
+        """
+        Ferme le bus.
+        """
+
+    @abstractmethod
+    def xfer3(self, data: List[int]) -> List[int]:
+        """
+        Transfert full-duplex : envoie les octets de data (chip select maintenu bas
+        pendant tout le transfert) et renvoie les octets lus pendant ce temps.
+        """
+
+
+class SpidevTransport(SpiTransport):
+    """
+    Bus SPI réel, via le module spidev du noyau Linux.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.dev = None
+
+    def open(self, bus: int, device: int) -> None:
+        if spidev is None:
+            raise RuntimeError("spidev n'est pas installé, utiliser emulator.DaisyChainEmulator")
+        self.dev = spidev.SpiDev()
+        self.dev.open(bus, device)
+        self.dev.max_speed_hz = self.max_speed_hz
+        self.dev.mode = self.mode
+
+    def close(self) -> None:
+        if self.dev is not None:
+            self.dev.close()
+            self.dev = None
+
+    def xfer3(self, data: List[int]) -> List[int]:
+        return self.dev.xfer3(data)